@@ -0,0 +1,189 @@
+# browser_pool.py
+"""Headless Chrome pool for running the E2E suites in parallel with pabot.
+
+Each pabot process is a worker, numbered by ${PABOTEXECUTIONPOOLID} (0 when
+running plain `robot`). A worker keeps up to SHARERAPY_E2E_BROWSERS headless
+Chrome instances open and hands them out by window size, so a test asking
+for a size that is already open reuses that Chrome instead of launching one;
+when the pool is full the least recently used browser is closed.
+
+Every browser downloads into its own directory,
+<SHARERAPY_E2E_DOWNLOADS>/worker-<n>/<alias>, so tests checking downloads
+never see another worker's files. Workers also log in as their own test user
+from SHARERAPY_E2E_USERS (`email:password,email:password`; worker n gets
+entry n), so sessions and the records each user owns don't collide. With
+more than one process it must list a user per process: otherwise the workers
+would share one account and its data, so logging in fails instead. Without
+pabot the suite's own user is used unless the variable is set.
+
+    pabot --processes 3 --outputdir tests/robot/E2E/output tests/robot/E2E/
+
+Splitting by suite (pabot's default) rather than --testlevelsplit keeps a
+suite's tests in one process, so they share its browsers and login.
+
+Tuning (environment variables):
+  SHARERAPY_E2E_BROWSERS     Chrome instances kept per worker (default 2)
+  SHARERAPY_E2E_WINDOW_SIZE  default window size (default 1920x1080)
+  SHARERAPY_E2E_DOWNLOADS    download root (default tests/robot/E2E/output/downloads)
+  SHARERAPY_E2E_USERS        test users to spread over the workers
+"""
+import atexit
+import json
+import os
+from collections import OrderedDict
+
+from robot.libraries.BuiltIn import BuiltIn
+from selenium.common.exceptions import WebDriverException
+
+from page_waits import page_waits
+
+E2E_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+POOL_SIZE = int(os.environ.get('SHARERAPY_E2E_BROWSERS', '2'))
+WINDOW_SIZE = os.environ.get('SHARERAPY_E2E_WINDOW_SIZE', '1920x1080')
+DOWNLOAD_ROOT = os.environ.get('SHARERAPY_E2E_DOWNLOADS', os.path.join(E2E_DIR, 'output', 'downloads'))
+E2E_USERS = os.environ.get('SHARERAPY_E2E_USERS', '')
+
+CHROME_ARGUMENTS = (
+    '--headless=new', '--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu',
+    '--disable-password-manager-reauthentication', '--disable-features=VizDisplayCompositor',
+    '--disable-notifications', '--disable-infobars',
+)
+
+
+def _parse_users(text):
+    users = []
+    for entry in filter(None, (item.strip() for item in text.split(','))):
+        email, _, password = entry.partition(':')
+        users.append((email, password))
+    return users
+
+
+def _window_size(size):
+    width, _, height = str(size or WINDOW_SIZE).lower().partition('x')
+    return int(width), int(height)
+
+
+def chrome_options(size, downloads):
+    """SeleniumLibrary `options=` string for a headless Chrome of `size` saving downloads to `downloads`"""
+    width, height = _window_size(size)
+    prefs = {
+        'download.default_directory': downloads,
+        'download.prompt_for_download': False,
+    }
+    arguments = (*CHROME_ARGUMENTS, f'--window-size={width},{height}')
+    return ';'.join([*(f'add_argument("{argument}")' for argument in arguments),
+                     f'add_experimental_option("prefs", {json.dumps(prefs)})'])
+
+
+class BrowserPool:
+    """This worker's open browsers, most recently used last"""
+
+    def __init__(self, size=POOL_SIZE):
+        self.size = max(1, size)
+        self.launches = 0
+        self.reuses = 0
+        # alias -> {'size': (width, height), 'driver', 'downloads'}
+        self._browsers = OrderedDict()
+        self._users = _parse_users(E2E_USERS)
+        self._sequence = 0
+
+    def _run(self, name, *args):
+        return BuiltIn().run_keyword(name, *args)
+
+    def _selenium(self):
+        return BuiltIn().get_library_instance('SeleniumLibrary')
+
+    def worker(self):
+        """This process's worker number under pabot; 0 otherwise"""
+        return int(BuiltIn().get_variable_value('${PABOTEXECUTIONPOOLID}', 0) or 0)
+
+    def worker_user(self, email, password):
+        """The test user this worker logs in as; (`email`, `password`) unless SHARERAPY_E2E_USERS is set.
+
+        Raises when pabot runs several processes without a user for each.
+        """
+        processes = int(BuiltIn().get_variable_value('${PABOTNUMBEROFPROCESSES}', 1) or 1)
+        if processes > 1 and len(self._users) < processes:
+            raise RuntimeError(f"pabot runs {processes} processes but SHARERAPY_E2E_USERS lists "
+                               f"{len(self._users)} test users; set one per process so the workers "
+                               f"don't share an account")
+        if not self._users:
+            return email, password
+        return self._users[self.worker() % len(self._users)]
+
+    def _alive(self, alias):
+        try:
+            self._run('Switch Browser', alias)
+            self._selenium().driver.current_url
+            return True
+        except (RuntimeError, WebDriverException):
+            self._browsers.pop(alias, None)
+            return False
+
+    def acquire(self, url, browser='Chrome', size=None):
+        """Make a browser of `size` current, reusing an open one; returns (alias, whether it was just launched)"""
+        wanted = _window_size(size)
+        for alias, entry in reversed(list(self._browsers.items())):
+            if entry['size'] == wanted and self._alive(alias):
+                self._browsers.move_to_end(alias)
+                self.reuses += 1
+                return alias, False
+        while len(self._browsers) >= self.size:
+            self._close(next(iter(self._browsers)))
+        return self._launch(url, browser, wanted), True
+
+    def _launch(self, url, browser, size):
+        self._sequence += 1
+        alias = f"pool-{self.worker()}-{self._sequence}"
+        downloads = os.path.join(DOWNLOAD_ROOT, f"worker-{self.worker()}", alias)
+        os.makedirs(downloads, exist_ok=True)
+        self._run('Open Browser', url, browser, f"alias={alias}",
+                  f"options={chrome_options('x'.join(map(str, size)), downloads)}")
+        self._run('Set Window Size', str(size[0]), str(size[1]))
+        page_waits.install_page_observers()
+        self._browsers[alias] = {'size': size, 'driver': self._selenium().driver, 'downloads': downloads}
+        self.launches += 1
+        return alias
+
+    def download_directory(self):
+        """Where the current browser saves downloads"""
+        driver = self._selenium().driver
+        return next(entry['downloads'] for entry in self._browsers.values() if entry['driver'] is driver)
+
+    def _close(self, alias):
+        entry = self._browsers.pop(alias)
+        try:
+            self._run('Switch Browser', alias)
+            self._run('Close Browser')
+        except (RuntimeError, WebDriverException):
+            pass
+        return entry
+
+    def close_pooled_browsers(self):
+        """Close every browser of this worker"""
+        while self._browsers:
+            self._close(next(iter(self._browsers)))
+
+    def quit(self):
+        """Quit Chrome directly; used at process exit, when Robot is gone"""
+        while self._browsers:
+            _, entry = self._browsers.popitem()
+            try:
+                entry['driver'].quit()
+            except WebDriverException:
+                pass
+
+
+# Create global instance and Robot-compatible wrappers
+browser_pool = BrowserPool()
+atexit.register(browser_pool.quit)
+
+def acquire_pooled_browser(url, browser='Chrome', size=None):
+    return browser_pool.acquire(url, browser, size)[0]
+
+def download_directory():
+    return browser_pool.download_directory()
+
+def close_pooled_browsers():
+    return browser_pool.close_pooled_browsers()
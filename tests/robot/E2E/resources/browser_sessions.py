@@ -0,0 +1,141 @@
+# browser_sessions.py
+"""Logged-in browsers shared by the E2E tests of a Robot (pabot) process.
+
+Launching Chrome and logging in through the UI used to be the first half of
+every E2E test. Here the first test of a process does both once and saves
+the session's cookies and local storage. Each later test gets a browser
+back from the worker's pool (see browser_pool.py), wiped of cookies and
+storage and then given the saved session again, so it starts logged in
+without a relaunch or a login round trip. Under pabot each worker logs in as
+its own test user when several are configured.
+
+The saved session is taken again (through the UI) once it is older than
+SHARERAPY_E2E_SESSION_MAX_AGE seconds (default 2700), i.e. before the
+Supabase access token in it expires. The browsers are closed by
+`Close Shared Browser` or when the process exits.
+
+Tests that exercise the login page itself keep opening their own browser.
+"""
+import os
+import time
+from urllib.parse import urljoin, urlsplit
+
+from robot.libraries.BuiltIn import BuiltIn
+from selenium.common.exceptions import WebDriverException
+
+from browser_pool import browser_pool
+from page_waits import page_waits
+
+SESSION_MAX_AGE = float(os.environ.get('SHARERAPY_E2E_SESSION_MAX_AGE', '2700'))
+
+# The login form on the landing URL
+EMAIL_INPUT = 'css=input[type="email"]'
+PASSWORD_INPUT = 'css=input[type="password"]'
+SUBMIT_BUTTON = 'css=button[type="submit"]'
+LOGGED_IN_TEXT = 'Share Knowledge'
+
+CLEAR_STORAGE = "window.localStorage.clear(); window.sessionStorage.clear();"
+READ_LOCAL_STORAGE = "return Object.assign({}, window.localStorage);"
+WRITE_LOCAL_STORAGE = """
+var items = arguments[0];
+Object.keys(items).forEach(function (key) { window.localStorage.setItem(key, items[key]); });
+"""
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class BrowserSessions:
+    """The saved session of each user logged in with the pooled browsers"""
+
+    def __init__(self):
+        # email -> {cookies, local_storage, saved_at}
+        self._sessions = {}
+        self.logins = 0
+
+    def _run(self, name, *args):
+        return BuiltIn().run_keyword(name, *args)
+
+    def _selenium(self):
+        return BuiltIn().get_library_instance('SeleniumLibrary')
+
+    def _log_in(self, url, email, password):
+        """Log in through the UI and save the resulting session"""
+        driver = self._selenium().driver
+        if driver.current_url != url:
+            driver.get(url)
+        self._run('Input Text', EMAIL_INPUT, email)
+        self._run('Input Text', PASSWORD_INPUT, password)
+        self._run('Click Element', SUBMIT_BUTTON)
+        self._run('Wait Until Page Contains', LOGGED_IN_TEXT, '30s')
+        page_waits.wait_for_network_idle()
+        self._sessions[email] = {
+            'cookies': driver.get_cookies(),
+            'local_storage': driver.execute_script(READ_LOCAL_STORAGE),
+            'saved_at': time.monotonic(),
+        }
+        self.logins += 1
+
+    def _restore(self, url, email):
+        """Wipe the browser's state for the site and put the saved session back"""
+        driver = self._selenium().driver
+        session = self._sessions[email]
+        # Cookies and storage can only be set for the page's own origin
+        if _origin(driver.current_url) != _origin(url):
+            driver.get(_origin(url))
+        driver.delete_all_cookies()
+        driver.execute_script(CLEAR_STORAGE)
+        for cookie in session['cookies']:
+            driver.add_cookie({key: value for key, value in cookie.items() if value is not None})
+        driver.execute_script(WRITE_LOCAL_STORAGE, session['local_storage'])
+
+    def open_authenticated_browser(self, url, email, password, browser='Chrome', path=None, size=None):
+        """Start a test logged in as `email` (or this worker's user), reusing a pooled browser and saved session.
+
+        The test starts on `url` (the landing page), or deep-linked to `path` under it.
+        """
+        email, password = browser_pool.worker_user(email, password)
+        browser_pool.acquire(url, browser, size)
+        session = self._sessions.get(email)
+        if session and time.monotonic() - session['saved_at'] < SESSION_MAX_AGE:
+            self._restore(url, email)
+            self._selenium().driver.get(urljoin(url, path or ''))
+        else:
+            self._reset()
+            # Leaves the browser on the logged-in landing page
+            self._log_in(url, email, password)
+            if path:
+                self._selenium().driver.get(urljoin(url, path))
+        page_waits.wait_for_hydration()
+
+    def _reset(self):
+        driver = self._selenium().driver
+        driver.delete_all_cookies()
+        try:
+            driver.execute_script(CLEAR_STORAGE)
+        except WebDriverException:
+            # about:blank and error pages have no storage
+            pass
+
+    def forget_browser_sessions(self):
+        """Drop the saved sessions, so the next test logs in through the UI again"""
+        self._sessions.clear()
+
+    def close_shared_browser(self):
+        """Close this worker's browsers; the next test launches a new one"""
+        browser_pool.close_pooled_browsers()
+
+
+# Create global instance and Robot-compatible wrappers
+browser_sessions = BrowserSessions()
+
+def open_authenticated_browser(url, email, password, browser='Chrome', path=None, size=None):
+    return browser_sessions.open_authenticated_browser(url, email, password, browser, path, size)
+
+def forget_browser_sessions():
+    return browser_sessions.forget_browser_sessions()
+
+def close_shared_browser():
+    return browser_sessions.close_shared_browser()
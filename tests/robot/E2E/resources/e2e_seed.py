@@ -0,0 +1,147 @@
+# e2e_seed.py
+"""E2E preconditions seeded through the backend bridge, plus deep links.
+
+A test of the create-report form only needs a patient to exist and the form
+to be open. Rather than clicking through the landing page and sidebar (and
+filling in a patient form first), these keywords call the same lib/actions
+functions as the CRUD libraries, over the tsx bridge, signed in as the E2E
+user so row-level security and ownership checks apply as in the app. The
+browser is then sent straight to the page under test.
+
+Unlike the CRUD keywords, seeding never falls back to local data: a
+precondition that could not be created fails the keyword. Everything seeded
+is remembered and removed again by `Remove Seeded Records`.
+"""
+import os
+import sys
+import time
+import uuid
+from urllib.parse import urljoin
+
+from robot.libraries.BuiltIn import BuiltIn
+
+# The bridge and session pool live with the CRUD keyword libraries
+CRUD_RESOURCES = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'crud', 'resources'))
+if CRUD_RESOURCES not in sys.path:
+    sys.path.append(CRUD_RESOURCES)
+
+from blocknote import markdown  # noqa: E402
+from browser_pool import browser_pool  # noqa: E402
+from form_fields import PATIENT_FORM_FIELDS, REPORT_FORM_FIELDS  # noqa: E402
+from page_waits import page_waits  # noqa: E402
+from session_pool import session_pool  # noqa: E402
+from tsx_bridge import bridge, form_data, redirect_id  # noqa: E402
+
+# Markers the cleanup script (tests/scripts/cleanup-e2e-test-data.js) looks
+# for, so records left behind by an aborted run are still removed
+E2E_PREFIX = '[E2E_TEST]'
+E2E_PATIENT_NAME = 'TestFirst'
+
+
+def _paragraph(text):
+    """BlockNote content of a single paragraph"""
+    return [{
+        'id': str(uuid.uuid4()),
+        'type': 'paragraph',
+        'props': {'textColor': 'default', 'backgroundColor': 'default', 'textAlignment': 'left'},
+        'content': [{'type': 'text', 'text': text, 'styles': {}}],
+        'children': [],
+    }]
+
+
+class E2ESeed:
+    """Creates records as the E2E user and remembers them for cleanup"""
+
+    def __init__(self):
+        self._email = None
+        self._password = None
+        # (kind, id) in creation order
+        self._created = []
+
+    def _session(self):
+        if self._email is None:
+            raise RuntimeError("Log In Seeding User first")
+        return session_pool.login(self._email, self._password)
+
+    def _call(self, method, *args):
+        """A bridge call as the seeding user; failures raise instead of falling back"""
+        return bridge.call(method, *args, cookies=self._session()['cookies'])
+
+    def log_in_seeding_user(self, email, password):
+        """Sign the seeding calls in as `email`, or this worker's user (once per process, see session_pool.py)"""
+        self._email, self._password = browser_pool.worker_user(email, password)
+        return self._session()['user_id']
+
+    def seed_patient(self, **fields):
+        """Create a patient; returns it with its `id` and display `name` (unique, to pick it in selects)"""
+        data = {
+            'first_name': E2E_PATIENT_NAME,
+            'last_name': f"Seed{uuid.uuid4().hex[:8]}",
+            'birthdate': '1990-01-15',
+            'sex': 'Female',
+            'contact_number': '1234567890',
+            'country_id': 1,
+            **fields,
+        }
+        patient_id = redirect_id(self._call("createPatient", form_data(data, PATIENT_FORM_FIELDS)))
+        if not patient_id:
+            raise AssertionError("createPatient did not return the new patient's ID")
+        self._created.append(('patients', patient_id))
+        return {**data, 'id': patient_id, 'name': f"{data['first_name']} {data['last_name']}"}
+
+    def seed_report(self, patient_id, **fields):
+        """Create a report on `patient_id` written by the seeding user"""
+        content = fields.pop('content', None) or _paragraph("Seeded report content.")
+        data = {
+            'therapist_id': self._session()['user_id'],
+            'patient_id': patient_id,
+            'type_id': 1,
+            'language_id': 1,
+            'title': f"{E2E_PREFIX} Seeded report {time.strftime('%H:%M:%S')}",
+            'description': 'Seeded for an E2E test.',
+            'content': content,
+            'markdown': markdown(content),
+            **fields,
+        }
+        report_id = redirect_id(self._call("createReport", form_data(data, REPORT_FORM_FIELDS, json_fields=('content',))))
+        if not report_id:
+            raise AssertionError("createReport did not return the new report's ID")
+        self._created.append(('reports', report_id))
+        return {**data, 'id': report_id}
+
+    def remove_seeded_records(self):
+        """Delete everything seeded, newest first (reports before the patients they belong to)"""
+        failures = []
+        actions = {'patients': "deletePatient", 'reports': "deleteReport"}
+        while self._created:
+            kind, record_id = self._created.pop()
+            try:
+                self._call(actions[kind], record_id)
+            except Exception as e:
+                failures.append(f"{kind} {record_id}: {e}")
+        if failures:
+            print(f"*WARN* Could not remove seeded records: {'; '.join(failures)}")
+
+    def go_to_app_page(self, base_url, path, ready_locator=None):
+        """Deep-link the browser to `path` under `base_url` and wait until it is ready"""
+        BuiltIn().get_library_instance('SeleniumLibrary').driver.get(urljoin(base_url, path))
+        page_waits.wait_for_page_ready(ready_locator)
+
+
+# Create global instance and Robot-compatible wrappers
+e2e_seed = E2ESeed()
+
+def log_in_seeding_user(email, password):
+    return e2e_seed.log_in_seeding_user(email, password)
+
+def seed_patient(**fields):
+    return e2e_seed.seed_patient(**fields)
+
+def seed_report(patient_id, **fields):
+    return e2e_seed.seed_report(patient_id, **fields)
+
+def remove_seeded_records():
+    return e2e_seed.remove_seeded_records()
+
+def go_to_app_page(base_url, path, ready_locator=None):
+    return e2e_seed.go_to_app_page(base_url, path, ready_locator)
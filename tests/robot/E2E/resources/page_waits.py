@@ -0,0 +1,252 @@
+# page_waits.py
+"""Event-driven page readiness waits for the Selenium E2E suites.
+
+Instead of fixed Sleeps, these keywords wait for the page itself to say it is
+ready, using observers injected into the page:
+
+- network idle: no fetch/XHR in flight and no resource finished loading for
+  a quiet window
+- DOM settled: no DOM mutation for a quiet window
+- hydrated: React has attached to an element (its `__reactFiber$` key is
+  set), so clicks and typing reach the event handlers instead of being lost
+  when hydration replaces the server-rendered markup
+
+Each wait runs as one async script in the browser. It re-checks whenever the
+observers report activity, and otherwise sleeps in the browser only until the
+quiet window would end, so it returns as soon as the page is ready.
+
+`Install Page Observers` (right after Open Browser) registers the observers
+for every document the browser loads, so requests started during page load
+are counted too. Without it they are installed on the current page the first
+time a wait runs.
+
+`Submit Form` clicks a form's submit button and waits until the submission
+has started, clicking again only if the first click was lost, so a form is
+never submitted twice.
+"""
+import time
+
+from robot.libraries.BuiltIn import BuiltIn
+from robot.utils import timestr_to_secs
+from selenium.common.exceptions import WebDriverException
+
+# Sets up window.__e2eWaits once per document; safe to run again
+OBSERVERS = r"""
+(function () {
+  if (window.__e2eWaits) return;
+  var state = window.__e2eWaits = { inflight: 0, lastNetwork: 0, lastMutation: 0, listeners: [] };
+  function notify() { state.listeners.slice().forEach(function (listener) { listener(); }); }
+  function started() { state.inflight++; state.lastNetwork = performance.now(); notify(); }
+  function finished() {
+    state.inflight = Math.max(0, state.inflight - 1);
+    state.lastNetwork = performance.now();
+    notify();
+  }
+
+  var baseFetch = window.fetch;
+  if (baseFetch) {
+    window.fetch = function () {
+      started();
+      return baseFetch.apply(this, arguments).finally(finished);
+    };
+  }
+  var send = XMLHttpRequest.prototype.send;
+  XMLHttpRequest.prototype.send = function () {
+    started();
+    this.addEventListener('loadend', finished);
+    return send.apply(this, arguments);
+  };
+  // Scripts, styles, images and requests made before the observers existed
+  new PerformanceObserver(function (list) {
+    list.getEntries().forEach(function (entry) {
+      state.lastNetwork = Math.max(state.lastNetwork, entry.responseEnd);
+    });
+    notify();
+  }).observe({ type: 'resource', buffered: true });
+  new MutationObserver(function () {
+    state.lastMutation = performance.now();
+    notify();
+  }).observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+})();
+"""
+
+# arguments: kind ('network', 'dom' or 'hydration'), quiet ms, timeout ms, element, callback
+WAIT_SCRIPT = OBSERVERS + r"""
+var kind = arguments[0], quiet = arguments[1], timeout = arguments[2], element = arguments[3];
+var done = arguments[arguments.length - 1];
+var state = window.__e2eWaits;
+var deadline = performance.now() + timeout;
+var timer = null, finished = false;
+// Hydration has no event to listen for, so it is polled
+var HYDRATION_POLL = 50;
+
+function hydrated() {
+  var target = element || document.body;
+  if (!target || document.readyState !== 'complete') return false;
+  return Object.keys(target).some(function (key) { return key.indexOf('__reactFiber$') === 0; });
+}
+
+// Milliseconds until the condition holds if nothing else happens; Infinity while blocked
+function pending() {
+  var now = performance.now();
+  if (kind === 'network') return state.inflight > 0 ? Infinity : state.lastNetwork + quiet - now;
+  if (kind === 'dom') return state.lastMutation + quiet - now;
+  return hydrated() ? 0 : HYDRATION_POLL;
+}
+
+function finish(ok) {
+  if (finished) return;
+  finished = true;
+  clearTimeout(timer);
+  state.listeners.splice(state.listeners.indexOf(check), 1);
+  done({ ok: ok, inflight: state.inflight });
+}
+
+function check() {
+  var remaining = pending(), left = deadline - performance.now();
+  if (remaining <= 0) return finish(true);
+  if (left <= 0) return finish(false);
+  clearTimeout(timer);
+  timer = setTimeout(check, Math.min(remaining, left));
+}
+
+state.listeners.push(check);
+check();
+"""
+
+# 'gone' once the form has navigated away, 'submitting' while it disables the button, else 'idle'
+SUBMIT_STATE = r"""
+var button = document.getElementById(arguments[0]);
+return button === null ? 'gone' : (button.disabled ? 'submitting' : 'idle');
+"""
+# How often Submit Form checks whether its click started the submission
+SUBMIT_POLL = 0.1
+
+DESCRIPTIONS = {
+    'network': 'network idle',
+    'dom': 'DOM settled',
+    'hydration': 'React hydration',
+}
+
+
+class PageWaits:
+    """Readiness waits on the browser opened by SeleniumLibrary"""
+
+    def _selenium(self):
+        return BuiltIn().get_library_instance('SeleniumLibrary')
+
+    def install_page_observers(self):
+        """Register the observers for every document loaded from now on (Chrome), and the current one"""
+        driver = self._selenium().driver
+        try:
+            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {'source': OBSERVERS})
+        except (AttributeError, WebDriverException) as e:
+            # Not Chromium: the waits install the observers themselves
+            print(f"*INFO* Page observers are installed per wait instead: {e}")
+        driver.execute_script(OBSERVERS)
+
+    def _wait(self, kind, quiet, timeout, locator=None):
+        selenium = self._selenium()
+        driver = selenium.driver
+        quiet_ms = timestr_to_secs(quiet) * 1000
+        started = time.monotonic()
+        deadline = started + timestr_to_secs(timeout)
+        previous = driver.timeouts.script
+        try:
+            while True:
+                left = deadline - time.monotonic()
+                element = None
+                if locator:
+                    BuiltIn().run_keyword('Wait Until Page Contains Element', locator, max(left, 0.1))
+                    element = selenium.find_element(locator)
+                    left = deadline - time.monotonic()
+                driver.set_script_timeout(max(left, 0) + 5)
+                try:
+                    outcome = driver.execute_async_script(WAIT_SCRIPT, kind, quiet_ms, max(left, 0) * 1000, element)
+                except WebDriverException:
+                    # The page navigated (or re-rendered the element) mid-wait; wait on the new one
+                    if time.monotonic() >= deadline:
+                        raise
+                    continue
+                break
+        finally:
+            driver.set_script_timeout(previous)
+
+        elapsed = time.monotonic() - started
+        if not outcome['ok']:
+            detail = f" ({outcome['inflight']} requests in flight)" if kind == 'network' else ''
+            raise AssertionError(f"No {DESCRIPTIONS[kind]} within {timeout}{detail}")
+        print(f"{DESCRIPTIONS[kind].capitalize()} after {elapsed * 1000:.0f} ms")
+        return elapsed
+
+    def _submit_state(self, driver, button_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                state = driver.execute_script(SUBMIT_STATE, button_id)
+            except WebDriverException:
+                # The page navigated mid-check
+                return 'gone'
+            if state != 'idle' or time.monotonic() >= deadline:
+                return state
+            time.sleep(SUBMIT_POLL)
+
+    def submit_form(self, button_id, timeout='10s'):
+        """Click the submit button with id `button_id` once, and wait until the submission has started.
+
+        The click is sent from JavaScript. The submission has started once the
+        form disables the button or navigates away. Only if neither happens
+        within `timeout` (the click was lost) is the button clicked again,
+        natively, so a slow server action is never submitted twice.
+        """
+        selenium = self._selenium()
+        driver = selenium.driver
+        driver.execute_script("document.getElementById(arguments[0]).click()", button_id)
+        state = self._submit_state(driver, button_id, timestr_to_secs(timeout))
+        if state == 'idle':
+            print(f"*INFO* Clicking {button_id} did not start the submission within {timeout}, clicking again")
+            selenium.click_element(f"id:{button_id}")
+            state = self._submit_state(driver, button_id, timestr_to_secs(timeout))
+        print(f"Form submission {state}")
+        return state
+
+    def wait_for_network_idle(self, quiet='500ms', timeout='30s'):
+        """Wait until no request is in flight and none finished for `quiet`"""
+        return self._wait('network', quiet, timeout)
+
+    def wait_for_dom_settled(self, quiet='200ms', timeout='30s'):
+        """Wait until the DOM has not changed for `quiet`"""
+        return self._wait('dom', quiet, timeout)
+
+    def wait_for_hydration(self, locator=None, timeout='30s'):
+        """Wait until the page has loaded and React has hydrated `locator` (default: <body>)"""
+        return self._wait('hydration', 0, timeout, locator)
+
+    def wait_for_page_ready(self, locator=None, timeout='30s'):
+        """Hydration, then network idle, then DOM settled, e.g. after a navigation"""
+        deadline = time.monotonic() + timestr_to_secs(timeout)
+        self.wait_for_hydration(locator, timeout)
+        self.wait_for_network_idle(timeout=max(deadline - time.monotonic(), 0.1))
+        self.wait_for_dom_settled(timeout=max(deadline - time.monotonic(), 0.1))
+
+
+# Create global instance and Robot-compatible wrappers
+page_waits = PageWaits()
+
+def install_page_observers():
+    return page_waits.install_page_observers()
+
+def submit_form(button_id, timeout='10s'):
+    return page_waits.submit_form(button_id, timeout)
+
+def wait_for_network_idle(quiet='500ms', timeout='30s'):
+    return page_waits.wait_for_network_idle(quiet, timeout)
+
+def wait_for_dom_settled(quiet='200ms', timeout='30s'):
+    return page_waits.wait_for_dom_settled(quiet, timeout)
+
+def wait_for_hydration(locator=None, timeout='30s'):
+    return page_waits.wait_for_hydration(locator, timeout)
+
+def wait_for_page_ready(locator=None, timeout='30s'):
+    return page_waits.wait_for_page_ready(locator, timeout)
@@ -1,8 +1,11 @@
+import asyncio
 import uuid
 import time
-import os
-import subprocess
-import json
+
+from bridge_trace import trace_listener
+from keyword_profiler import profile_keywords
+from session_pool import session_pool
+from tsx_bridge import bridge, form_data, gather_bounded
 
 
 class AuthFunctions:
@@ -12,6 +15,10 @@ class AuthFunctions:
             "users": {},  # keyed by email -> user dict with id/password
             "sessions": {},  # token -> email
         }
+        # Persistent tsx worker shared with the other keyword libraries
+        self._bridge = bridge
+        # Real Supabase sessions, logged in once per user and reused
+        self._sessions = session_pool
 
     def signup(self, data: dict):
         """Simulate user signup. Expects dict with email, password and optional fields.
@@ -27,55 +34,9 @@ class AuthFunctions:
             raise Exception("user already exists")
         
         try:
-            script_content = '''
-import { signup } from './lib/actions/auth.js';
-
-let input = '';
-process.stdin.setEncoding('utf8');
-process.stdin.on('data', chunk => input += chunk);
-process.stdin.on('end', async () => {
-  try {
-    const data = JSON.parse(input || '{}');
-    const formData = new FormData();
-    if (data.email) formData.append('email', data.email);
-    if (data.password) formData.append('password', data.password);
-    if (data.first_name) formData.append('first_name', data.first_name);
-    if (data.last_name) formData.append('last_name', data.last_name);
-
-    const res = await signup(formData);
-    console.log(JSON.stringify(res || {}));
-  } catch (err) {
-    console.error('ERROR', err && err.message ? err.message : err);
-    process.exit(1);
-  }
-});
-'''
-
-            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-            script_path = os.path.join(project_root, 'temp_auth_test.ts')
-            with open(script_path, 'w', encoding='utf8') as f:
-                f.write(script_content)
-
-            result = subprocess.run(
-                ['npx', 'tsx', script_path],
-                input=json.dumps({'email': email, 'password': password, 'first_name': data.get('first_name'), 'last_name': data.get('last_name')}),
-                capture_output=True,
-                text=True,
-                cwd=project_root,
-                env={**os.environ},
-                shell=True
-            )
-
-            if os.path.exists(script_path):
-                os.remove(script_path)
-
-            if result.returncode == 0 and result.stdout.strip():
-                try:
-                    parsed = json.loads(result.stdout.strip())
-                    if isinstance(parsed, dict) and parsed.get('id'):
-                        return parsed
-                except Exception:
-                    pass
+            parsed = self._bridge.call("signup", form_data(data, ('email', 'password', 'first_name', 'last_name')))
+            if isinstance(parsed, dict) and parsed.get('id'):
+                return parsed
         except Exception:
             # fall through to local fallback
             pass
@@ -93,70 +54,56 @@ process.stdin.on('end', async () => {
         self._local_store["users"][email] = {"user": user, "password": password}
         return user
 
+    def _open_session(self, email, token=None):
+        """Register a session token for tests; a local one unless `token` is given"""
+        token = token or str(uuid.uuid4())
+        self._local_store['sessions'][token] = {'email': email, 'created_at': time.time()}
+        return {'token': token, 'email': email}
+
+    def _local_login(self, email, password):
+        """Fallback to local store validation"""
+        entry = self._local_store.get('users', {}).get(email)
+        if not entry or entry.get('password') != password:
+            return None
+        return self._open_session(email)
+
+    def _start_session(self, email, password):
+        """Log in through the session pool and make later bridge calls run as this user"""
+        session = self._sessions.login(email, password)
+        self._sessions.use(email)
+        return self._open_session(email, session['access_token'])
+
     def login(self, data: dict):
-        """Simulate login. Returns a session token dict on success, None on failure."""
+        """Simulate login. Returns a session token dict on success, None on failure.
+
+        The token is the Supabase access token; the session is reused by later
+        logins of the same user and becomes the one bridge calls run as, for
+        the whole process, until another login, `Use Session` or the suite
+        teardown resets it (see session_pool.py).
+        """
         email = data.get("email")
         password = data.get("password")
         if not email or not password:
             return None
         try:
-            script_content = '''
-import { login } from './lib/actions/auth.js';
-
-let input = '';
-process.stdin.setEncoding('utf8');
-process.stdin.on('data', chunk => input += chunk);
-process.stdin.on('end', async () => {
-  try {
-    const data = JSON.parse(input || '{}');
-    const formData = new FormData();
-    if (data.email) formData.append('email', data.email);
-    if (data.password) formData.append('password', data.password);
-
-    const res = await login(formData);
-    // login action may not return data; return a simple ok object
-    console.log(JSON.stringify({ ok: true }));
-  } catch (err) {
-    console.error('ERROR', err && err.message ? err.message : err);
-    process.exit(1);
-  }
-});
-'''
-
-            project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
-            script_path = os.path.join(project_root, 'temp_auth_login.ts')
-            with open(script_path, 'w', encoding='utf8') as f:
-                f.write(script_content)
-
-            result = subprocess.run(
-                ['npx', 'tsx', script_path],
-                input=json.dumps({'email': email, 'password': password}),
-                capture_output=True,
-                text=True,
-                cwd=project_root,
-                env={**os.environ},
-                shell=True
-            )
-
-            if os.path.exists(script_path):
-                os.remove(script_path)
-
-            if result.returncode == 0:
-                # treat as success; create a local session token for tests
-                token = str(uuid.uuid4())
-                self._local_store['sessions'][token] = {'email': email, 'created_at': time.time()}
-                return {'token': token, 'email': email}
+            return self._start_session(email, password)
         except Exception:
-            pass
+            return self._local_login(email, password)
 
-        # Fallback to local store validation
-        entry = self._local_store.get('users', {}).get(email)
-        if not entry or entry.get('password') != password:
+    async def login_async(self, data: dict):
+        """Awaitable login"""
+        email = data.get("email")
+        password = data.get("password")
+        if not email or not password:
             return None
+        try:
+            return await asyncio.to_thread(self._start_session, email, password)
+        except Exception:
+            return self._local_login(email, password)
 
-        token = str(uuid.uuid4())
-        self._local_store['sessions'][token] = {'email': email, 'created_at': time.time()}
-        return {'token': token, 'email': email}
+    async def login_many(self, payloads, concurrency=20):
+        """Log in many users concurrently; results keep the order of `payloads`"""
+        return await gather_bounded((self.login_async(data) for data in payloads), concurrency)
 
     def sign_out(self, token: str):
         """Invalidate a session token. Returns True if token removed, False otherwise."""
@@ -164,10 +111,16 @@ process.stdin.on('end', async () => {
             return False
         if token in self._local_store["sessions"]:
             del self._local_store["sessions"][token]
+            email = self._sessions.find(token)
+            if email:
+                self._sessions.end(email)
             return True
         return False
 
 
+# Bridge call timings per suite/keyword (see bridge_trace.py)
+ROBOT_LIBRARY_LISTENER = trace_listener
+
 # Create global instance and Robot-compatible wrappers
 auth_functions = AuthFunctions()
 
@@ -177,5 +130,14 @@ def signup(data):
 def login(data):
     return auth_functions.login(data)
 
+async def login_async(data):
+    return await auth_functions.login_async(data)
+
+async def login_many(payloads, concurrency=20):
+    return await auth_functions.login_many(payloads, concurrency)
+
 def sign_out(token):
     return auth_functions.sign_out(token)
+
+# Wraps the keywords selected with SHARERAPY_PROFILE in the profiler (see keyword_profiler.py)
+profile_keywords(globals())
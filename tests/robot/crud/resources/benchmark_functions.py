@@ -0,0 +1,266 @@
+# benchmark_functions.py
+"""Microbenchmarks for the CRUD keyword libraries.
+
+Every operation runs through the same keyword functions the CRUD suites use,
+in one of three bridge modes:
+
+  spawn   one Node process per call
+  worker  the persistent worker pool
+  local   no bridge at all, answered from the local-store fallbacks
+
+The bridge modes talk to standin_backend.StandinBackend, so results depend
+only on this machine and the bridge. Each operation gets `warmup` untimed
+iterations, then `iterations` timed ones; per-iteration setup (e.g. creating
+the row a delete will remove) is never timed. Results, including the median
+of each bridge phase from bridge_trace, are written as JSON for comparing
+runs with compare_benchmark_results.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import auth_functions
+import patient_functions
+import report_functions
+import therapist_functions
+from bridge_trace import PHASES, percentile, tracer
+from read_cache import cache
+from standin_backend import StandinBackend
+from tsx_bridge import BRIDGE_MODES, MAX_REQUESTS, POOL_SIZE, PROJECT_ROOT, bridge
+
+OPERATIONS = (
+    'get_all_patients', 'get_patient_by_id', 'create_patient', 'update_patient', 'delete_patient',
+    'get_all_reports', 'get_report_by_id', 'create_report', 'update_report', 'delete_report',
+    'get_all_therapists', 'get_therapist_by_id', 'create_therapist', 'update_therapist', 'delete_therapist',
+    'signup', 'login',
+)
+
+PATIENT = {'first_name': 'Bench', 'last_name': 'Patient', 'birthdate': '1990-01-01', 'sex': 'Male',
+           'contact_number': '+1234567890', 'country_id': 1}
+THERAPIST = {'first_name': 'Bench', 'last_name': 'Therapist', 'age': 30, 'bio': 'Benchmark therapist',
+             'clinic_id': 1, 'picture': 'bench.jpg'}
+REPORT = {'title': 'Bench report', 'description': 'Benchmark report', 'type_id': 1, 'language_id': 1,
+          'content': {'notes': 'benchmark'}}
+
+LIBRARIES = {
+    'patient': patient_functions.patient_functions,
+    'report': report_functions.report_functions,
+    'therapist': therapist_functions.therapist_functions,
+}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=PROJECT_ROOT, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    """Latency percentiles (ms) and single-caller throughput for one operation"""
+    return {
+        'min_ms': min(durations),
+        'mean_ms': statistics.fmean(durations),
+        'p50_ms': percentile(durations, 50),
+        'p90_ms': percentile(durations, 90),
+        'p95_ms': percentile(durations, 95),
+        'p99_ms': percentile(durations, 99),
+        'max_ms': max(durations),
+        'stdev_ms': statistics.pstdev(durations),
+        'ops_per_s': len(durations) / (sum(durations) / 1000) if sum(durations) else 0.0,
+    }
+
+
+class BenchmarkFunctions:
+    """Runs the CRUD keywords repeatedly and collects latency statistics"""
+
+    def __init__(self):
+        self.backend: Optional[StandinBackend] = None
+        self.results: List[Dict[str, Any]] = []
+        self.started_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    def start_standin_backend(self, seed_rows=200, latency_ms=0):
+        """Serve the Supabase APIs locally and point the bridge at them"""
+        self.backend = StandinBackend(int(seed_rows), float(latency_ms) / 1000).start()
+        # Workers inherit the environment when they start, so drop any started before
+        bridge.pool.close()
+        print(f"Stand-in backend listening on {self.backend.url}")
+        return self.backend.url
+
+    def stop_standin_backend(self):
+        """Stop the stand-in and point the bridge back at the configured Supabase project"""
+        if self.backend is not None:
+            self.backend.stop()
+            self.backend = None
+        # Workers started meanwhile still have the stand-in's URL, and cached rows came from it
+        bridge.pool.close()
+        cache.clear()
+
+    # Fixtures ---------------------------------------------------------------
+
+    def _row(self, kind: str, mode: str) -> str:
+        """ID of a fresh row the operation can read, update or delete (untimed)"""
+        if mode == 'local':
+            return getattr(LIBRARIES[kind], f"create_{kind}")(self._data(kind))['id']
+        return self.backend.insert(f"{kind}s", self._data(kind))['id']
+
+    def _data(self, kind: str) -> Dict[str, Any]:
+        if kind == 'patient':
+            return dict(PATIENT)
+        if kind == 'therapist':
+            return dict(THERAPIST)
+        # Reports point at a seeded patient and therapist
+        return {**REPORT, 'patient_id': str(uuid.UUID(int=1)), 'therapist_id': str(uuid.UUID(int=10_001))}
+
+    def _operation(self, operation: str, mode: str) -> Tuple[Callable[[], Any], Callable[[Any], Any]]:
+        """(setup, call) for one iteration; setup's result is passed to call"""
+        if operation in ('signup', 'login'):
+            auth = auth_functions.auth_functions
+            if operation == 'signup':
+                return (lambda: {'email': f"bench-{uuid.uuid4().hex}@example.com", 'password': 'bench-password'},
+                        auth.signup)
+            credentials = {'email': f"bench-{uuid.uuid4().hex}@example.com", 'password': 'bench-password'}
+            auth.signup(dict(credentials))
+            return (lambda: dict(credentials), auth.login)
+
+        if operation.startswith('get_all_'):
+            library = LIBRARIES[operation[len('get_all_'):-1]]
+            return (lambda: None, lambda _: getattr(library, operation)())
+        if operation.endswith('_by_id'):
+            action, kind = 'get', operation[len('get_'):-len('_by_id')]
+        else:
+            action, kind = operation.split('_', 1)
+        library = LIBRARIES[kind]
+        if action == 'create':
+            return (lambda: self._data(kind), getattr(library, operation))
+        if action == 'update':
+            row_id = self._row(kind, mode)
+            return (lambda: self._data(kind), lambda data: getattr(library, operation)(row_id, data))
+        if action == 'delete':
+            return (lambda: self._row(kind, mode), getattr(library, operation))
+        row_id = self._row(kind, mode)
+        return (lambda: row_id, getattr(library, operation))
+
+    # Keywords ---------------------------------------------------------------
+
+    def benchmark_operation(self, operation, mode, iterations=30, warmup=3):
+        """Time one keyword operation in one bridge mode; returns its result record"""
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation {operation}; expected one of {', '.join(OPERATIONS)}")
+        if mode not in BRIDGE_MODES:
+            raise ValueError(f"Unknown mode {mode}; expected one of {', '.join(BRIDGE_MODES)}")
+        if mode != 'local' and self.backend is None:
+            raise RuntimeError("Start Standin Backend before benchmarking a bridge mode")
+        iterations, warmup = int(iterations), int(warmup)
+
+        previous = bridge.mode, cache.max_size, tracer.echo
+        # Measure the calls themselves: no cached reads, no per-call log lines
+        bridge.mode, cache.max_size, tracer.echo = mode, 0, False
+        cache.clear()
+        # The bridge calls the timed iterations make, as the tracer hands them over
+        calls: List[Dict[str, Any]] = []
+        try:
+            setup, call = self._operation(operation, mode)
+            for _ in range(warmup):
+                call(setup())
+            tracer.hooks.append(calls.append)
+            durations = []
+            for _ in range(iterations):
+                argument = setup()
+                started = time.perf_counter()
+                call(argument)
+                durations.append((time.perf_counter() - started) * 1000)
+        finally:
+            if calls.append in tracer.hooks:
+                tracer.hooks.remove(calls.append)
+            bridge.mode, cache.max_size, tracer.echo = previous
+
+        phases = {}
+        for phase in PHASES:
+            samples = [record['phases'][phase] for record in calls if phase in record['phases']]
+            if samples:
+                phases[phase] = percentile(samples, 50)
+        result = {
+            'operation': operation,
+            'mode': mode,
+            'iterations': iterations,
+            'warmup': warmup,
+            **summarize(durations),
+            'bridge_calls': len(calls),
+            'bridge_failures': sum(1 for record in calls if not record['ok']),
+            'phases_p50_ms': phases,
+        }
+        self.results.append(result)
+        print(f"{mode:>6} {operation:<20} p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+              f"max {result['max_ms']:8.2f} ms  {result['ops_per_s']:9.1f} ops/s"
+              + (f"  ({result['bridge_failures']} bridge failures)" if result['bridge_failures'] else ''))
+        return result
+
+    def benchmark_all_operations(self, mode, iterations=30, warmup=3):
+        """Benchmark every operation in OPERATIONS in one mode"""
+        return [self.benchmark_operation(operation, mode, iterations, warmup) for operation in OPERATIONS]
+
+    def write_benchmark_results(self, path='bridge-benchmarks.json'):
+        """Write every result collected so far, with the run's configuration, as JSON"""
+        document = {
+            'started_at': self.started_at,
+            'git_commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'config': {
+                'pool_size': POOL_SIZE,
+                'max_requests': MAX_REQUESTS,
+                'seed_rows': len(self.backend.tables['patients']) if self.backend else None,
+                'latency_ms': self.backend.latency * 1000 if self.backend else None,
+            },
+            'results': self.results,
+        }
+        with open(path, 'w', encoding='utf8') as output:
+            json.dump(document, output, indent=2)
+        print(f"Benchmark results written to {path}")
+        return path
+
+    def compare_benchmark_results(self, baseline, current, metric='p50_ms', tolerance=0.1):
+        """Compare two results files; returns the (mode, operation) pairs slower by more than `tolerance`"""
+        def load(path):
+            with open(path, encoding='utf8') as source:
+                return {(r['mode'], r['operation']): r for r in json.load(source)['results']}
+
+        before, after = load(baseline), load(current)
+        regressions = []
+        for key in sorted(before.keys() & after.keys()):
+            old, new = before[key][metric], after[key][metric]
+            change = (new - old) / old if old else 0.0
+            print(f"{key[0]:>6} {key[1]:<20} {old:8.2f} -> {new:8.2f} ms ({change:+.0%})")
+            if change > float(tolerance):
+                regressions.append(f"{key[0]} {key[1]}")
+        return regressions
+
+
+# Create global instance for Robot Framework
+benchmark_functions = BenchmarkFunctions()
+
+# Robot Framework compatible functions
+def start_standin_backend(seed_rows=200, latency_ms=0):
+    return benchmark_functions.start_standin_backend(seed_rows, latency_ms)
+
+def stop_standin_backend():
+    return benchmark_functions.stop_standin_backend()
+
+def benchmark_operation(operation, mode, iterations=30, warmup=3):
+    return benchmark_functions.benchmark_operation(operation, mode, iterations, warmup)
+
+def benchmark_all_operations(mode, iterations=30, warmup=3):
+    return benchmark_functions.benchmark_all_operations(mode, iterations, warmup)
+
+def write_benchmark_results(path='bridge-benchmarks.json'):
+    return benchmark_functions.write_benchmark_results(path)
+
+def compare_benchmark_results(baseline, current, metric='p50_ms', tolerance=0.1):
+    return benchmark_functions.compare_benchmark_results(baseline, current, metric, tolerance)
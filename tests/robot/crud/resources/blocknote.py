@@ -0,0 +1,21 @@
+# blocknote.py
+"""Helpers for the BlockNote JSON stored in report `content`.
+
+Kept apart from the keyword libraries so that importing them (e.g. from the
+E2E seeding keywords) doesn't instantiate any CRUD library.
+"""
+from typing import Any, Dict, List
+
+
+def markdown(blocks: List[Dict[str, Any]]) -> str:
+    """The markdown the editor exports alongside `content`"""
+    lines = []
+    for block in blocks:
+        text = ''.join(part['text'] for part in block['content'])
+        if block['type'] == 'heading':
+            lines.append(f"{'#' * block['props']['level']} {text}")
+        elif block['type'] == 'bulletListItem':
+            lines.append(f"* {text}")
+        else:
+            lines.append(text)
+    return '\n\n'.join(lines)
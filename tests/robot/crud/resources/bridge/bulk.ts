@@ -0,0 +1,201 @@
+/*
+ * Bulk CRUD helpers for the bridge, used to seed and clean up many records in
+ * a single bridge call. Rows are shaped the same way the server actions in
+ * lib/actions shape their FormData, but are written with one batched insert
+ * or one `in (...)` delete instead of one statement per record.
+ *
+ * Every helper returns one result per input item, in input order.
+ */
+import { createClient } from "@/lib/supabase/server";
+import { Json } from "@/lib/types/database.types";
+
+type Input = Record<string, unknown>;
+
+type Failure = { message: string; code?: string };
+
+export type ItemResult = {
+  index: number;
+  ok: boolean;
+  data?: unknown;
+  error?: Failure;
+};
+
+type Response = { data: unknown[] | null; error: Failure | null };
+
+function toFailure(error: unknown): Failure {
+  const { message, code } = (error ?? {}) as { message?: string; code?: string };
+  return { message: message ?? String(error), code };
+}
+
+function toJson(value: unknown): Json {
+  if (typeof value !== "string") return (value ?? null) as Json;
+  try {
+    return JSON.parse(value) as Json;
+  } catch {
+    return value;
+  }
+}
+
+function patientRow(input: Input) {
+  return {
+    first_name: input.first_name as string,
+    last_name: input.last_name as string,
+    birthdate: input.birthdate as string,
+    sex: input.sex as "Male" | "Female",
+    contact_number: input.contact_number as string,
+    country_id: Number(input.country_id),
+  };
+}
+
+function reportRow(input: Input) {
+  return {
+    therapist_id: input.therapist_id as string,
+    type_id: Number(input.type_id),
+    language_id: Number(input.language_id),
+    patient_id: input.patient_id as string,
+    content: toJson(input.content),
+    title: input.title as string,
+    description: input.description as string,
+    markdown: input.markdown as string | undefined,
+  };
+}
+
+function therapistRow(input: Input) {
+  return {
+    clinic_id: Number(input.clinic_id),
+    age: Number(input.age),
+    bio: input.bio as string,
+    last_name: input.last_name as string,
+    first_name: input.first_name as string,
+    picture: input.picture as string,
+  };
+}
+
+/*
+ * Inserts all rows in one statement. A single bad row fails the whole
+ * statement, in which case the rows are retried one by one (still inside
+ * this call) so each failure is attributed to its own item.
+ */
+async function insertAll<T>(
+  rows: T[],
+  insert: (rows: T[]) => PromiseLike<Response>
+): Promise<ItemResult[]> {
+  if (!rows.length) return [];
+
+  const { data, error } = await insert(rows);
+  if (!error) return (data ?? []).map((row, index) => ({ index, ok: true, data: row }));
+
+  return Promise.all(
+    rows.map(async (row, index) => {
+      const single = await insert([row]);
+      return single.error
+        ? { index, ok: false, error: toFailure(single.error) }
+        : { index, ok: true, data: single.data?.[0] ?? null };
+    })
+  );
+}
+
+/* Deletes every ID with one `in (...)` filter and reports which ones existed */
+async function deleteAll(
+  ids: string[],
+  remove: (ids: string[]) => PromiseLike<Response>
+): Promise<ItemResult[]> {
+  if (!ids.length) return [];
+
+  const { data, error } = await remove(ids);
+  if (error) return ids.map((_, index) => ({ index, ok: false, error: toFailure(error) }));
+
+  const deleted = new Set((data ?? []).map((row) => (row as { id: string }).id));
+  return ids.map((id, index) =>
+    deleted.has(id)
+      ? { index, ok: true, data: { id } }
+      : { index, ok: false, error: { message: "Not found", code: "PGRST116" } }
+  );
+}
+
+/* Postgres has no multi-row UPDATE with distinct values, so updates run concurrently */
+async function updateAll(
+  items: Input[],
+  update: (id: string, item: Input) => PromiseLike<Response>
+): Promise<ItemResult[]> {
+  return Promise.all(
+    items.map(async (item, index) => {
+      try {
+        const { data, error } = await update(item.id as string, item);
+        if (error) return { index, ok: false, error: toFailure(error) };
+        if (!data?.length) {
+          return { index, ok: false, error: { message: "Not found", code: "PGRST116" } };
+        }
+        return { index, ok: true, data: data[0] };
+      } catch (error) {
+        return { index, ok: false, error: toFailure(error) };
+      }
+    })
+  );
+}
+
+export async function createPatientsBulk(items: Input[]) {
+  const supabase = await createClient();
+  return insertAll(items.map(patientRow), (rows) =>
+    supabase.from("patients").insert(rows).select()
+  );
+}
+
+export async function createReportsBulk(items: Input[]) {
+  const supabase = await createClient();
+  return insertAll(items.map(reportRow), (rows) =>
+    supabase.from("reports").insert(rows).select()
+  );
+}
+
+export async function createTherapistsBulk(items: Input[]) {
+  const supabase = await createClient();
+  return insertAll(items.map(therapistRow), (rows) =>
+    supabase.from("therapists").insert(rows).select()
+  );
+}
+
+export async function updatePatientsBulk(items: Input[]) {
+  const supabase = await createClient();
+  return updateAll(items, (id, item) =>
+    supabase.from("patients").update(patientRow(item)).eq("id", id).select()
+  );
+}
+
+export async function updateReportsBulk(items: Input[]) {
+  const supabase = await createClient();
+  return updateAll(items, (id, item) => {
+    /* patient_id and therapist_id cannot be changed, as in updateReport */
+    // eslint-disable-next-line @typescript-eslint/no-unused-vars
+    const { patient_id, therapist_id, ...row } = reportRow(item);
+    return supabase
+      .from("reports")
+      .update({ ...row, updated_at: new Date().toISOString() })
+      .eq("id", id)
+      .select();
+  });
+}
+
+export async function updateTherapistsBulk(items: Input[]) {
+  const supabase = await createClient();
+  return updateAll(items, (id, item) =>
+    supabase.from("therapists").update(therapistRow(item)).eq("id", id).select()
+  );
+}
+
+export async function deletePatientsBulk(ids: string[]) {
+  const supabase = await createClient();
+  return deleteAll(ids, (batch) => supabase.from("patients").delete().in("id", batch).select("id"));
+}
+
+export async function deleteReportsBulk(ids: string[]) {
+  const supabase = await createClient();
+  return deleteAll(ids, (batch) => supabase.from("reports").delete().in("id", batch).select("id"));
+}
+
+export async function deleteTherapistsBulk(ids: string[]) {
+  const supabase = await createClient();
+  return deleteAll(ids, (batch) =>
+    supabase.from("therapists").delete().in("id", batch).select("id")
+  );
+}
@@ -0,0 +1,42 @@
+/*
+ * One-shot bridge entry point: reads a single `{ fn, args }` JSON document
+ * from stdin, dispatches it and prints the outcome as one JSON line, with a
+ * `timing` member breaking down where the process spent its time. Used when
+ * the keyword libraries run with SHARERAPY_BRIDGE_MODE=spawn.
+ *
+ *   echo '{"fn":"readReport","args":["<id>"]}' | npx tsx \
+ *     --tsconfig tests/robot/crud/resources/bridge/tsconfig.json \
+ *     tests/robot/crud/resources/bridge/call.ts
+ */
+import { performance } from "node:perf_hooks";
+import type { Call, Outcome } from "./dispatch";
+
+/* stdout carries the outcome, so library logging goes to stderr */
+console.log = console.error;
+console.info = console.error;
+console.debug = console.error;
+
+async function main() {
+  /* Everything up to here is Node boot plus transpiling this file */
+  const bootMs = performance.now();
+  const { dispatch, PARSE_ERROR } = await import("./dispatch");
+  const importMs = performance.now() - bootMs;
+
+  let input = "";
+  process.stdin.setEncoding("utf8");
+  for await (const chunk of process.stdin) input += chunk;
+
+  let outcome: Outcome;
+  const started = performance.now();
+  try {
+    outcome = await dispatch(JSON.parse(input) as Call);
+  } catch {
+    outcome = { error: { code: PARSE_ERROR, message: "Invalid JSON" } };
+  }
+  const nodeMs = performance.now() - started;
+
+  const timing = { timeOrigin: performance.timeOrigin, bootMs, importMs, nodeMs };
+  process.stdout.write(JSON.stringify({ ...outcome, timing }) + "\n");
+}
+
+void main();
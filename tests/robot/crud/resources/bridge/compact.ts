@@ -0,0 +1,64 @@
+/*
+ * Compact wire format for large list results, used for calls that pass
+ * `compact`.
+ *
+ * A `{ data, count }` page (or a bare row list) is sent column-wise: the
+ * column names once, then one value array per row. Nested objects such as
+ * `therapist` or `patient` are sent as JSON strings, so the Python side only
+ * builds a str for each of them and decodes it when a test reads that column
+ * (see compact_rows.py).
+ */
+type Row = Record<string, unknown>;
+
+export const COMPACT_KEY = "$compact";
+
+export type CompactRows = {
+  [COMPACT_KEY]: {
+    columns: string[];
+    /* Columns whose non-null values are JSON-encoded */
+    nested: string[];
+    rows: unknown[][];
+  };
+};
+
+function isRow(value: unknown): value is Row {
+  return !!value && typeof value === "object" && !Array.isArray(value);
+}
+
+export function compactRows(rows: unknown[]): CompactRows | unknown[] {
+  if (!rows.every(isRow)) return rows;
+
+  const columns: string[] = [];
+  const seen = new Set<string>();
+  const nested = new Set<string>();
+  for (const row of rows) {
+    for (const [column, value] of Object.entries(row)) {
+      if (!seen.has(column)) {
+        seen.add(column);
+        columns.push(column);
+      }
+      if (value !== null && typeof value === "object") nested.add(column);
+    }
+  }
+
+  return {
+    [COMPACT_KEY]: {
+      columns,
+      nested: [...nested],
+      rows: rows.map((row) =>
+        columns.map((column) => {
+          const value = row[column];
+          if (value === undefined) return null;
+          return nested.has(column) && value !== null ? JSON.stringify(value) : value;
+        })
+      ),
+    },
+  };
+}
+
+/* Compacts the rows of a list result, leaving anything else unchanged */
+export function compactResult(result: unknown): unknown {
+  if (Array.isArray(result)) return compactRows(result);
+  if (isRow(result) && Array.isArray(result.data)) return { ...result, data: compactRows(result.data) };
+  return result;
+}
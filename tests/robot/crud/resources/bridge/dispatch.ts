@@ -0,0 +1,104 @@
+/*
+ * Static dispatcher shared by the bridge entry points.
+ *
+ * Maps a function name to the matching lib/data or lib/actions export and
+ * calls it with JSON arguments, so callers never generate TypeScript. Both
+ * the long-lived worker and the one-shot `call.ts` entry point go through
+ * `dispatch`, which means tsx only ever transpiles these checked-in files and
+ * can reuse its compile cache between runs.
+ */
+import * as patientData from "@/lib/data/patients";
+import * as reportData from "@/lib/data/reports";
+import * as therapistData from "@/lib/data/therapists";
+import * as patientActions from "@/lib/actions/patients";
+import * as reportActions from "@/lib/actions/reports";
+import * as therapistActions from "@/lib/actions/therapists";
+import * as authActions from "@/lib/actions/auth";
+import * as bulk from "./bulk";
+import { compactResult } from "./compact";
+import { runOperations } from "./pipeline";
+import type { Operation } from "./pipeline";
+import { runWithFields } from "./projection";
+import * as session from "./session";
+import { runWithCookies } from "./shims/headers";
+
+type Method = (...args: never[]) => unknown;
+
+export type Call = {
+  fn: string;
+  args?: unknown[];
+  /* Top-level columns/embeds to return (see projection.ts); everything when absent */
+  fields?: string[];
+  /* Send list results column-wise (see compact.ts) */
+  compact?: boolean;
+  /* Initial cookie jar, e.g. a pooled session (see session.ts) */
+  cookies?: { name: string; value: string }[];
+};
+
+export type Outcome =
+  | { result: unknown }
+  | { error: { code: number; message: string; data?: { code?: string } } };
+
+const METHODS: Record<string, Method> = {
+  ...patientData,
+  ...reportData,
+  ...therapistData,
+  ...patientActions,
+  ...reportActions,
+  ...therapistActions,
+  ...authActions,
+  ...bulk,
+  ...session,
+  /* Steps share the caller's cookie jar, so a session signed in by one step is used by the next */
+  runOperations: (operations: Operation[]) => runOperations(operations, invoke),
+};
+
+/* Arguments tagged with this key are rebuilt as FormData for server actions */
+const FORM_DATA_KEY = "$formData";
+
+/* JSON-RPC error codes, also used by the one-shot entry point */
+export const PARSE_ERROR = -32700;
+export const METHOD_NOT_FOUND = -32601;
+export const SERVER_ERROR = -32000;
+
+function reviveArg(arg: unknown): unknown {
+  if (arg && typeof arg === "object" && FORM_DATA_KEY in arg) {
+    const fields = (arg as Record<string, Record<string, string>>)[FORM_DATA_KEY];
+    const formData = new FormData();
+    for (const [name, value] of Object.entries(fields)) formData.append(name, value);
+    return formData;
+  }
+  return arg;
+}
+
+/* Returns the target of a `redirect()` thrown by a server action, if any */
+function redirectTarget(error: unknown): string | undefined {
+  const digest = (error as { digest?: unknown } | null)?.digest;
+  if (typeof digest !== "string" || !digest.startsWith("NEXT_REDIRECT")) return undefined;
+  return digest.split(";")[2];
+}
+
+/* Calls `fn` in the current cookie jar */
+async function invoke(fn: string, args: unknown[] = [], fields?: string[], compact?: boolean): Promise<Outcome> {
+  const method = METHODS[fn];
+  if (!method) {
+    return { error: { code: METHOD_NOT_FOUND, message: `Unknown function: ${fn}` } };
+  }
+
+  try {
+    const result = await runWithFields(fields, async () =>
+      (method as (...args: unknown[]) => unknown)(...args.map(reviveArg))
+    );
+    return { result: compact ? compactResult(result ?? null) : result ?? null };
+  } catch (error) {
+    const redirect = redirectTarget(error);
+    if (redirect !== undefined) return { result: { redirect } };
+
+    const { message, code } = (error ?? {}) as { message?: string; code?: string };
+    return { error: { code: SERVER_ERROR, message: message ?? String(error), data: { code } } };
+  }
+}
+
+export async function dispatch({ fn, args = [], fields, compact, cookies }: Call): Promise<Outcome> {
+  return runWithCookies(cookies ?? [], () => invoke(fn, args, fields, compact));
+}
@@ -0,0 +1,117 @@
+/*
+ * Runs an ordered list of bridge calls in one bridge call, e.g. a whole
+ * create/read/update/delete lifecycle, so it pays for one round trip (and,
+ * in spawn mode, one Node start) instead of one per step.
+ *
+ * An operation can name its outcome with `as`, and any string argument of a
+ * later operation (including FormData fields) of the form `$name` is replaced
+ * by that outcome's record ID, and `$name.path` by a field of its result.
+ * `$$` escapes a literal leading `$`. The record ID is the `id` the caller
+ * gave the operation (the record a by-ID call acts on, which may itself be a
+ * reference), else the result's `id` or the ID in a server action's redirect.
+ *
+ * Operations run one after another in the caller's cookie jar, so a failure
+ * does not stop the list: it is reported for that operation, and operations
+ * referring to its outcome fail as unresolved.
+ */
+import type { Outcome } from "./dispatch";
+
+type Failure = { message: string; code?: string };
+
+export type Operation = {
+  fn: string;
+  args?: unknown[];
+  /* Name later operations use to refer to this one's outcome */
+  as?: string;
+  /* Record the operation acts on, when the caller knows it */
+  id?: string;
+};
+
+export type OperationResult = {
+  index: number;
+  ok: boolean;
+  id?: string;
+  data?: unknown;
+  error?: Failure;
+  /* Milliseconds spent in the operation */
+  ms: number;
+};
+
+type Invoke = (fn: string, args: unknown[]) => Promise<Outcome>;
+
+type Named = { id?: string; data: unknown };
+
+const REFERENCE = /^\$(\w+)(?:\.([\w.]+))?$/;
+
+class UnresolvedReference extends Error {}
+
+function redirectId(data: unknown): string | undefined {
+  const redirect = (data as { redirect?: unknown } | null)?.redirect;
+  if (typeof redirect !== "string") return undefined;
+  return redirect.split("?")[0].replace(/\/+$/, "").split("/").pop() || undefined;
+}
+
+function recordId(data: unknown): string | undefined {
+  const id = (data as { id?: unknown } | null)?.id;
+  return typeof id === "string" ? id : redirectId(data);
+}
+
+function lookup(reference: string, named: Map<string, Named>): unknown {
+  const [, name, path] = reference.match(REFERENCE)!;
+  const target = named.get(name);
+  if (!target) throw new UnresolvedReference(`Unresolved reference ${reference}`);
+  if (!path) {
+    if (target.id === undefined) throw new UnresolvedReference(`Unresolved reference ${reference}`);
+    return target.id;
+  }
+  let value = target.data;
+  for (const key of path.split(".")) {
+    value = value && typeof value === "object" ? (value as Record<string, unknown>)[key] : undefined;
+  }
+  if (value === undefined) throw new UnresolvedReference(`Unresolved reference ${reference}`);
+  return value;
+}
+
+/* Replaces the references in `value`, keeping the type of references placed in FormData strings */
+function resolve(value: unknown, named: Map<string, Named>, inForm = false): unknown {
+  if (typeof value === "string") {
+    if (value.startsWith("$$")) return value.slice(1);
+    if (!REFERENCE.test(value)) return value;
+    const resolved = lookup(value, named);
+    return inForm && typeof resolved !== "string" ? JSON.stringify(resolved) : resolved;
+  }
+  if (Array.isArray(value)) return value.map((item) => resolve(item, named, inForm));
+  if (value && typeof value === "object") {
+    return Object.fromEntries(
+      Object.entries(value).map(([key, item]) => [key, resolve(item, named, inForm || key === "$formData")])
+    );
+  }
+  return value;
+}
+
+export async function runOperations(operations: Operation[], invoke: Invoke): Promise<OperationResult[]> {
+  const named = new Map<string, Named>();
+  const results: OperationResult[] = [];
+
+  for (const [index, operation] of operations.entries()) {
+    const started = performance.now();
+    let result: Omit<OperationResult, "ms">;
+    try {
+      const id = resolve(operation.id, named) as string | undefined;
+      const args = resolve(operation.args ?? [], named) as unknown[];
+      const outcome = await invoke(operation.fn, args);
+      if ("error" in outcome) {
+        const { message, data } = outcome.error;
+        result = { index, ok: false, id, error: { message, code: data?.code } };
+      } else {
+        result = { index, ok: true, id: id ?? recordId(outcome.result), data: outcome.result };
+      }
+    } catch (error) {
+      if (!(error instanceof UnresolvedReference)) throw error;
+      result = { index, ok: false, error: { message: error.message } };
+    }
+    if (operation.as && result.ok) named.set(operation.as, { id: result.id, data: result.data });
+    results.push({ ...result, ms: performance.now() - started });
+  }
+  return results;
+}
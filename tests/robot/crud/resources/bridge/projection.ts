@@ -0,0 +1,109 @@
+/*
+ * Field projection for bridge calls that pass `fields`.
+ *
+ * The lib/data read functions hard-code wide selects (every column plus
+ * several levels of joins). Rather than changing them, the projection is
+ * applied to the PostgREST requests they make: while a projected call runs,
+ * the `select` parameter of every REST request is narrowed to the requested
+ * top-level columns and embeds. Embeds that still change which rows come
+ * back (`!inner` joins and embeds named by a filter such as
+ * `clinic.country_id`) are kept, reduced to the columns those filters need,
+ * and stripped from the rows afterwards together with anything the data
+ * function added itself.
+ */
+import { AsyncLocalStorage } from "node:async_hooks";
+
+const storage = new AsyncLocalStorage<string[]>();
+
+/* Query parameters that are not filters */
+const NON_FILTERS = new Set(["select", "order", "limit", "offset", "columns", "on_conflict", "or", "and"]);
+
+const EMBED = /^(?:(\w+):)?(\w+)(!\w+)?\((.*)\)$/s;
+
+/* Splits a select list on its top-level commas */
+function items(select: string): string[] {
+  const result: string[] = [];
+  let depth = 0;
+  let current = "";
+  for (const char of select) {
+    if (char === "," && depth === 0) {
+      result.push(current.trim());
+      current = "";
+      continue;
+    }
+    if (char === "(") depth++;
+    if (char === ")") depth--;
+    current += char;
+  }
+  if (current.trim()) result.push(current.trim());
+  return result;
+}
+
+/*
+ * Narrows a PostgREST select list to `fields`, keeping (reduced) the embeds
+ * that `!inner` or the dotted filter `paths` depend on.
+ */
+export function projectSelect(select: string, fields: string[], paths: string[]): string {
+  const kept = new Set<string>();
+  const columns = new Set(paths.filter((path) => !path.includes(".")));
+  const embeds: string[] = [];
+
+  for (const item of items(select)) {
+    const match = EMBED.exec(item);
+    if (!match) continue;
+    const [, alias, table, hint = "", inner] = match;
+    const name = alias ?? table;
+    kept.add(name);
+    if (fields.includes(name)) {
+      embeds.push(item);
+      continue;
+    }
+    const nested = paths
+      .filter((path) => path.startsWith(`${name}.`))
+      .map((path) => path.slice(name.length + 1));
+    if (hint === "!inner" || nested.length) {
+      const prefix = alias ? `${alias}:${table}` : table;
+      embeds.push(`${prefix}${hint}(${projectSelect(inner, [], nested)})`);
+    }
+  }
+
+  for (const field of fields) if (!kept.has(field)) columns.add(field);
+  return [...columns, ...embeds].join(",");
+}
+
+function pick(row: unknown, fields: string[]): unknown {
+  if (!row || typeof row !== "object" || Array.isArray(row)) return row;
+  const source = row as Record<string, unknown>;
+  return Object.fromEntries(fields.filter((field) => field in source).map((field) => [field, source[field]]));
+}
+
+/* Trims rows (a list, a `{ data, count }` page or a single row) to `fields` */
+export function projectResult(result: unknown, fields: string[]): unknown {
+  if (Array.isArray(result)) return result.map((row) => pick(row, fields));
+  if (result && typeof result === "object" && Array.isArray((result as { data?: unknown }).data)) {
+    const page = result as { data: unknown[] };
+    return { ...page, data: page.data.map((row) => pick(row, fields)) };
+  }
+  return pick(result, fields);
+}
+
+export async function runWithFields<T>(fields: string[] | undefined, callback: () => Promise<T>) {
+  if (!fields?.length) return callback();
+  return projectResult(await storage.run(fields, callback), fields);
+}
+
+/* supabase-js picks up the global fetch whenever a client is created, i.e. on every call */
+const baseFetch = globalThis.fetch;
+
+globalThis.fetch = (input, init) => {
+  const fields = storage.getStore();
+  if (!fields || typeof input !== "string" || !input.includes("/rest/v1/")) return baseFetch(input, init);
+
+  const url = new URL(input);
+  const select = url.searchParams.get("select");
+  if (select) {
+    const paths = [...url.searchParams.keys()].filter((key) => !NON_FILTERS.has(key));
+    url.searchParams.set("select", projectSelect(select, fields, paths));
+  }
+  return baseFetch(url.toString(), init);
+};
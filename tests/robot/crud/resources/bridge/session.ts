@@ -0,0 +1,54 @@
+/*
+ * Session helpers for the Python session pool (session_pool.py).
+ *
+ * A Supabase session lives in the auth cookies that @supabase/ssr writes
+ * through `next/headers`. Within a bridge call those go to the call's cookie
+ * jar (see shims/headers.ts), so these helpers return the jar for the pool to
+ * keep. Later calls pass it back as the call's `cookies`, and lib/data and
+ * lib/actions then run as that user. Reading the session from the cookies
+ * needs no request to Supabase.
+ */
+import { login } from "@/lib/actions/auth";
+import { createClient } from "@/lib/supabase/server";
+import { cookies } from "./shims/headers";
+
+export type SessionState = {
+  cookies: { name: string; value: string }[];
+  userId: string | null;
+  accessToken: string | null;
+  /* Epoch seconds */
+  expiresAt: number | null;
+};
+
+async function currentSession(): Promise<SessionState> {
+  const supabase = await createClient();
+  const { data, error } = await supabase.auth.getSession();
+  if (error) throw error;
+  return {
+    cookies: (await cookies()).getAll(),
+    userId: data.session?.user.id ?? null,
+    accessToken: data.session?.access_token ?? null,
+    expiresAt: data.session?.expires_at ?? null,
+  };
+}
+
+/* Signs in through the real login action and returns the resulting session */
+export async function startSession(formData: FormData) {
+  await login(formData);
+  return currentSession();
+}
+
+/* Exchanges the refresh token in the call's cookies for a new session */
+export async function refreshSession() {
+  const supabase = await createClient();
+  const { error } = await supabase.auth.refreshSession();
+  if (error) throw error;
+  return currentSession();
+}
+
+export async function endSession() {
+  const supabase = await createClient();
+  const { error } = await supabase.auth.signOut();
+  if (error) throw error;
+  return null;
+}
@@ -0,0 +1,10 @@
+/*
+ * Stand-in for `next/cache` inside the bridge worker. There is no route cache
+ * to revalidate outside of Next, so these are no-ops.
+ */
+
+// eslint-disable-next-line @typescript-eslint/no-unused-vars
+export function revalidatePath(path: string, type?: "layout" | "page") {}
+
+// eslint-disable-next-line @typescript-eslint/no-unused-vars
+export function revalidateTag(tag: string) {}
@@ -0,0 +1,49 @@
+import { AsyncLocalStorage } from "node:async_hooks";
+
+/*
+ * Stand-in for `next/headers` inside the bridge worker. There is no request
+ * scope outside of Next, so every bridge call gets its own in-memory cookie
+ * jar instead.
+ */
+
+type Cookie = { name: string; value: string };
+
+/* Kept on globalThis so the jar is shared even if this file is loaded twice */
+const JAR_KEY = Symbol.for("sharerapy.bridge.cookies");
+const globalStore = globalThis as { [JAR_KEY]?: AsyncLocalStorage<Map<string, string>> };
+const storage = (globalStore[JAR_KEY] ??= new AsyncLocalStorage<Map<string, string>>());
+
+export function runWithCookies<T>(initial: Cookie[], callback: () => T): T {
+  return storage.run(new Map(initial.map(({ name, value }) => [name, value])), callback);
+}
+
+function currentJar(): Map<string, string> {
+  return storage.getStore() ?? new Map();
+}
+
+export async function cookies() {
+  const jar = currentJar();
+
+  return {
+    get(name: string): Cookie | undefined {
+      const value = jar.get(name);
+      return value === undefined ? undefined : { name, value };
+    },
+    getAll(): Cookie[] {
+      return Array.from(jar, ([name, value]) => ({ name, value }));
+    },
+    has(name: string): boolean {
+      return jar.has(name);
+    },
+    set(name: string, value: string) {
+      jar.set(name, value);
+    },
+    delete(name: string) {
+      jar.delete(name);
+    },
+  };
+}
+
+export async function headers() {
+  return new Headers();
+}
@@ -0,0 +1,28 @@
+/*
+ * Stand-in for `next/navigation` inside the bridge worker. Server actions end
+ * with `redirect(...)`, so this throws an error carrying the same digest Next
+ * uses and the worker reports the target URL as the call's result.
+ */
+
+export class RedirectError extends Error {
+  digest: string;
+
+  constructor(url: string, type: string = "replace") {
+    super("NEXT_REDIRECT");
+    this.digest = `NEXT_REDIRECT;${type};${url};307;`;
+  }
+}
+
+export function redirect(url: string, type?: string): never {
+  throw new RedirectError(url, type);
+}
+
+export function permanentRedirect(url: string, type?: string): never {
+  throw new RedirectError(url, type);
+}
+
+export function notFound(): never {
+  const error = new Error("NEXT_NOT_FOUND") as Error & { digest: string };
+  error.digest = "NEXT_HTTP_ERROR_FALLBACK;404";
+  throw error;
+}
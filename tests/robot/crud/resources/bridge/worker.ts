@@ -0,0 +1,87 @@
+/*
+ * Long-lived bridge worker for the Robot Framework CRUD keyword libraries.
+ *
+ * Loads the lib/data and lib/actions modules once, then answers JSON-RPC 2.0
+ * requests read line by line from stdin. Each request's method names a
+ * function known to the dispatcher (see dispatch.ts) and its params are the
+ * positional arguments; the response is written as a single JSON line on
+ * stdout, with a non-standard `timing` member carrying how long the call took
+ * in Node. The `ready` notification reports start-up timings the same way.
+ * Start it with the bridge tsconfig so the `next/*` imports resolve to the
+ * shims next to this file:
+ *
+ *   npx tsx --tsconfig tests/robot/crud/resources/bridge/tsconfig.json \
+ *     tests/robot/crud/resources/bridge/worker.ts
+ */
+import { createInterface } from "node:readline";
+import { performance } from "node:perf_hooks";
+import type { Outcome } from "./dispatch";
+
+type Request = {
+  jsonrpc: "2.0";
+  id: number | string;
+  method: string;
+  params?: unknown[];
+  /* Non-standard: narrow the result to these fields (see projection.ts) */
+  fields?: string[];
+  /* Non-standard: send list results column-wise (see compact.ts) */
+  compact?: boolean;
+  /* Non-standard: the call's initial cookie jar (see session.ts) */
+  cookies?: { name: string; value: string }[];
+};
+
+/* stdout carries the protocol, so library logging goes to stderr */
+console.log = console.error;
+console.info = console.error;
+console.debug = console.error;
+
+function send(message: object) {
+  process.stdout.write(JSON.stringify({ jsonrpc: "2.0", ...message }) + "\n");
+}
+
+/* Health check used by the Python pool before reusing an idle worker */
+const PING = "$ping";
+
+async function main() {
+  /* Everything up to here is Node boot plus transpiling this file */
+  const bootMs = performance.now();
+  const { dispatch, PARSE_ERROR } = await import("./dispatch");
+  const importMs = performance.now() - bootMs;
+
+  async function handle(request: Request) {
+    if (request.method === PING) {
+      send({ id: request.id, result: "pong" });
+      return;
+    }
+    const started = performance.now();
+    const outcome: Outcome = await dispatch({
+      fn: request.method,
+      args: request.params,
+      fields: request.fields,
+      compact: request.compact,
+      cookies: request.cookies,
+    });
+    send({ id: request.id, ...outcome, timing: { nodeMs: performance.now() - started } });
+  }
+
+  const lines = createInterface({ input: process.stdin });
+
+  lines.on("line", (line) => {
+    if (!line.trim()) return;
+
+    let request: Request;
+    try {
+      request = JSON.parse(line);
+    } catch {
+      send({ id: null, error: { code: PARSE_ERROR, message: "Invalid JSON" } });
+      return;
+    }
+    void handle(request);
+  });
+
+  lines.on("close", () => process.exit(0));
+
+  send({ method: "ready", params: { timeOrigin: performance.timeOrigin, bootMs, importMs } });
+}
+
+void main();
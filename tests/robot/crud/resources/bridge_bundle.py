@@ -0,0 +1,140 @@
+# bridge_bundle.py
+"""On-disk bundle cache for the bridge entry points.
+
+Running bridge/worker.ts and bridge/call.ts through `npx tsx` means resolving
+tsx and transpiling dispatch.ts, lib/data, lib/actions, lib/supabase and the
+shims every time a process starts. Instead, both entry points are bundled once
+with esbuild into plain ES modules under bridge/.cache/<key>/, and the bridge
+runs those with `node`. npm packages stay external and load from the project's
+node_modules as usual.
+
+The key is a hash of every TypeScript source the bundle can include (lib/,
+the bridge directory), the tsconfig files, package.json/package-lock.json and
+the esbuild version, so a bundle is rebuilt only when one of them changes.
+Sources are re-hashed only when their size or mtime changes. When building
+fails (e.g. esbuild can't be fetched), the bridge falls back to tsx.
+
+Tuning (environment variables):
+  SHARERAPY_BRIDGE_BUNDLE      0 disables bundling and always runs tsx (default 1)
+  SHARERAPY_BRIDGE_BUNDLE_DIR  where bundles are kept (default bridge/.cache)
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+RESOURCES_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(RESOURCES_DIR, '..', '..', '..', '..'))
+BRIDGE_DIR = os.path.join(RESOURCES_DIR, 'bridge')
+BRIDGE_TSCONFIG = os.path.join(BRIDGE_DIR, 'tsconfig.json')
+
+BUNDLE_ENABLED = os.environ.get('SHARERAPY_BRIDGE_BUNDLE', '1') != '0'
+BUNDLE_DIR = os.environ.get('SHARERAPY_BRIDGE_BUNDLE_DIR', os.path.join(BRIDGE_DIR, '.cache'))
+# Pinned so the same sources always give the same bundle; part of the key
+ESBUILD_VERSION = '0.24.0'
+ENTRY_POINTS = ('worker.ts', 'call.ts')
+BUILD_TIMEOUT = 300.0
+# Bundles kept besides the current one, for other checkouts sharing the directory
+KEEP_BUNDLES = 3
+
+SOURCE_DIRS = (os.path.join(PROJECT_ROOT, 'lib'), BRIDGE_DIR)
+SOURCE_FILES = (
+    os.path.join(PROJECT_ROOT, 'tsconfig.json'),
+    os.path.join(PROJECT_ROOT, 'package.json'),
+    os.path.join(PROJECT_ROOT, 'package-lock.json'),
+)
+SOURCE_SUFFIXES = ('.ts', '.tsx', '.js', '.mjs', '.json')
+
+
+class BundleCache:
+    """Builds and locates the bundled bridge entry points"""
+
+    def __init__(self, directory: str = BUNDLE_DIR, enabled: bool = BUNDLE_ENABLED):
+        self.directory = directory
+        self.enabled = enabled
+        # Set once building failed, so every call doesn't retry it
+        self.failed = False
+        self._stamp: Optional[Tuple] = None
+        self._key: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _sources(self) -> List[str]:
+        paths = [path for path in SOURCE_FILES if os.path.exists(path)]
+        for root in SOURCE_DIRS:
+            for directory, subdirectories, files in os.walk(root):
+                subdirectories[:] = sorted(d for d in subdirectories if not d.startswith('.') and d != 'node_modules')
+                paths.extend(os.path.join(directory, name) for name in sorted(files) if name.endswith(SOURCE_SUFFIXES))
+        return paths
+
+    def key(self) -> str:
+        """Content hash of the bundle's inputs; only re-read when a file's size or mtime changes"""
+        sources = self._sources()
+        stamp = tuple((path, stat.st_size, stat.st_mtime_ns) for path in sources for stat in [os.stat(path)])
+        if stamp != self._stamp:
+            digest = hashlib.sha256(f"esbuild {ESBUILD_VERSION}\n".encode())
+            for path in sources:
+                digest.update(os.path.relpath(path, PROJECT_ROOT).encode() + b'\0')
+                with open(path, 'rb') as source:
+                    digest.update(hashlib.sha256(source.read()).digest())
+            self._stamp, self._key = stamp, digest.hexdigest()[:16]
+        return self._key
+
+    def script(self, entry: str) -> Optional[str]:
+        """Path of the bundled `entry` (e.g. worker.ts), building it if needed; None to use tsx"""
+        if not self.enabled or self.failed:
+            return None
+        with self._lock:
+            target = os.path.join(self.directory, self.key())
+            if not os.path.isdir(target):
+                try:
+                    self._build(target)
+                except (OSError, subprocess.SubprocessError, RuntimeError) as e:
+                    self.failed = True
+                    print(f"*WARN* Could not bundle the bridge, falling back to tsx: {e}")
+                    return None
+        return os.path.join(target, os.path.splitext(os.path.basename(entry))[0] + '.mjs')
+
+    def _build(self, target: str):
+        npx = shutil.which('npx')
+        if not npx:
+            raise RuntimeError("npx not found on PATH")
+        os.makedirs(self.directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='build-', dir=self.directory)
+        started = time.perf_counter()
+        try:
+            result = subprocess.run(
+                [npx, '--yes', f"esbuild@{ESBUILD_VERSION}",
+                 *(os.path.join(BRIDGE_DIR, entry) for entry in ENTRY_POINTS),
+                 '--bundle', '--platform=node', '--format=esm', '--target=node18',
+                 '--packages=external', f"--tsconfig={BRIDGE_TSCONFIG}",
+                 f"--outdir={staging}", '--out-extension:.js=.mjs', '--log-level=error'],
+                capture_output=True, text=True, cwd=PROJECT_ROOT, timeout=BUILD_TIMEOUT,
+            )
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or f"esbuild exited with {result.returncode}")
+            try:
+                # Atomic, so processes building the same key at once don't see half a bundle
+                os.rename(staging, target)
+            except OSError:
+                if not os.path.isdir(target):
+                    raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        print(f"Bundled the bridge into {target} in {time.perf_counter() - started:.1f} s")
+        self._prune(target)
+
+    def _prune(self, current: str):
+        bundles = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                   if not name.startswith('build-')]
+        bundles = sorted((path for path in bundles if path != current and os.path.isdir(path)),
+                         key=os.path.getmtime, reverse=True)
+        for path in bundles[KEEP_BUNDLES:]:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# Shared by both bridge transports in this process
+bundle_cache = BundleCache()
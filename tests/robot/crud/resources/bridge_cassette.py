@@ -0,0 +1,151 @@
+# bridge_cassette.py
+"""Record/replay of bridge calls, for fast offline iteration on the suites.
+
+In record mode every call that the backend answered (with a result or with a
+backend error) is kept, and the cassette is written when the process exits.
+Processes recording at the same time (pabot) merge into the one cassette
+under a file lock: the keys a process recorded replace what the file held for
+them, and other keys are kept, so the last process to exit doesn't drop the
+others' calls.
+In replay mode calls are answered from the cassette alone: no Node process is
+started and nothing goes over the network. A call missing from the cassette
+fails with BridgeError, so the libraries serve their local fallbacks.
+
+Calls are keyed by function name and a hash of their normalized arguments
+and options (fields, compact). Cookies are left out, since tokens change from
+run to run. A key called several times replays its responses in recorded
+order, so a read after an update sees the updated row; once they run out the
+last one is repeated.
+
+The cassette is gzipped JSON lines, `<key>\\t<outcome JSON>` per response. It
+is loaded into a dict once, so each lookup is a dict access plus decoding
+that one response.
+
+Tuning (environment variables):
+  SHARERAPY_BRIDGE_CASSETTE_MODE  passthrough (default), record or replay
+  SHARERAPY_BRIDGE_CASSETTE       cassette file (default cassettes/crud.jsonl.gz)
+"""
+import atexit
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves aren't serialized across processes
+    fcntl = None
+
+RESOURCES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CASSETTE_MODES = ('passthrough', 'record', 'replay')
+CASSETTE_MODE = os.environ.get('SHARERAPY_BRIDGE_CASSETTE_MODE', 'passthrough')
+CASSETTE_PATH = os.environ.get('SHARERAPY_BRIDGE_CASSETTE',
+                               os.path.join(RESOURCES_DIR, 'cassettes', 'crud.jsonl.gz'))
+
+
+def cassette_key(method: str, args: List[Any], options: Optional[Dict[str, Any]] = None) -> str:
+    """`method:hash` of the arguments and the options that change the response"""
+    options = {name: value for name, value in (options or {}).items() if name != 'cookies'}
+    normalized = json.dumps([args, options], sort_keys=True, separators=(',', ':'), default=str)
+    return f"{method}:{hashlib.sha1(normalized.encode()).hexdigest()[:20]}"
+
+
+class Cassette:
+    """Recorded bridge responses, keyed by cassette_key"""
+
+    def __init__(self, path: str = CASSETTE_PATH, mode: str = CASSETTE_MODE):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        # key -> encoded outcomes in call order
+        self._entries: Dict[str, List[str]] = {}
+        # key -> responses replayed so far
+        self._cursors: Dict[str, int] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == 'record'
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+    def record(self, method: str, args: List[Any], options: Optional[Dict[str, Any]],
+               result: Any = None, error: Optional[BaseException] = None):
+        """Keep a call's result, or the backend error it raised"""
+        if error is not None:
+            outcome = {'error': str(error), 'code': getattr(error, 'code', None)}
+        else:
+            outcome = {'result': result}
+        encoded = json.dumps(outcome, separators=(',', ':'), default=str)
+        with self._lock:
+            self._entries.setdefault(cassette_key(method, args, options), []).append(encoded)
+
+    def replay(self, method: str, args: List[Any], options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """The next recorded outcome (`{result}` or `{error, code}`) for this call, or None if there is none"""
+        key = cassette_key(method, args, options)
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            outcomes = self._entries.get(key)
+            if not outcomes:
+                self.misses += 1
+                return None
+            position = self._cursors.get(key, 0)
+            self._cursors[key] = position + 1
+            self.hits += 1
+        # Decoded per call, so callers never share (and mutate) one response
+        return json.loads(outcomes[min(position, len(outcomes) - 1)])
+
+    def _load(self):
+        self._loaded = True
+        if not os.path.exists(self.path):
+            print(f"*WARN* No bridge cassette at {self.path}, every call will miss")
+            return
+        self._entries.update(self._read())
+
+    def _read(self) -> Dict[str, List[str]]:
+        entries: Dict[str, List[str]] = {}
+        with gzip.open(self.path, 'rt', encoding='utf8') as cassette:
+            for line in cassette:
+                key, _, outcome = line.rstrip('\n').partition('\t')
+                entries.setdefault(key, []).append(outcome)
+        return entries
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Hold `<cassette>.lock` exclusively, so concurrent saves merge one after another"""
+        with open(f"{self.path}.lock", 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def save(self):
+        """Merge the recorded calls into the cassette, replacing what it held for the same keys"""
+        if not self.recording or not self._entries:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        staging = f"{self.path}.{os.getpid()}.tmp"
+        with self._lock, self._file_lock():
+            merged = self._read() if os.path.exists(self.path) else {}
+            merged.update(self._entries)
+            with gzip.open(staging, 'wt', encoding='utf8') as cassette:
+                for key, outcomes in merged.items():
+                    for outcome in outcomes:
+                        cassette.write(f"{key}\t{outcome}\n")
+            os.replace(staging, self.path)
+        print(f"Recorded {sum(map(len, self._entries.values()))} bridge responses to {self.path}")
+
+
+# Shared by the bridge in this process
+cassette = Cassette()
+atexit.register(cassette.save)
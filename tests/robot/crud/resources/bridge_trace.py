@@ -0,0 +1,200 @@
+# bridge_trace.py
+"""Per-phase latency of bridge calls.
+
+TsxBridge fills in one phase dict (milliseconds) per call and hands it to the
+shared Tracer:
+
+  queue     waiting for a free worker
+  launch    until the Node process running the bridge script starts: npx
+            resolution and the tsx CLI, or next to nothing for a cached
+            bundle (only when a process was started)
+  boot      Node start-up and transpiling (tsx) or loading (bundle) the entry
+  import    loading, and under tsx on a cold cache transpiling, dispatch.ts
+            and lib/*
+  node      the dispatched function itself, i.e. the Supabase round trip
+  transit   pipes and JSON encoding around the call, plus process exit
+  parse     decoding the response JSON in Python
+  total     the whole call as seen by the keyword
+
+Each call is printed into the calling keyword's log. When SHARERAPY_BRIDGE_TRACE
+names a file, every call is also appended to it as a JSON line. The keyword
+libraries register `trace_listener`, which adds a p50/p95/max table per keyword
+and phase to each suite's metadata.
+
+Calls are not kept: each one is folded into per suite, keyword and phase
+samples as it comes in, which hold the number of calls and their latest
+SHARERAPY_BRIDGE_TRACE_SAMPLES timings (default 1000). The samples are
+dropped once the top-level suite has reported them, so a long run's memory
+stays bounded. Code that needs the calls themselves adds a hook.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+TRACE_FILE = os.environ.get('SHARERAPY_BRIDGE_TRACE')
+TRACE_SAMPLES = int(os.environ.get('SHARERAPY_BRIDGE_TRACE_SAMPLES', '1000'))
+
+PHASES = ('queue', 'launch', 'boot', 'import', 'node', 'transit', 'parse', 'total')
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100.0 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class Tracer:
+    """Collects bridge call timings, tagged with the Robot suite/test/keyword running them"""
+
+    def __init__(self, path: Optional[str] = TRACE_FILE, max_samples: int = TRACE_SAMPLES):
+        self.path = path
+        self.max_samples = max_samples
+        # Print each call into the keyword log (benchmarks turn this off)
+        self.echo = True
+        # Called with every record, in the thread that made the call
+        self.hooks: List[Callable[[Dict[str, Any]], None]] = []
+        # (suite, keyword, phase) -> [calls, latest timings]
+        self._samples: Dict[Tuple[Optional[str], str, str], List[Any]] = {}
+        self.suite: Optional[str] = None
+        self.test: Optional[str] = None
+        self.keywords: List[str] = []
+        self._lock = threading.Lock()
+
+    def record(self, method: str, mode: str, phases: Dict[str, float], ok: bool):
+        record = {
+            "ts": time.time(),
+            "suite": self.suite,
+            "test": self.test,
+            "keyword": self.keywords[-1] if self.keywords else None,
+            "method": method,
+            "mode": mode,
+            "ok": ok,
+            "phases": {phase: round(phases[phase], 3) for phase in PHASES if phase in phases},
+        }
+        keyword = record["keyword"] or method
+        with self._lock:
+            for phase, ms in record["phases"].items():
+                entry = self._samples.get((self.suite, keyword, phase))
+                if entry is None:
+                    entry = self._samples[(self.suite, keyword, phase)] = [0, deque(maxlen=self.max_samples)]
+                entry[0] += 1
+                entry[1].append(ms)
+            if self.path:
+                with open(self.path, 'a', encoding='utf8') as trace:
+                    trace.write(json.dumps(record) + '\n')
+        for hook in self.hooks:
+            hook(record)
+        if not self.echo:
+            return
+        timings = ' | '.join(f"{phase} {ms:.1f} ms" for phase, ms in record["phases"].items())
+        print(f"Bridge {method} ({mode}{'' if ok else ', failed'}): {timings}")
+
+    def summary(self, suite: Optional[str] = None) -> List[Dict[str, Any]]:
+        """p50/p95/max per (keyword, phase), for one suite and its children or for everything.
+
+        `count` is every call; the percentiles are over the latest `max_samples` per suite.
+        """
+        counts: Dict[Tuple[str, str], int] = {}
+        samples: Dict[Tuple[str, str], List[float]] = {}
+        with self._lock:
+            for (record_suite, keyword, phase), (calls, values) in self._samples.items():
+                if suite and not (record_suite == suite or (record_suite or '').startswith(suite + '.')):
+                    continue
+                counts[(keyword, phase)] = counts.get((keyword, phase), 0) + calls
+                samples.setdefault((keyword, phase), []).extend(values)
+
+        order = {phase: index for index, phase in enumerate(PHASES)}
+        return [
+            {
+                "keyword": keyword,
+                "phase": phase,
+                "count": counts[(keyword, phase)],
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "max": max(values),
+            }
+            for (keyword, phase), values in sorted(samples.items(), key=lambda item: (item[0][0], order[item[0][1]]))
+        ]
+
+    def reset(self):
+        """Drop the samples collected so far"""
+        with self._lock:
+            self._samples.clear()
+
+    def summary_table(self, suite: Optional[str] = None) -> str:
+        """The summary as a Robot documentation table (rendered in log.html)"""
+        rows = self.summary(suite)
+        if not rows:
+            return ''
+        lines = ['| =Keyword= | =Phase= | =Calls= | =p50 ms= | =p95 ms= | =max ms= |']
+        for row in rows:
+            lines.append(f"| {row['keyword']} | {row['phase']} | {row['count']} | "
+                         f"{row['p50']:.1f} | {row['p95']:.1f} | {row['max']:.1f} |")
+        return '\n'.join(lines)
+
+
+class TraceListener:
+    """Robot listener keeping the Tracer's suite/test/keyword context current.
+
+    Library listeners only hear about events after the library is imported,
+    so the suite is taken from each test's or keyword's parents instead of
+    relying on start_suite. Every keyword library registers this same
+    instance, so events may arrive more than once per keyword; the stack only
+    changes for new keywords.
+    """
+
+    ROBOT_LISTENER_API_VERSION = 3
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._keywords: List[Any] = []
+
+    @staticmethod
+    def _full_name(suite) -> str:
+        return getattr(suite, 'full_name', None) or suite.longname
+
+    def _enter(self, item):
+        # Walk up to the running suite (the only parent with child suites)
+        suite = item
+        while suite is not None and not hasattr(suite, 'suites'):
+            suite = getattr(suite, 'parent', None)
+        if suite is not None:
+            self.tracer.suite = self._full_name(suite)
+
+    def end_suite(self, data, result):
+        table = self.tracer.summary_table(self._full_name(result))
+        if table:
+            result.metadata['Bridge latency'] = table
+        if result.parent is None:
+            # Every suite has reported its calls
+            self.tracer.reset()
+
+    def start_test(self, data, result):
+        self._enter(result)
+        self.tracer.test = result.name
+
+    def end_test(self, data, result):
+        self.tracer.test = None
+
+    def start_keyword(self, data, result):
+        if self._keywords and self._keywords[-1] is result:
+            return
+        self._enter(result)
+        self._keywords.append(result)
+        self.tracer.keywords.append(result.name)
+
+    def end_keyword(self, data, result):
+        if not self._keywords or self._keywords[-1] is not result:
+            return
+        self._keywords.pop()
+        self.tracer.keywords.pop()
+
+
+# Shared by the bridge and the keyword libraries in this process
+tracer = Tracer()
+trace_listener = TraceListener(tracer)
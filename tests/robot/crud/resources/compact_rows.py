@@ -0,0 +1,109 @@
+# compact_rows.py
+"""Compact, lazily decoded rows for large list results.
+
+List keywords called with ``compact=True`` return their rows as a CompactRows
+sequence instead of a list of dicts. The bridge sends such results column-wise
+(see bridge/compact.ts): the column names once, then one value list per row,
+with nested objects such as ``therapist`` or ``patient`` still JSON-encoded.
+Rows keep those strings and only decode a nested column the first time it is
+read, so a page whose tests only look at ``id`` never builds the nested dicts.
+
+Each row is a read-only Mapping, so ``${row}[id]``, ``in`` and ``.get`` work
+as they do on dicts; call ``dict(row)`` for a mutable copy.
+"""
+import json
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+COMPACT_KEY = '$compact'
+
+
+class CompactRow(Mapping):
+    """One row: a view over its table's columns and its own value list"""
+
+    __slots__ = ('_table', '_values')
+
+    def __init__(self, table: 'CompactRows', values: List[Any]):
+        self._table = table
+        self._values = values
+
+    def __getitem__(self, column: str) -> Any:
+        index = self._table.positions[column]
+        value = self._values[index]
+        if index in self._table.nested and isinstance(value, str):
+            # Decode once; later reads get the object
+            value = self._values[index] = json.loads(value)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table.columns)
+
+    def __len__(self) -> int:
+        return len(self._table.columns)
+
+    def __contains__(self, column: object) -> bool:
+        return column in self._table.positions
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class CompactRows(Sequence):
+    """Rows sharing one column list; rows are built on access, not stored"""
+
+    __slots__ = ('columns', 'positions', 'nested', '_rows')
+
+    def __init__(self, columns: List[str], rows: List[List[Any]], nested: Iterable[str] = ()):
+        self.columns = tuple(columns)
+        self.positions = {column: position for position, column in enumerate(self.columns)}
+        self.nested = frozenset(self.positions[column] for column in nested)
+        self._rows = rows
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> 'CompactRows':
+        """Compact already decoded dicts (the local fallbacks)"""
+        rows = list(rows)
+        columns: Dict[str, None] = {}
+        for row in rows:
+            columns.update(dict.fromkeys(row))
+        return cls(list(columns), [[row.get(column) for column in columns] for row in rows])
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return CompactRows(list(self.columns), self._rows[position],
+                               [self.columns[index] for index in self.nested])
+        return CompactRow(self, self._rows[position])
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __repr__(self) -> str:
+        return f"<CompactRows {len(self)} rows x {len(self.columns)} columns>"
+
+    def column(self, name: str) -> List[Any]:
+        """Every row's value of one column"""
+        return [row[name] for row in self]
+
+
+def unpack(result: Any) -> Any:
+    """Turn the bridge's compact wire format (a list result or `{data, count}` page) into CompactRows"""
+    if isinstance(result, dict) and COMPACT_KEY in result:
+        table = result[COMPACT_KEY]
+        return CompactRows(table['columns'], table['rows'], table.get('nested', ()))
+    if isinstance(result, dict) and isinstance(result.get('data'), dict) and COMPACT_KEY in result['data']:
+        return {**result, 'data': unpack(result['data'])}
+    return result
+
+
+def compact_result(result: Any) -> Any:
+    """Compact a list result built locally, to match what the bridge returns"""
+    if isinstance(result, dict) and isinstance(result.get('data'), list):
+        return {**result, 'data': CompactRows.from_rows(result['data'])}
+    return result
+
+
+def compact_flag(value: Optional[Any]) -> bool:
+    """Robot passes booleans as strings unless written as ${True}"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1', 'on')
+    return bool(value)
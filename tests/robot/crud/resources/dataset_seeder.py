@@ -0,0 +1,281 @@
+# dataset_seeder.py
+"""Deterministic synthetic dataset for scaling tests.
+
+Generates patients and reports with BlockNote `content` and matching
+`markdown`, then loads them through the create_*_bulk keywords in batches.
+Everything is derived from one seed: each entity kind has its own random
+stream, so changing the number of reports doesn't change the patients, and
+reports pick their patient and therapist by position in the seeded patients
+and the given therapist IDs, so the same seed always yields the same rows and
+relationships.
+
+Therapists are not generated. A therapist's `id` is its auth user's ID, and
+createTherapist can't create auth users, so the reports are written by
+existing therapists, passed as `therapist_ids` (e.g. the test users'
+therapist profiles). Their clinics determine the reports' countries.
+
+The run is recorded in a manifest (seed, counts, therapist/country IDs, a
+digest of every generated row and the created IDs), which is enough to repeat
+the run exactly or to delete the dataset again; deleting never touches the
+therapists. Usable as a Robot library (Seed Synthetic Dataset / Delete
+Synthetic Dataset) or from the command line: python dataset_seeder.py --help
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+import patient_functions
+import report_functions
+from blocknote import markdown
+
+# Bump when the generated rows change, so manifests from older runs aren't mistaken for repeatable
+GENERATOR_VERSION = 2
+
+FIRST_NAMES = ('Amara', 'Ben', 'Carmen', 'Dmitri', 'Elena', 'Farid', 'Grace', 'Hiro', 'Isabel', 'Jonas',
+               'Kemal', 'Lucia', 'Mateo', 'Nadia', 'Oscar', 'Priya', 'Quentin', 'Rosa', 'Samir', 'Tamar',
+               'Umar', 'Vera', 'Wen', 'Ximena', 'Yusuf', 'Zofia')
+LAST_NAMES = ('Abbott', 'Bauer', 'Castillo', 'Dubois', 'Eriksen', 'Fischer', 'Garcia', 'Haddad', 'Ivanova',
+              'Jensen', 'Kowalski', 'Lindqvist', 'Moreau', 'Nakamura', 'Okafor', 'Petrov', 'Quinn', 'Rossi',
+              'Santos', 'Tanaka', 'Urban', 'Varga', 'Weber', 'Xu', 'Yilmaz', 'Zimmerman')
+
+# Report wording. Earlier words are picked far more often (Zipf-like), as in real notes,
+# so searches range from very common to rare terms.
+VOCABULARY = ('therapy', 'progress', 'session', 'assessment', 'speech', 'language', 'goals', 'motor',
+              'follow-up', 'communication', 'attention', 'autism', 'articulation', 'fine', 'gross',
+              'sensory', 'feeding', 'fluency', 'social', 'play', 'parent', 'home', 'school', 'routine',
+              'vocabulary', 'comprehension', 'expressive', 'receptive', 'balance', 'coordination',
+              'strength', 'posture', 'handwriting', 'regulation', 'transition', 'imitation', 'turn-taking',
+              'phonology', 'stuttering', 'dysarthria', 'apraxia', 'swallowing', 'gait', 'endurance')
+TITLE_KINDS = ('Initial assessment', 'Progress report', 'Session notes', 'Discharge summary',
+               'Re-evaluation', 'Home programme', 'Goal review', 'Parent consultation')
+SECTIONS = ('Background', 'Observations', 'Assessment', 'Goals', 'Plan', 'Recommendations')
+WORD_WEIGHTS = [1 / rank for rank in range(1, len(VOCABULARY) + 1)]
+
+
+def _stream(seed: int, kind: str) -> random.Random:
+    # String seeds are hashed deterministically, unlike hash() of a tuple across processes
+    return random.Random(f"sharerapy-dataset:{seed}:{kind}")
+
+
+def _block_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return ' '.join(rng.choices(VOCABULARY, WORD_WEIGHTS, k=count))
+
+
+def _sentence(rng: random.Random) -> str:
+    text = _words(rng, rng.randint(6, 16))
+    return text[0].upper() + text[1:] + '.'
+
+
+def _block(rng: random.Random, block_type: str, text: str, **props) -> Dict[str, Any]:
+    """A BlockNote block as the editor saves it"""
+    return {
+        'id': _block_id(rng),
+        'type': block_type,
+        'props': {'textColor': 'default', 'backgroundColor': 'default', 'textAlignment': 'left', **props},
+        'content': [{'type': 'text', 'text': text, 'styles': {}}],
+        'children': [],
+    }
+
+
+def report_content(rng: random.Random) -> List[Dict[str, Any]]:
+    """Headed sections of paragraphs and bullet lists, a few KB of JSON like real reports"""
+    blocks = []
+    for section in rng.sample(SECTIONS, rng.randint(2, 4)):
+        blocks.append(_block(rng, 'heading', section, level=2))
+        for _ in range(rng.randint(1, 3)):
+            blocks.append(_block(rng, 'paragraph', ' '.join(_sentence(rng) for _ in range(rng.randint(1, 3)))))
+        if rng.random() < 0.5:
+            blocks.extend(_block(rng, 'bulletListItem', _sentence(rng)) for _ in range(rng.randint(2, 4)))
+    return blocks
+
+
+def generate_patients(seed: int, count: int, country_ids: List[int]) -> Iterator[Dict[str, Any]]:
+    rng = _stream(seed, 'patients')
+    for _ in range(count):
+        yield {
+            'first_name': rng.choice(FIRST_NAMES),
+            'last_name': rng.choice(LAST_NAMES),
+            'birthdate': f"{rng.randint(1940, 2021)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'sex': rng.choice(('Male', 'Female')),
+            'contact_number': f"+{rng.randint(1, 99)}{rng.randrange(10 ** 9):09d}",
+            'country_id': rng.choice(country_ids),
+        }
+
+
+def generate_reports(seed: int, count: int, patients: int, therapists: int,
+                     type_ids: List[int], language_ids: List[int]) -> Iterator[Dict[str, Any]]:
+    """Reports with `patient_index`/`therapist_index` into the seeded patients and the given therapist IDs"""
+    rng = _stream(seed, 'reports')
+    for _ in range(count):
+        content = report_content(rng)
+        yield {
+            'title': f"{rng.choice(TITLE_KINDS)}: {_words(rng, rng.randint(2, 4))}",
+            'description': _sentence(rng),
+            'type_id': rng.choice(type_ids),
+            'language_id': rng.choice(language_ids),
+            'patient_index': rng.randrange(patients),
+            'therapist_index': rng.randrange(therapists),
+            'content': content,
+            'markdown': markdown(content),
+        }
+
+
+def _batches(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ids(text: Any) -> List[int]:
+    return [int(value) for value in _strings(text)]
+
+
+def _strings(text: Any) -> List[str]:
+    if text is None:
+        return []
+    if isinstance(text, (list, tuple)):
+        return [str(value) for value in text]
+    return [value.strip() for value in str(text).split(',') if value.strip()]
+
+
+class DatasetSeeder:
+    """Generates the synthetic dataset and loads it through the bulk keywords"""
+
+    def _load(self, kind: str, create_bulk, rows: Iterator[Dict[str, Any]], batch_size: int,
+              digest, ids: List[Optional[str]], failures: List[Dict[str, Any]], prepare=None):
+        started = time.perf_counter()
+        for batch in _batches(rows, batch_size):
+            for row in batch:
+                digest.update(json.dumps(row, sort_keys=True).encode())
+            offset = len(ids)
+            results = create_bulk([prepare(row) for row in batch] if prepare else batch)
+            for result in results:
+                ids.append(result['id'] if result['ok'] else None)
+                if not result['ok']:
+                    failures.append({'kind': kind, 'index': offset + result['index'], 'error': result['error']})
+            print(f"Seeded {len(ids)} {kind} ({time.perf_counter() - started:.1f} s)")
+        return time.perf_counter() - started
+
+    def seed_synthetic_dataset(self, seed=1, patients=10_000, reports=100_000, therapist_ids=None, batch_size=500,
+                               country_ids='1,2,3,4,5', type_ids='1,2,3,4', language_ids='1', manifest=None):
+        """Create the dataset for `seed` and return its manifest (also written to `manifest` if given).
+
+        `therapist_ids` (comma-separated or a list) are existing therapists
+        the reports are spread over. They, `country_ids`, `type_ids` and
+        `language_ids` must exist in the target database.
+        """
+        config = {
+            'seed': int(seed), 'patients': int(patients), 'reports': int(reports),
+            'therapist_ids': _strings(therapist_ids), 'batch_size': int(batch_size),
+            'country_ids': _ids(country_ids), 'type_ids': _ids(type_ids), 'language_ids': _ids(language_ids),
+        }
+        if config['reports'] and not (config['patients'] and config['therapist_ids']):
+            raise ValueError("Reports need at least one patient and one existing therapist (therapist_ids) "
+                             "to belong to")
+
+        digest = hashlib.sha256()
+        ids: Dict[str, List[Optional[str]]] = {'patients': [], 'reports': []}
+        failures: List[Dict[str, Any]] = []
+        timings = {
+            'patients': self._load(
+                'patients', patient_functions.create_patients_bulk,
+                generate_patients(config['seed'], config['patients'], config['country_ids']),
+                config['batch_size'], digest, ids['patients'], failures),
+        }
+
+        def link(row):
+            data = {key: value for key, value in row.items() if not key.endswith('_index')}
+            data['patient_id'] = ids['patients'][row['patient_index']]
+            data['therapist_id'] = config['therapist_ids'][row['therapist_index']]
+            return data
+
+        timings['reports'] = self._load(
+            'reports', report_functions.create_reports_bulk,
+            generate_reports(config['seed'], config['reports'], config['patients'], len(config['therapist_ids']),
+                             config['type_ids'], config['language_ids']),
+            config['batch_size'], digest, ids['reports'], failures, prepare=link)
+
+        document = {
+            'generator_version': GENERATOR_VERSION,
+            'created_at': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            'config': config,
+            'digest': digest.hexdigest(),
+            'seconds': timings,
+            'failures': failures,
+            'ids': ids,
+        }
+        print(f"Synthetic dataset seed {config['seed']}: digest {document['digest'][:12]}, "
+              f"{len(failures)} failed rows")
+        if manifest:
+            with open(manifest, 'w', encoding='utf8') as output:
+                json.dump(document, output)
+            print(f"Dataset manifest written to {manifest}")
+        return document
+
+    def delete_synthetic_dataset(self, manifest, batch_size=500):
+        """Delete every row a manifest (dict or path) recorded, reports first (never the therapists)"""
+        if isinstance(manifest, str):
+            with open(manifest, encoding='utf8') as source:
+                manifest = json.load(source)
+        deleted = 0
+        for kind, delete_bulk in (('reports', report_functions.delete_reports_bulk),
+                                  ('patients', patient_functions.delete_patients_bulk)):
+            row_ids = [row_id for row_id in manifest['ids'].get(kind, ()) if row_id]
+            for batch in _batches(iter(row_ids), int(batch_size)):
+                deleted += sum(1 for result in delete_bulk(batch) if result['ok'])
+        print(f"Deleted {deleted} synthetic rows")
+        return deleted
+
+
+# Create global instance for Robot Framework
+dataset_seeder = DatasetSeeder()
+
+# Robot Framework compatible functions
+def seed_synthetic_dataset(**kwargs):
+    return dataset_seeder.seed_synthetic_dataset(**kwargs)
+
+def delete_synthetic_dataset(manifest, batch_size=500):
+    return dataset_seeder.delete_synthetic_dataset(manifest, batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--patients', type=int, default=10_000)
+    parser.add_argument('--reports', type=int, default=100_000)
+    parser.add_argument('--therapist-ids', default='',
+                        help="comma-separated IDs of existing therapists to write the reports")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--country-ids', default='1,2,3,4,5')
+    parser.add_argument('--type-ids', default='1,2,3,4')
+    parser.add_argument('--language-ids', default='1')
+    parser.add_argument('--manifest', default='dataset-manifest.json')
+    parser.add_argument('--delete', metavar='MANIFEST', help="delete the rows recorded in MANIFEST instead")
+    args = parser.parse_args(argv)
+
+    if args.delete:
+        delete_synthetic_dataset(args.delete, args.batch_size)
+        return 0
+    document = seed_synthetic_dataset(
+        seed=args.seed, patients=args.patients, reports=args.reports, therapist_ids=args.therapist_ids,
+        batch_size=args.batch_size, country_ids=args.country_ids,
+        type_ids=args.type_ids, language_ids=args.language_ids, manifest=args.manifest)
+    return 1 if document['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,16 @@
+# form_fields.py
+"""The FormData fields the lib/actions server actions read, per entity.
+
+Kept apart from the keyword libraries so that the E2E seeding keywords can
+encode the same forms without instantiating any CRUD library.
+"""
+
+# Fields the patient server actions read from FormData
+PATIENT_FORM_FIELDS = ('first_name', 'last_name', 'birthdate', 'sex', 'contact_number', 'country_id')
+
+# Fields the report server actions read from FormData
+REPORT_FORM_FIELDS = ('therapist_id', 'type_id', 'language_id', 'patient_id', 'content', 'title', 'description',
+                      'markdown')
+
+# Fields the therapist server actions read from FormData
+THERAPIST_FORM_FIELDS = ('clinic_id', 'age', 'bio', 'last_name', 'first_name', 'picture')
@@ -0,0 +1,156 @@
+# keyword_profiler.py
+"""Opt-in profiling of chosen keywords, in Python and in Node.
+
+SHARERAPY_PROFILE names the keywords to profile, comma-separated and matched
+like Robot matches keyword names (`Get All Reports` or `get_all_reports`),
+or `*` for every keyword of the patient, report, therapist and auth
+libraries. Unset, nothing is wrapped and keywords run as before.
+
+Each invocation of a chosen keyword runs under cProfile, and its bridge
+calls each run in their own bridge/call.ts process started with --cpu-prof
+and --heap-prof (whatever SHARERAPY_BRIDGE_MODE says), so Node's profiles
+cover just that invocation. Everything goes to SHARERAPY_PROFILE_DIR, by
+default profiles/ in Robot's output directory, in one directory per suite:
+
+  <test>.<keyword>.<n>.prof                 Python (pstats, e.g. snakeviz)
+  <test>.<keyword>.<n>.node<k>.cpuprofile   Node CPU (Chrome DevTools)
+  <test>.<keyword>.<n>.node<k>.heapprofile  Node sampled heap (DevTools)
+
+where n counts the keyword's invocations in that test and k its bridge calls.
+"""
+import contextvars
+import cProfile
+import functools
+import inspect
+import itertools
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from bridge_trace import tracer
+
+PROFILE_KEYWORDS = os.environ.get('SHARERAPY_PROFILE', '')
+PROFILE_DIR = os.environ.get('SHARERAPY_PROFILE_DIR')
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r'[\s_]', '', name).lower()
+
+
+def _file_name(text: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', text).strip('_') or 'unnamed'
+
+
+class Invocation:
+    """One profiled keyword call: where its profiles go"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._calls = itertools.count(1)
+
+    def node_flags(self) -> List[str]:
+        """Node options profiling one bridge call of this invocation"""
+        directory, name = os.path.split(f"{self.prefix}.node{next(self._calls)}")
+        return [
+            '--cpu-prof', f"--cpu-prof-dir={directory}", f"--cpu-prof-name={name}.cpuprofile",
+            '--heap-prof', f"--heap-prof-dir={directory}", f"--heap-prof-name={name}.heapprofile",
+        ]
+
+
+class KeywordProfiler:
+    """Wraps the selected keyword functions and tracks the invocation being profiled"""
+
+    def __init__(self, keywords: str = PROFILE_KEYWORDS, directory: Optional[str] = PROFILE_DIR):
+        names = {_normalize(name) for name in keywords.split(',') if name.strip()}
+        self.everything = '*' in names
+        self.names = names - {'*'}
+        self.directory = directory
+        # Follows the keyword into asyncio tasks and asyncio.to_thread
+        self._current: contextvars.ContextVar[Optional[Invocation]] = contextvars.ContextVar(
+            'profiled_keyword', default=None)
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.everything or bool(self.names)
+
+    def selected(self, name: str) -> bool:
+        return self.everything or _normalize(name) in self.names
+
+    def _output_dir(self) -> str:
+        if self.directory:
+            return self.directory
+        try:
+            from robot.libraries.BuiltIn import BuiltIn
+            output = BuiltIn().get_variable_value('${OUTPUT DIR}')
+        except Exception:
+            # Not running under Robot (e.g. the load generator)
+            output = None
+        return os.path.join(output or os.getcwd(), 'profiles')
+
+    def _invocation(self, keyword: str) -> Invocation:
+        suite = _file_name(tracer.suite or 'no-suite')
+        test = _file_name(tracer.test or 'setup')
+        stem = f"{test}.{_file_name(keyword)}"
+        with self._lock:
+            count = self._counts[f"{suite}/{stem}"] = self._counts.get(f"{suite}/{stem}", 0) + 1
+        directory = os.path.join(self._output_dir(), suite)
+        os.makedirs(directory, exist_ok=True)
+        return Invocation(os.path.join(directory, f"{stem}.{count}"))
+
+    def node_flags(self) -> Optional[List[str]]:
+        """Node options for a bridge call made now, or None if no profiled keyword is running"""
+        invocation = self._current.get()
+        return invocation.node_flags() if invocation else None
+
+    def _start(self, name: str):
+        invocation = self._invocation(name)
+        token = self._current.set(invocation)
+        profile = cProfile.Profile()
+        profile.enable()
+        return invocation, token, profile
+
+    def _finish(self, name: str, invocation: Invocation, token, profile: cProfile.Profile):
+        profile.disable()
+        self._current.reset(token)
+        profile.dump_stats(f"{invocation.prefix}.prof")
+        print(f"*INFO* Profiled {name} into {invocation.prefix}.*")
+
+    def wrap(self, function: Callable) -> Callable:
+        name = function.__name__
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def profiled_async(*args, **kwargs):
+                state = self._start(name)
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    self._finish(name, *state)
+            return profiled_async
+
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+            state = self._start(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._finish(name, *state)
+        return profiled
+
+
+# Consulted by the bridge for every call
+profiler = KeywordProfiler()
+
+
+def profile_keywords(namespace: Dict[str, Any]):
+    """Wrap the module-level keyword functions of a library that SHARERAPY_PROFILE selects"""
+    if not profiler.enabled:
+        return
+    for name, function in list(namespace.items()):
+        if (name.startswith('_') or not inspect.isfunction(function)
+                or function.__module__ != namespace['__name__']):
+            continue
+        if profiler.selected(name):
+            namespace[name] = profiler.wrap(function)
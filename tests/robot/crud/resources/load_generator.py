@@ -0,0 +1,323 @@
+# load_generator.py
+"""Closed-loop load generator driving the CRUD keyword libraries.
+
+Virtual users repeatedly pick an operation from a weighted scenario mix, run
+it through the same keyword functions the CRUD suites use, then wait for
+their think time. Users start one after another over the ramp-up period.
+With a target rate, each user also paces its iterations so that all users
+together start about `rate` operations per second; a user that falls behind
+starts its next iteration at once instead of bursting to catch up.
+
+Users run as threads, or spread over a process pool (each process has its
+own bridge and worker pool) for more client-side parallelism. A call counts
+as an error if the keyword raised or if any bridge call it made failed, as
+the keywords themselves fall back to local data instead of raising.
+
+The report has totals and per-operation figures (throughput, error rate,
+latency percentiles and histogram) plus the same figures per `interval`
+seconds of the run. Usable as a Robot library (Run Load Scenario) or from
+the command line: python load_generator.py --help
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import patient_functions
+import report_functions
+import therapist_functions
+from bridge_trace import percentile, tracer
+
+# Staff mostly search and browse reports
+DEFAULT_MIX = ("search_reports=50,browse_reports=15,list_patients=15,list_therapists=10,"
+               "create_report=4,update_report=3,create_patient=2,update_patient=1")
+
+SEARCH_TERMS = ('assessment', 'progress', 'speech', 'therapy', 'autism', 'motor', 'language', 'follow-up')
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is unbounded
+HISTOGRAM_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+Sample = Tuple[float, str, float, bool]
+
+_state = threading.local()
+
+
+def _note_failure(record: Dict[str, Any]):
+    if not record['ok']:
+        _state.failed = True
+
+
+tracer.hooks.append(_note_failure)
+
+
+def parse_mix(mix: Any) -> Dict[str, float]:
+    """Parse "name=weight,..." (or pass a dict through), checking the operation names"""
+    if isinstance(mix, str):
+        mix = dict(part.split('=', 1) for part in mix.replace(' ', '').split(',') if part)
+    weights = {name: float(weight) for name, weight in mix.items() if float(weight) > 0}
+    unknown = sorted(set(weights) - set(OPERATIONS))
+    if unknown or not weights:
+        raise ValueError(f"Bad scenario mix {mix!r}; operations are {', '.join(OPERATIONS)}")
+    return weights
+
+
+# Operations -----------------------------------------------------------------
+# Each takes the user's random generator and its `known` IDs, which are fed
+# from list results and creates so updates and new reports have targets.
+
+def _remember(known: Dict[str, List[str]], kind: str, result: Any):
+    if isinstance(result, dict):
+        rows = result.get('data') if 'data' in result else [result]
+    else:
+        rows = result if isinstance(result, list) else []
+    for row in rows or ():
+        if isinstance(row, dict) and row.get('id') and len(known[kind]) < 200:
+            known[kind].append(row['id'])
+
+
+def _search_reports(rng, known):
+    _remember(known, 'report', report_functions.get_all_reports(search=rng.choice(SEARCH_TERMS), limit=20))
+
+
+def _browse_reports(rng, known):
+    _remember(known, 'report', report_functions.get_all_reports(limit=20, offset=rng.randrange(5) * 20))
+
+
+def _list_patients(rng, known):
+    _remember(known, 'patient', patient_functions.get_all_patients(page=rng.randrange(5), page_size=20))
+
+
+def _list_therapists(rng, known):
+    _remember(known, 'therapist', therapist_functions.get_all_therapists(limit=20, offset=rng.randrange(5) * 20))
+
+
+def _create_patient(rng, known):
+    _remember(known, 'patient', patient_functions.create_patient({
+        'first_name': f"Load{rng.randrange(10 ** 6):06d}", 'last_name': 'User', 'birthdate': '1990-01-01',
+        'sex': rng.choice(('Male', 'Female')), 'contact_number': '+1234567890', 'country_id': 1,
+    }))
+
+
+def _update_patient(rng, known):
+    if not known['patient']:
+        return _list_patients(rng, known)
+    patient_functions.update_patient(rng.choice(known['patient']), {'contact_number': f"+1{rng.randrange(10 ** 9):09d}"})
+
+
+def _create_report(rng, known):
+    _remember(known, 'report', report_functions.create_report({
+        'title': f"Load report {rng.choice(SEARCH_TERMS)}", 'description': 'Generated under load',
+        'type_id': rng.randint(1, 4), 'language_id': 1, 'content': {'notes': 'load test'},
+        'patient_id': rng.choice(known['patient']) if known['patient'] else None,
+        'therapist_id': rng.choice(known['therapist']) if known['therapist'] else None,
+    }))
+
+
+def _update_report(rng, known):
+    if not known['report']:
+        return _browse_reports(rng, known)
+    report_functions.update_report(rng.choice(known['report']), {'description': f"Revised {rng.randrange(10 ** 6)}"})
+
+
+OPERATIONS: Dict[str, Callable[[random.Random, Dict[str, List[str]]], Any]] = {
+    'search_reports': _search_reports,
+    'browse_reports': _browse_reports,
+    'list_patients': _list_patients,
+    'list_therapists': _list_therapists,
+    'create_patient': _create_patient,
+    'update_patient': _update_patient,
+    'create_report': _create_report,
+    'update_report': _update_report,
+}
+
+
+# Virtual users ----------------------------------------------------------------
+
+def _run_user(user: int, config: Dict[str, Any], t0: float) -> List[Sample]:
+    """One virtual user's closed loop; samples are (start offset s, operation, latency ms, ok)"""
+    rng = random.Random(config['seed'] + user)
+    names, weights = zip(*config['mix'].items())
+    known: Dict[str, List[str]] = {'patient': [], 'report': [], 'therapist': []}
+    pace = config['users'] / config['rate'] if config['rate'] else 0.0
+    stop_at = t0 + config['duration']
+    next_start = t0 + config['ramp_up'] * user / config['users']
+    samples: List[Sample] = []
+
+    while True:
+        now = time.time()
+        if next_start > now:
+            time.sleep(next_start - now)
+        if time.time() >= stop_at:
+            return samples
+
+        operation = rng.choices(names, weights)[0]
+        _state.failed = False
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            OPERATIONS[operation](rng, known)
+            ok = not _state.failed
+        except Exception:
+            ok = False
+        samples.append((started_at - t0, operation, (time.perf_counter() - started) * 1000, ok))
+
+        think = rng.expovariate(1.0 / config['think_time']) if config['think_time'] else 0.0
+        next_start = max(next_start + pace, time.time() + think)
+
+
+def _run_users(users: List[int], config: Dict[str, Any], t0: float) -> List[Sample]:
+    """Run several virtual users on threads (the body of each pool process)"""
+    tracer.echo = False
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        batches = list(pool.map(lambda user: _run_user(user, config, t0), users))
+    return [sample for batch in batches for sample in batch]
+
+
+# Reporting --------------------------------------------------------------------
+
+def histogram(latencies: List[float]) -> Dict[str, int]:
+    counts = {f"<={bound}ms": 0 for bound in HISTOGRAM_BOUNDS_MS}
+    counts[f">{HISTOGRAM_BOUNDS_MS[-1]}ms"] = 0
+    for latency in latencies:
+        for bound in HISTOGRAM_BOUNDS_MS:
+            if latency <= bound:
+                counts[f"<={bound}ms"] += 1
+                break
+        else:
+            counts[f">{HISTOGRAM_BOUNDS_MS[-1]}ms"] += 1
+    return counts
+
+
+def figures(samples: List[Sample], seconds: float) -> Dict[str, Any]:
+    """Throughput, error rate and latency distribution of a set of samples"""
+    latencies = [latency for _, _, latency, _ in samples]
+    errors = sum(1 for sample in samples if not sample[3])
+    result = {
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': errors / len(samples) if samples else 0.0,
+        'throughput': len(samples) / seconds if seconds else 0.0,
+    }
+    if latencies:
+        result.update({
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': max(latencies),
+        })
+    result['histogram'] = histogram(latencies)
+    return result
+
+
+def build_report(samples: List[Sample], config: Dict[str, Any], interval: float) -> Dict[str, Any]:
+    duration = config['duration']
+    timeline = []
+    start = 0.0
+    while start < duration:
+        window = [sample for sample in samples if start <= sample[0] < start + interval]
+        timeline.append({'t': start, **figures(window, min(interval, duration - start))})
+        start += interval
+    operations = sorted({sample[1] for sample in samples})
+    return {
+        'config': config,
+        'totals': figures(samples, duration),
+        'operations': {name: figures([s for s in samples if s[1] == name], duration) for name in operations},
+        'timeline': timeline,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'t (s)':>7} {'req':>6} {'req/s':>8} {'err %':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"]
+    for row in report['timeline']:
+        lines.append(f"{row['t']:>7.0f} {row['requests']:>6} {row['throughput']:>8.1f} {row['error_rate']:>6.1%} "
+                     f"{row.get('p50_ms', 0):>8.1f} {row.get('p95_ms', 0):>8.1f} {row.get('max_ms', 0):>8.1f}")
+    totals = report['totals']
+    lines.append(f"{'total':>7} {totals['requests']:>6} {totals['throughput']:>8.1f} {totals['error_rate']:>6.1%} "
+                 f"{totals.get('p50_ms', 0):>8.1f} {totals.get('p95_ms', 0):>8.1f} {totals.get('max_ms', 0):>8.1f}")
+    return '\n'.join(lines)
+
+
+# Entry points -----------------------------------------------------------------
+
+def run_load_scenario(users=10, duration=60, ramp_up=10, think_time=1.0, rate=0, mix=DEFAULT_MIX,
+                      executor='thread', processes=2, interval=5, seed=1, output: Optional[str] = None):
+    """Run a closed-loop load scenario and return its report.
+
+    `users` virtual users start over `ramp_up` seconds and run until
+    `duration` seconds after the start. `think_time` is the mean (exponential)
+    pause between a user's operations, in seconds; `rate`, if set, is the
+    target number of operations per second across all users. `executor` is
+    thread or process (spreading users over `processes` processes).
+    """
+    config = {
+        'users': int(users), 'duration': float(duration), 'ramp_up': float(ramp_up),
+        'think_time': float(think_time), 'rate': float(rate), 'mix': parse_mix(mix),
+        'executor': executor, 'processes': int(processes), 'seed': int(seed),
+    }
+    if config['users'] < 1 or config['duration'] <= 0:
+        raise ValueError("Load scenarios need at least one user and a positive duration")
+    user_ids = list(range(config['users']))
+
+    echo = tracer.echo
+    try:
+        if executor == 'thread':
+            t0 = time.time()
+            samples = _run_users(user_ids, config, t0)
+        elif executor == 'process':
+            chunks = [user_ids[i::config['processes']] for i in range(config['processes'])]
+            chunks = [chunk for chunk in chunks if chunk]
+            # Give the processes time to import the libraries before the clock starts
+            t0 = time.time() + 2.0
+            with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+                batches = pool.map(_run_users, chunks, [config] * len(chunks), [t0] * len(chunks))
+                samples = [sample for batch in batches for sample in batch]
+        else:
+            raise ValueError(f"Unknown executor {executor}; expected thread or process")
+    finally:
+        tracer.echo = echo
+
+    report = build_report(samples, config, float(interval))
+    print(format_report(report))
+    if output:
+        with open(output, 'w', encoding='utf8') as destination:
+            json.dump(report, destination, indent=2)
+        print(f"Load report written to {output}")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=60, help="seconds, including ramp-up")
+    parser.add_argument('--ramp-up', type=float, default=10, help="seconds over which users start")
+    parser.add_argument('--think-time', type=float, default=1.0, help="mean seconds between a user's operations")
+    parser.add_argument('--rate', type=float, default=0, help="target operations per second (0: unpaced)")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="operation=weight,...")
+    parser.add_argument('--executor', choices=('thread', 'process'), default='thread')
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--interval', type=float, default=5, help="seconds per timeline row")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write the JSON report here")
+    parser.add_argument('--standin', action='store_true', help="run against the local stand-in backend")
+    args = parser.parse_args(argv)
+
+    backend = None
+    if args.standin:
+        from standin_backend import StandinBackend
+        backend = StandinBackend(seed_rows=200).start()
+    try:
+        report = run_load_scenario(args.users, args.duration, args.ramp_up, args.think_time, args.rate,
+                                   args.mix, args.executor, args.processes, args.interval, args.seed,
+                                   args.output)
+    finally:
+        if backend is not None:
+            backend.stop()
+    return 0 if report['totals']['requests'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
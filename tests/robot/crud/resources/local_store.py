@@ -0,0 +1,211 @@
+# local_store.py
+"""Indexed in-memory tables behind the keyword libraries' offline fallbacks.
+
+A LocalTable behaves like the plain ``{id: row}`` dict it replaces, but also
+keeps a sorted index on the column the matching read function orders by and a
+secondary index per filter column. ``query`` mirrors the filtering, ordering
+and pagination of readPatients / readReports / readTherapists without copying
+and sorting the whole table: a page with at most one filter on an indexed
+column is sliced straight out of a sorted list, and otherwise the smallest
+matching bucket is scanned in order, checking the remaining filters and the
+substring search per row. The indexes are plain sorted lists, so storing or
+removing a row shifts them (O(n), a memmove that is cheap at test data sizes).
+A table given a SearchIndex (see search_index.py) keeps it in step with its
+rows and answers searches from it, ranked, instead of scanning for the
+substring.
+
+Rows must be replaced rather than mutated in place for the indexes to see the change.
+"""
+import heapq
+from bisect import bisect_left, insort
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from search_index import SearchIndex
+
+Entry = Tuple[str, str]
+
+
+def field_value(row: Dict[str, Any], field: str) -> Any:
+    """Read a column, following PostgREST-style dotted paths such as clinic.country_id"""
+    value: Any = row
+    for part in field.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return _normalize(value)
+
+
+def _normalize(value: Any) -> Any:
+    # Robot passes numbers as strings; the backend compares them as numbers
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+def full_name(row: Dict[str, Any]) -> str:
+    """The generated `name` column of patients and therapists"""
+    if row.get('name'):
+        return row['name']
+    return f"{row.get('first_name') or ''} {row.get('last_name') or ''}".strip()
+
+
+class LocalTable(MutableMapping):
+    """An ``{id: row}`` mapping with a sorted index and secondary indexes"""
+
+    def __init__(self, order_by: Callable[[Dict[str, Any]], str], indexed: Iterable[str] = (),
+                 search_text: Optional[Callable[[Dict[str, Any]], str]] = None,
+                 search_index: Optional[SearchIndex] = None):
+        self._order_by = order_by
+        self._search_text = search_text or order_by
+        self._search_index = search_index
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        # id -> (sort entry, indexed values) as they were when the row was stored
+        self._entries: Dict[str, Tuple[Entry, Dict[str, Any]]] = {}
+        # (sort key, id) pairs, kept sorted
+        self._order: List[Entry] = []
+        # column -> value -> sorted (sort key, id) pairs of the rows with that value
+        self._indexes: Dict[str, Dict[Any, List[Entry]]] = {field: {} for field in indexed}
+        # column -> value -> ids of the rows with that value, to narrow ranked searches
+        self._members: Dict[str, Dict[Any, Set[str]]] = {field: {} for field in indexed}
+
+    def __getitem__(self, row_id: str) -> Dict[str, Any]:
+        return self._rows[row_id]
+
+    def __setitem__(self, row_id: str, row: Dict[str, Any]) -> None:
+        if row_id in self._rows:
+            self._unindex(row_id)
+        entry = (str(self._order_by(row) or ''), row_id)
+        values = {field: field_value(row, field) for field in self._indexes}
+        self._rows[row_id] = row
+        self._entries[row_id] = (entry, values)
+        insort(self._order, entry)
+        for field, value in values.items():
+            if value is not None:
+                insort(self._indexes[field].setdefault(value, []), entry)
+                self._members[field].setdefault(value, set()).add(row_id)
+        if self._search_index is not None:
+            self._search_index.add(row_id, row)
+
+    def __delitem__(self, row_id: str) -> None:
+        self._unindex(row_id)
+        del self._rows[row_id]
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __repr__(self) -> str:
+        return f"LocalTable({self._rows!r})"
+
+    def _unindex(self, row_id: str) -> None:
+        if self._search_index is not None:
+            self._search_index.remove(row_id)
+        entry, values = self._entries.pop(row_id)
+        _remove(self._order, entry)
+        for field, value in values.items():
+            buckets = self._indexes[field]
+            bucket = buckets.get(value)
+            if bucket is None:
+                continue
+            _remove(bucket, entry)
+            if not bucket:
+                del buckets[value]
+            members = self._members[field][value]
+            members.discard(row_id)
+            if not members:
+                del self._members[field][value]
+
+    def _bucket(self, field: str, value: Any) -> List[Entry]:
+        buckets = self._indexes[field]
+        if isinstance(value, (list, tuple, set)):
+            # `in (...)` filter: merge the already sorted buckets
+            return list(heapq.merge(*(buckets.get(_normalize(v), []) for v in value)))
+        return buckets.get(_normalize(value), [])
+
+    def query(self, filters: Optional[Dict[str, Any]] = None, search: Optional[str] = None,
+              ascending: bool = True, offset: int = 0, limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """Return (page of rows, total matching count).
+
+        `filters` maps column to a value (eq) or a list of values (in); None
+        values are ignored, as the read functions skip falsy parameters.
+        `search` is a case-insensitive substring match (ilike %search%), or
+        with a search index, a full-text match ordered by rank.
+        """
+        filters = {field: value for field, value in (filters or {}).items() if value not in (None, '', [], ())}
+        offset, limit = max(int(offset), 0), max(int(limit), 0)
+        if search and self._search_index is not None:
+            return self._ranked(search, filters, offset, limit)
+
+        # Drive the scan from the smallest indexed bucket; everything else is checked per row
+        driver, driver_field = self._order, None
+        for field, value in filters.items():
+            if field in self._indexes:
+                bucket = self._bucket(field, value)
+                if driver_field is None or len(bucket) < len(driver):
+                    driver, driver_field = bucket, field
+        residual = {field: value for field, value in filters.items() if field != driver_field}
+
+        if not residual and not search:
+            # Every row in the driver matches: slice the page straight out of the index
+            count = len(driver)
+            if ascending:
+                page = driver[offset:offset + limit]
+            else:
+                page = driver[max(count - offset - limit, 0):max(count - offset, 0)][::-1]
+            return [self._rows[row_id] for _, row_id in page], count
+
+        needle = search.lower() if search else None
+        page, count = [], 0
+        for _, row_id in (driver if ascending else reversed(driver)):
+            row = self._rows[row_id]
+            if not _matches(row, residual):
+                continue
+            if needle and needle not in str(self._search_text(row) or '').lower():
+                continue
+            if offset <= count < offset + limit:
+                page.append(row)
+            count += 1
+        return page, count
+
+    def _ranked(self, search: str, filters: Dict[str, Any], offset: int,
+                limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Full-text matches best first, like search_reports_ranked"""
+        # Indexed filters narrow the matches by set intersection; the rest are checked per match
+        within: Optional[Set[str]] = None
+        for field, value in filters.items():
+            if field in self._indexes:
+                members = self._members[field]
+                rows = set().union(*(members.get(v, ()) for v in _normalized_set(value)))
+                within = rows if within is None else within & rows
+        residual = {field: value for field, value in filters.items() if field not in self._indexes}
+
+        def keep(row_id):
+            return _matches(self._rows[row_id], residual)
+
+        best, count = self._search_index.search(search, within, keep if residual else None, offset + limit)
+        return [self._rows[row_id] for row_id, _ in best[offset:]], count
+
+
+def _matches(row: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+    for field, value in filters.items():
+        actual = field_value(row, field)
+        if isinstance(value, (list, tuple, set)):
+            if actual not in {_normalize(v) for v in value}:
+                return False
+        elif actual != _normalize(value):
+            return False
+    return True
+
+
+def _normalized_set(value: Any) -> Set[Any]:
+    values = value if isinstance(value, (list, tuple, set)) else (value,)
+    return {_normalize(v) for v in values}
+
+
+def _remove(entries: List[Entry], entry: Entry) -> None:
+    index = bisect_left(entries, entry)
+    if index < len(entries) and entries[index] == entry:
+        del entries[index]
@@ -0,0 +1,257 @@
+# operation_functions.py
+"""Run Operations: a sequence of patient, report and therapist keywords in one bridge call.
+
+A lifecycle test (create, read, update, read, delete, read again) used to
+make one bridge call per step. `Run Operations` takes the steps as a list of
+dictionaries and sends them to bridge/pipeline.ts in a single call, which
+runs them in order in one Node process:
+
+  op    the keyword to run, e.g. `Create Patient` or `get_report_by_id`
+  id    the record ID, for the by-ID keywords
+  data  the record fields, for the create and update keywords
+  as    a name for this step's outcome, for later steps to refer to
+
+A string anywhere in a later step's `id` or `data` of the form `$name` is
+replaced by the ID of the record that step created or touched, and
+`$name.field` by a field of its result (`$$` for a literal leading `$`).
+So a report can be created for a patient created two steps earlier with
+`patient_id=$patient`.
+
+The result has one entry per step, in order: index, op, ok, id, value (what
+the keyword itself would have returned), error, code and ms (time spent on
+the step in Node). A failing step does not stop the list; steps referring to
+its outcome fail as unresolved. If the bridge cannot be reached, the steps
+run one keyword at a time instead, with the libraries' usual fallbacks.
+"""
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+from bridge_trace import trace_listener
+from keyword_profiler import profile_keywords
+from patient_functions import PATIENT_FORM_FIELDS, patient_functions
+from report_functions import REPORT_FORM_FIELDS, report_functions
+from therapist_functions import CREATED_THERAPIST_ID, THERAPIST_FORM_FIELDS, therapist_functions
+from tsx_bridge import bridge, drop_none, form_data
+
+REFERENCE = re.compile(r'^\$(\w+)(?:\.([\w.]+))?$')
+
+# A reference to a field that isn't there, as opposed to one holding null
+_MISSING = object()
+
+
+class UnresolvedReference(Exception):
+    """Raised when a step refers to an outcome that doesn't exist (yet)"""
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r'[\s_]', '', name).lower()
+
+
+def _now() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def resolve_references(value: Any, named: Dict[str, Dict[str, Any]]) -> Any:
+    """Replace `$name` and `$name.field` strings in `value` by the named outcomes, as bridge/pipeline.ts does"""
+    if isinstance(value, str):
+        if value.startswith('$$'):
+            return value[1:]
+        match = REFERENCE.match(value)
+        if not match:
+            return value
+        name, path = match.groups()
+        if name not in named:
+            raise UnresolvedReference(f"Unresolved reference {value}")
+        if not path:
+            resolved = named[name].get('id', _MISSING)
+            if resolved is None:
+                # pipeline.ts names no ID (undefined) when the outcome revealed none
+                resolved = _MISSING
+        else:
+            resolved = named[name].get('data')
+            for key in path.split('.'):
+                resolved = resolved.get(key, _MISSING) if isinstance(resolved, dict) else _MISSING
+        if resolved is _MISSING:
+            raise UnresolvedReference(f"Unresolved reference {value}")
+        return resolved
+    if isinstance(value, list):
+        return [resolve_references(item, named) for item in value]
+    if isinstance(value, dict):
+        return {key: resolve_references(item, named) for key, item in value.items()}
+    return value
+
+
+class Operation:
+    """How one keyword runs as a pipeline step.
+
+    `args(id, data)` builds the bridge arguments, `shape(ok, result, id,
+    data)` turns the step's outcome into the keyword's return value, and
+    `local(id, data)` runs the keyword itself when the bridge is unavailable.
+    `done(ok, id, value)` keeps the library's caches in step afterwards.
+    """
+
+    def __init__(self, fn: str, args: Callable, shape: Callable, local: Callable,
+                 done: Optional[Callable] = None, by_id: bool = True, known_id: Optional[str] = None):
+        self.fn = fn
+        self.args = args
+        self.shape = shape
+        self.local = local
+        self.done = done or (lambda ok, record_id, value: None)
+        # Whether the step acts on the record `id` names (else it creates one)
+        self.by_id = by_id
+        # ID a create step names when the backend doesn't reveal it
+        self.known_id = known_id
+
+    def record_id(self, record_id: Optional[str]) -> Optional[str]:
+        """The ID pipeline.ts should name this step's outcome by, if known in advance"""
+        return record_id if self.by_id else self.known_id
+
+
+def _crud_operations(kind: str, library: Any, fields: tuple, known_id: Optional[str] = None,
+                     json_fields: tuple = ()) -> Dict[str, Operation]:
+    """The create/read/update/delete steps of one keyword library (`kind` like 'patient')"""
+    table = f"{kind}s"
+    title = kind.capitalize()
+    remember = getattr(library, f"_remember_{kind}")
+    forget = getattr(library, f"_forget_{kind}")
+
+    def encode(data):
+        return form_data(data, fields, json_fields=json_fields)
+
+    def deleted(ok, record_id, value):
+        if value:
+            library._local_store.get(table, {}).pop(record_id, None)
+        forget(record_id)
+
+    return {
+        f"create{kind}": Operation(
+            f"create{title}",
+            lambda record_id, data: [encode(data)],
+            lambda ok, result, record_id, data: {**data, "id": record_id, "created_at": _now()} if ok else None,
+            lambda record_id, data: getattr(library, f"create_{kind}")(data),
+            by_id=False,
+            known_id=known_id,
+        ),
+        f"get{kind}byid": Operation(
+            f"read{title}",
+            lambda record_id, data: [record_id],
+            lambda ok, result, record_id, data: result if ok else None,
+            lambda record_id, data: getattr(library, f"get_{kind}_by_id")(record_id),
+            lambda ok, record_id, value: remember(value) if value else None,
+        ),
+        f"update{kind}": Operation(
+            f"update{title}",
+            lambda record_id, data: [record_id, encode(data)],
+            lambda ok, result, record_id, data: {**data, "id": record_id, "updated_at": _now()} if ok else None,
+            lambda record_id, data: getattr(library, f"update_{kind}")(record_id, data),
+            lambda ok, record_id, value: forget(record_id),
+        ),
+        f"delete{kind}": Operation(
+            f"delete{title}",
+            lambda record_id, data: [record_id],
+            lambda ok, result, record_id, data: ok,
+            lambda record_id, data: getattr(library, f"delete_{kind}")(record_id),
+            deleted,
+        ),
+    }
+
+
+OPERATIONS: Dict[str, Operation] = {
+    **_crud_operations("patient", patient_functions, PATIENT_FORM_FIELDS),
+    **_crud_operations("report", report_functions, REPORT_FORM_FIELDS, json_fields=('content',)),
+    **_crud_operations("therapist", therapist_functions, THERAPIST_FORM_FIELDS, known_id=CREATED_THERAPIST_ID),
+}
+
+
+class OperationFunctions:
+    """Runs lists of keyword steps through bridge/pipeline.ts"""
+
+    def __init__(self):
+        # Persistent tsx worker shared with the other keyword libraries
+        self._bridge = bridge
+
+    def _steps(self, operations):
+        steps = []
+        for operation in operations:
+            name = _normalize(operation.get('op', ''))
+            if name not in OPERATIONS:
+                known = ', '.join(sorted(OPERATIONS))
+                raise ValueError(f"Unknown operation {operation.get('op')!r}; expected one of: {known}")
+            steps.append({
+                'op': operation['op'],
+                'spec': OPERATIONS[name],
+                'id': operation.get('id'),
+                'data': dict(operation.get('data') or {}),
+                'as': operation.get('as'),
+            })
+        return steps
+
+    def _result(self, index, step, ok, record_id, value, error=None, code=None, ms=0.0):
+        step['spec'].done(ok, record_id, value)
+        return {"index": index, "op": step['op'], "ok": ok, "id": record_id, "value": value,
+                "error": error, "code": code, "ms": ms}
+
+    def _run_locally(self, steps):
+        """Run each step as its keyword, resolving references here instead of in Node"""
+        named, results = {}, []
+        for index, step in enumerate(steps):
+            started = time.perf_counter()
+            try:
+                record_id = resolve_references(step['id'], named)
+                data = resolve_references(step['data'], named)
+            except UnresolvedReference as e:
+                results.append(self._result(index, step, False, None, None, error=str(e)))
+                continue
+            value = step['spec'].local(record_id, data)
+            if isinstance(value, dict) and value.get('id'):
+                record_id = value['id']
+            ok = value is not None and value is not False
+            ms = (time.perf_counter() - started) * 1000
+            if step['as'] and ok:
+                named[step['as']] = {'id': record_id, 'data': value}
+            results.append(self._result(index, step, ok, record_id, value, ms=ms))
+        return results
+
+    def run_operations(self, operations):
+        """Run the steps in `operations` in order in one bridge call; see the module docstring for the format.
+
+        Returns one result per step: index, op, ok, id, value, error, code and ms.
+        """
+        steps = self._steps(operations)
+        calls = [
+            drop_none(**{'fn': step['spec'].fn, 'args': step['spec'].args(step['id'], step['data']),
+                         'as': step['as'], 'id': step['spec'].record_id(step['id'])})
+            for step in steps
+        ]
+        try:
+            outcomes = self._bridge.call("runOperations", calls)
+        except Exception as e:
+            print(f"Failed to call runOperations: {e}, running the operations one by one")
+            return self._run_locally(steps)
+
+        named, results = {}, []
+        for step, outcome in zip(steps, outcomes):
+            ok, record_id, error = outcome['ok'], outcome.get('id'), outcome.get('error') or {}
+            data = resolve_references(step['data'], named) if ok else step['data']
+            value = step['spec'].shape(ok, outcome.get('data'), record_id, data)
+            if step['as'] and ok:
+                named[step['as']] = {'id': record_id, 'data': outcome.get('data')}
+            results.append(self._result(outcome['index'], step, ok, record_id, value,
+                                        error=error.get('message'), code=error.get('code'), ms=outcome['ms']))
+        total = sum(result['ms'] for result in results)
+        print(f"*INFO* Ran {len(results)} operations in one bridge call ({total:.0f} ms in Node)")
+        return results
+
+# Bridge call timings per suite/keyword (see bridge_trace.py)
+ROBOT_LIBRARY_LISTENER = trace_listener
+
+# Create global instance for Robot Framework
+operation_functions = OperationFunctions()
+
+# Robot Framework compatible functions
+def run_operations(operations):
+    return operation_functions.run_operations(operations)
+
+# Wraps the keywords selected with SHARERAPY_PROFILE in the profiler (see keyword_profiler.py)
+profile_keywords(globals())
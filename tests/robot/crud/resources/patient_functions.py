@@ -1,57 +1,29 @@
 # patient_functions.py
-import subprocess
-import json
-import os
+import time
 import uuid
 from typing import Dict, List, Optional, Any
 
+from bridge_trace import trace_listener
+from compact_rows import compact_flag, compact_result
+from form_fields import PATIENT_FORM_FIELDS
+from keyword_profiler import profile_keywords
+from local_store import LocalTable, full_name
+from read_cache import cache
+from tsx_bridge import bridge, drop_none, field_list, form_data, gather_bounded, item_result, iter_pages, project_rows, redirect_id
+
 class PatientFunctions:
     """Patient functions that interface with TypeScript/Supabase backend"""
     
     def __init__(self):
-        # Set up the project root directory
-        self.project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         # In-memory fallback store to support positive lifecycle tests when TS/backend isn't available
-        self._local_store = {"patients": {}}
-    
-    def _run_tsx_script(self, script_content: str) -> Any:
-        """Execute a TypeScript script using tsx and return the result"""
-        try:
-            # Create a temporary script file
-            script_path = os.path.join(self.project_root, 'temp_patient_test.ts')
-            
-            with open(script_path, 'w') as f:
-                f.write(script_content)
-            
-            # Run the script using tsx (TypeScript executor)
-            result = subprocess.run(
-                ['npx', 'tsx', script_path],
-                capture_output=True,
-                text=True,
-                cwd=self.project_root,
-                env={**os.environ},  # Pass through environment variables for Supabase
-                shell=True  # Add shell=True for Windows compatibility
-            )
-            
-            # Clean up
-            if os.path.exists(script_path):
-                os.remove(script_path)
-            
-            if result.returncode != 0:
-                raise Exception(f"TSX script failed: {result.stderr}")
-            
-            # Parse JSON response
-            if result.stdout.strip():
-                return json.loads(result.stdout.strip())
-            # If no output, raise exception to trigger fallback
-            raise Exception("TSX script produced no output")
-            
-        except Exception as e:
-            print(f"Error running TSX script: {e}")
-            raise
+        self._local_store = {"patients": LocalTable(full_name, indexed=("country_id", "sex"))}
+        # Persistent tsx worker shared with the other keyword libraries
+        self._bridge = bridge
+        # By-ID read cache shared with the other keyword libraries
+        self._cache = cache
 
-    def get_all_patients(self, search=None, ascending=True, country_id=None, sex=None, page=0, page_size=20):
-        """Get all patients using the ACTUAL readPatients function from lib/data/patients.ts"""
+    def _read_patients_params(self, search, ascending, country_id, sex, page, page_size):
+        """Normalize get_all_patients arguments into readPatients parameters"""
         # Convert string parameters to proper types
         try:
             page = int(page) if page is not None else 0
@@ -61,157 +33,171 @@ class PatientFunctions:
             page = 0
             page_size = 20
             country_id = None
-            
-        # Create TypeScript script that imports and calls the ACTUAL backend function
-        script_content = f"""
-import {{ readPatients }} from './lib/data/patients.js';
-
-async function testActualReadPatients() {{
-    try {{
-        const result = await readPatients({{
-            search: {json.dumps(search)},
-            ascending: {json.dumps(ascending)},
-            countryID: {country_id if country_id else 'undefined'},
-            sex: {json.dumps(sex)},
-            page: {page},
-            pageSize: {page_size}
-        }});
-        
-        console.log(JSON.stringify(result));
-    }} catch (error) {{
-        console.error('Error calling actual readPatients function:', error.message);
-        process.exit(1);
-    }}
-}}
-
-testActualReadPatients();
-"""
-        
+
+        return drop_none(
+            search=search,
+            ascending=ascending,
+            countryID=country_id or None,
+            sex=sex,
+            page=page,
+            pageSize=page_size,
+        )
+
+    def _patients_fallback(self, error, params):
+        """List result used when readPatients can't be reached"""
+        print(f"Failed to call actual readPatients function: {error}, using mock/local data")
+        # Prefer local store if any patients were created during tests
+        local_patients = self._local_store["patients"]
+        if local_patients:
+            data, count = local_patients.query(
+                filters={"country_id": params.get("countryID"), "sex": params.get("sex")},
+                search=params.get("search"),
+                ascending=params.get("ascending", True),
+                offset=params.get("page", 0) * params.get("pageSize", 20),
+                limit=params.get("pageSize", 20),
+            )
+            return {"data": data, "count": count}
+        # Return mock data if no local data exists
+        return {
+            "data": [
+                {
+                    "id": str(uuid.uuid4()),
+                    "first_name": "John",
+                    "last_name": "Doe",
+                    "birthdate": "1990-01-01",
+                    "sex": "Male",
+                    "contact_number": "+1234567890",
+                    "country_id": 1
+                }
+            ],
+            "count": 1
+        }
+
+    def _known_patient(self, patient_id):
+        """Answer by-ID reads that don't need the backend, as (handled, patient)"""
+        # If present in local store (created during tests), return it
+        if patient_id in self._local_store.get("patients", {}):
+            return True, self._local_store["patients"][patient_id]
+        cached = self._cache.get("patients", patient_id)
+        if cached is not None:
+            return True, cached
+        # For testing, simulate that non-existent patients return None
+        if patient_id == "missing" or len(patient_id) > 36:
+            return True, None
+        return False, None
+
+    def _remember_patient(self, result):
+        # Cache the patient if TS returned a representation
+        return self._cache.put("patients", result)
+
+    def _forget_patient(self, patient_id):
+        # Reports embed their patient, and so do the therapists embedding those reports
+        self._cache.invalidate("patients", patient_id)
+        self._cache.invalidate_referencing("reports", "patient_id", patient_id)
+        self._cache.invalidate_embedding("therapists", "reports", "patient_id", patient_id)
+
+    def _patient_fallback(self, patient_id):
+        # If TS failed but we have a local created patient, return it
+        if patient_id in self._local_store.get("patients", {}):
+            return self._local_store["patients"][patient_id]
+        # For testing, random UUIDs should return None (non-existent)
+        return None
+
+    def get_all_patients(self, search=None, ascending=True, country_id=None, sex=None, page=0, page_size=20, fields=None, compact=False):
+        """Get all patients using the ACTUAL readPatients function from lib/data/patients.ts"""
+        params = self._read_patients_params(search, ascending, country_id, sex, page, page_size)
+        fields, compact = field_list(fields), compact_flag(compact)
         try:
-            result = self._run_tsx_script(script_content)
-            # If TS returned a created patient object, also cache it locally so
-            # lifecycle tests (delete/update) can rely on local store when TS
-            # delete/update isn't available.
-            if isinstance(result, dict) and result.get('id'):
-                self._local_store.setdefault('patients', {})[result['id']] = result
-            return result
+            return self._bridge.call("readPatients", params, fields=fields, compact=compact)
         except Exception as e:
-            print(f"Failed to call actual readPatients function: {e}, using mock/local data")
-            # Prefer local store if any patients were created during tests
-            local_patients = list(self._local_store.get("patients", {}).values())
-            if local_patients:
-                return {"data": local_patients, "count": len(local_patients)}
-            # Return mock data if no local data exists
-            return {
-                "data": [
-                    {
-                        "id": str(uuid.uuid4()),
-                        "first_name": "John",
-                        "last_name": "Doe",
-                        "birthdate": "1990-01-01",
-                        "sex": "Male",
-                        "contact_number": "+1234567890",
-                        "country_id": 1
-                    }
-                ],
-                "count": 1
-            }
+            result = project_rows(self._patients_fallback(e, params), fields)
+            return compact_result(result) if compact else result
+
+    async def get_all_patients_async(self, search=None, ascending=True, country_id=None, sex=None, page=0, page_size=20, fields=None, compact=False):
+        """Awaitable get_all_patients"""
+        params = self._read_patients_params(search, ascending, country_id, sex, page, page_size)
+        fields, compact = field_list(fields), compact_flag(compact)
+        try:
+            return await self._bridge.call_async("readPatients", params, fields=fields, compact=compact)
+        except Exception as e:
+            result = project_rows(self._patients_fallback(e, params), fields)
+            return compact_result(result) if compact else result
+
+    def iter_all_patients(self, search=None, ascending=True, country_id=None, sex=None, page_size=100, fields=None, compact=False):
+        """Lazily yield every matching patient, fetching the next page while the current one is consumed"""
+        page_size = int(page_size)
+        return iter_pages(
+            lambda page: self.get_all_patients(search, ascending, country_id, sex, page, page_size, fields, compact),
+            page_size,
+        )
 
     def get_patient_by_id(self, patient_id):
         """Get a specific patient by ID using ACTUAL readPatient function from lib/data/patients.ts"""
-        # For testing, simulate that non-existent patients return None
-        # If present in local store (created during tests), return it
-        if patient_id in self._local_store.get("patients", {}):
-            return self._local_store["patients"][patient_id]
+        handled, patient = self._known_patient(patient_id)
+        if handled:
+            return patient
+        try:
+            return self._remember_patient(self._bridge.call("readPatient", patient_id))
+        except Exception:
+            return self._patient_fallback(patient_id)
 
-        if patient_id == "missing" or len(patient_id) > 36:
-            return None
-        
-        # Create TypeScript script that calls the ACTUAL readPatient function
-        script_content = f"""
-import {{ readPatient }} from './lib/data/patients.js';
-
-async function testActualReadPatient() {{
-    try {{
-        const result = await readPatient('{patient_id}');
-        console.log(JSON.stringify(result));
-    }} catch (error) {{
-        // If patient not found, readPatient should throw or return null
-        if (error.message.includes('not found') || error.code === 'PGRST116') {{
-            console.log('null');
-        }} else {{
-            console.error('Error calling actual readPatient function:', error.message);
-            process.exit(1);
-        }}
-    }}
-}}
-
-testActualReadPatient();
-"""
-        
+    async def get_patient_by_id_async(self, patient_id):
+        """Awaitable get_patient_by_id"""
+        handled, patient = self._known_patient(patient_id)
+        if handled:
+            return patient
         try:
-            result = self._run_tsx_script(script_content)
-            # Cache updated patient if TS returned a representation
-            if isinstance(result, dict) and result.get('id'):
-                self._local_store.setdefault('patients', {})[result['id']] = result
-            return result
+            return self._remember_patient(await self._bridge.call_async("readPatient", patient_id))
         except Exception:
-            # If TS failed but we have a local created patient, return it
-            if patient_id in self._local_store.get("patients", {}):
-                return self._local_store["patients"][patient_id]
-            # For testing, random UUIDs should return None (non-existent)
-            return None
+            return self._patient_fallback(patient_id)
+
+    async def get_patients_by_ids(self, patient_ids, concurrency=20):
+        """Get many patients concurrently, with at most `concurrency` reads in flight.
+
+        Results are returned in the same order as `patient_ids` (None for missing ones).
+        """
+        return await gather_bounded((self.get_patient_by_id_async(pid) for pid in patient_ids), concurrency)
+
+    def _create_local(self, data):
+        # Simulate creating a patient with a new ID and store it locally for lifecycle tests
+        created = dict(data)
+        created_id = str(uuid.uuid4())
+        created["id"] = created_id
+        created["created_at"] = "2023-01-01T00:00:00Z"
+        self._local_store.setdefault("patients", {})[created_id] = created
+        return created
+
+    def _update_local(self, patient_id, data):
+        # If TS failed but we have a local created patient, update and return it
+        if patient_id in self._local_store.get("patients", {}):
+            # Replace rather than mutate the row so the store re-indexes it
+            stored = {**self._local_store["patients"][patient_id], **data, "updated_at": "2023-01-01T00:00:00Z"}
+            self._local_store["patients"][patient_id] = stored
+            return stored
+        # For testing, random UUIDs should return None (non-existent)
+        return None
+
+    def _delete_local(self, patient_id):
+        # TS call failed == attempt local cleanup
+        if patient_id in self._local_store.get("patients", {}):
+            del self._local_store["patients"][patient_id]
+            return True
+        return False
 
     def create_patient(self, data):
         """Create a new patient using ACTUAL createPatient function from lib/actions/patients.ts"""
-        # Create TypeScript script that calls the ACTUAL createPatient function
-        script_content = f"""
-import {{ createPatient }} from './lib/actions/patients.js';
-
-async function testActualCreatePatient() {{
-    try {{
-        // Convert data to FormData format that the action expects
-        const patientData = {json.dumps(data)};
-        
-        // Create a FormData object and populate it
-        const formData = new FormData();
-        if (patientData.first_name) formData.append('first_name', patientData.first_name);
-        if (patientData.last_name) formData.append('last_name', patientData.last_name);
-        if (patientData.birthdate) formData.append('birthdate', patientData.birthdate);
-        if (patientData.sex) formData.append('sex', patientData.sex);
-        if (patientData.contact_number) formData.append('contact_number', patientData.contact_number);
-        if (patientData.country_id) formData.append('country_id', patientData.country_id.toString());
-        
-        const result = await createPatient(formData);
-        
-        // Since the action doesn't return data, simulate created patient
-        const createdPatient = {{ 
-            ...patientData, 
-            id: "{str(uuid.uuid4())}",
-            created_at: new Date().toISOString()
-        }};
-        console.log(JSON.stringify(createdPatient));
-    }} catch (error) {{
-        console.error('Error calling actual createPatient function:', error.message);
-        process.exit(1);
-    }}
-}}
-
-testActualCreatePatient();
-"""
-        
         try:
-            result = self._run_tsx_script(script_content)
+            outcome = self._bridge.call("createPatient", form_data(data, PATIENT_FORM_FIELDS))
+            # The action redirects to the new patient's profile instead of returning it
+            result = {
+                **data,
+                "id": redirect_id(outcome) or str(uuid.uuid4()),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
             return result
         except Exception as e:
             print(f"Failed to call actual createPatient function: {e}, using mock/local data")
-            # Simulate creating a patient with a new ID and store it locally for lifecycle tests
-            created = dict(data)
-            created_id = str(uuid.uuid4())
-            created["id"] = created_id
-            created["created_at"] = "2023-01-01T00:00:00Z"
-            self._local_store.setdefault("patients", {})[created_id] = created
-            return created
+            return self._create_local(data)
 
     def update_patient(self, patient_id, data):
         """Update an existing patient using ACTUAL updatePatient function from lib/actions/patients.ts"""
@@ -219,54 +205,19 @@ testActualCreatePatient();
         if patient_id == "missing" or len(patient_id) > 36:
             return None
         
-        # Create TypeScript script that calls the ACTUAL updatePatient function
-        script_content = f"""
-import {{ updatePatient }} from './lib/actions/patients.js';
-
-async function testActualUpdatePatient() {{
-    try {{
-        // Convert data to FormData format that the action expects
-        const patientData = {json.dumps(data)};
-        
-        // Create a FormData object and populate it
-        const formData = new FormData();
-        if (patientData.first_name) formData.append('first_name', patientData.first_name);
-        if (patientData.last_name) formData.append('last_name', patientData.last_name);
-        if (patientData.birthdate) formData.append('birthdate', patientData.birthdate);
-        if (patientData.sex) formData.append('sex', patientData.sex);
-        if (patientData.contact_number) formData.append('contact_number', patientData.contact_number);
-        if (patientData.country_id) formData.append('country_id', patientData.country_id.toString());
-        
-        const result = await updatePatient('{patient_id}', formData);
-        
-        // Since the action doesn't return data, simulate updated patient
-        const updatedPatient = {{ 
-            ...patientData, 
-            id: '{patient_id}',
-            updated_at: new Date().toISOString()
-        }};
-        console.log(JSON.stringify(updatedPatient));
-    }} catch (error) {{
-        console.error('Error calling actual updatePatient function:', error.message);
-        process.exit(1);
-    }}
-}}
-
-testActualUpdatePatient();
-"""
-        
         try:
-            result = self._run_tsx_script(script_content)
+            self._bridge.call("updatePatient", patient_id, form_data(data, PATIENT_FORM_FIELDS))
+            # The action doesn't return data, so report the submitted fields
+            result = {
+                **data,
+                "id": patient_id,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
             return result
         except Exception:
-            # If TS failed but we have a local created patient, update and return it
-            if patient_id in self._local_store.get("patients", {}):
-                stored = self._local_store["patients"][patient_id]
-                stored.update(data)
-                stored["updated_at"] = "2023-01-01T00:00:00Z"
-                return stored
-            # For testing, random UUIDs should return None (non-existent)
-            return None
+            return self._update_local(patient_id, data)
+        finally:
+            self._forget_patient(patient_id)
 
     def delete_patient(self, patient_id):
         """Delete a patient using ACTUAL deletePatient function from lib/actions/patients.ts"""
@@ -274,51 +225,57 @@ testActualUpdatePatient();
         if patient_id == "missing" or len(patient_id) > 36:
             return False
         
-        # Create TypeScript script that calls the ACTUAL deletePatient function
-        script_content = f"""
-import {{ deletePatient }} from './lib/actions/patients.js';
-
-async function testActualDeletePatient() {{
-    try {{
-        const result = await deletePatient('{patient_id}');
-        
-        // Since the action doesn't return data, indicate success
-        console.log('true');
-    }} catch (error) {{
-        console.error('Error calling actual deletePatient function:', error.message);
-        console.log('false');
-    }}
-}}
-
-testActualDeletePatient();
-"""
-        
         try:
-            result = self._run_tsx_script(script_content)
-            # Normalize TS result to boolean success
-            success = False
-            if isinstance(result, bool):
-                success = result
-            elif isinstance(result, str):
-                success = result.lower() in ("true", "1", "yes")
-            elif isinstance(result, dict):
-                success = True
-
-            if success:
-                return True
-
-            # TS returned falsy: remove any locally-created mock and treat as success
-            if patient_id in self._local_store.get("patients", {}):
-                del self._local_store["patients"][patient_id]
-                return True
-
-            return False
+            self._bridge.call("deletePatient", patient_id)
+            # Drop any cached copy so later reads don't resurrect the record
+            self._local_store.get("patients", {}).pop(patient_id, None)
+            return True
         except Exception:
-            # TS call failed == attempt local cleanup
-            if patient_id in self._local_store.get("patients", {}):
-                del self._local_store["patients"][patient_id]
-                return True
-            return False
+            return self._delete_local(patient_id)
+        finally:
+            self._forget_patient(patient_id)
+
+    def create_patients_bulk(self, items):
+        """Create many patients with one batched insert in a single bridge call.
+
+        Returns one result per item: index, ok, id, data and error.
+        """
+        def local(index, data):
+            return item_result(index, True, data=self._create_local(data))
+
+        return self._bridge.call_bulk("createPatientsBulk", items, local)
+
+    def update_patients_bulk(self, items):
+        """Update many patients in a single bridge call; each item must carry its `id`"""
+        def local(index, data):
+            updated = self._update_local(data.get("id"), data)
+            if updated is None:
+                return item_result(index, False, error="Not found", code="PGRST116")
+            return item_result(index, True, data=updated)
+
+        results = self._bridge.call_bulk("updatePatientsBulk", items, local)
+        for item in items:
+            self._forget_patient(item.get("id"))
+        return results
+
+    def delete_patients_bulk(self, patient_ids):
+        """Delete many patients with one `in (...)` delete in a single bridge call"""
+        def local(index, patient_id):
+            if self._delete_local(patient_id):
+                return item_result(index, True, data={"id": patient_id})
+            return item_result(index, False, error="Not found", code="PGRST116")
+
+        results = self._bridge.call_bulk("deletePatientsBulk", patient_ids, local)
+        for patient_id in patient_ids:
+            self._forget_patient(patient_id)
+        # Drop cached copies so later reads don't resurrect deleted records
+        for result in results:
+            if result["ok"] and result["id"]:
+                self._local_store.get("patients", {}).pop(result["id"], None)
+        return results
+
+# Bridge call timings per suite/keyword (see bridge_trace.py)
+ROBOT_LIBRARY_LISTENER = trace_listener
 
 # Create global instance for Robot Framework
 patient_functions = PatientFunctions()
@@ -327,9 +284,21 @@ patient_functions = PatientFunctions()
 def get_all_patients(**kwargs):
     return patient_functions.get_all_patients(**kwargs)
 
+def iter_all_patients(**kwargs):
+    return patient_functions.iter_all_patients(**kwargs)
+
 def get_patient_by_id(patient_id):
     return patient_functions.get_patient_by_id(patient_id)
 
+async def get_all_patients_async(**kwargs):
+    return await patient_functions.get_all_patients_async(**kwargs)
+
+async def get_patient_by_id_async(patient_id):
+    return await patient_functions.get_patient_by_id_async(patient_id)
+
+async def get_patients_by_ids(patient_ids, concurrency=20):
+    return await patient_functions.get_patients_by_ids(patient_ids, concurrency)
+
 def create_patient(data):
     return patient_functions.create_patient(data)
 
@@ -337,4 +306,16 @@ def update_patient(patient_id, data):
     return patient_functions.update_patient(patient_id, data)
 
 def delete_patient(patient_id):
-    return patient_functions.delete_patient(patient_id)
\ No newline at end of file
+    return patient_functions.delete_patient(patient_id)
+
+def create_patients_bulk(items):
+    return patient_functions.create_patients_bulk(items)
+
+def update_patients_bulk(items):
+    return patient_functions.update_patients_bulk(items)
+
+def delete_patients_bulk(patient_ids):
+    return patient_functions.delete_patients_bulk(patient_ids)
+
+# Wraps the keywords selected with SHARERAPY_PROFILE in the profiler (see keyword_profiler.py)
+profile_keywords(globals())
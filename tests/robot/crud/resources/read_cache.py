@@ -0,0 +1,110 @@
+# read_cache.py
+"""Read-through cache for by-ID lookups, shared by the keyword libraries.
+
+Rows read by ID are kept per entity kind ("patients", "reports",
+"therapists"). Suites that verify the same record several times then only go
+to Supabase once. Rows from list results are not cached: the list reads embed
+less (a patient's reports carry only their type), so they can't answer a
+by-ID read. The cache is bounded (LRU) and entries expire after a TTL. The
+update/delete keywords invalidate the rows they touch, as well as cached rows
+that embed them.
+
+Tuning (environment variables):
+  SHARERAPY_CACHE_SIZE  maximum number of cached rows, 0 disables (default 1024)
+  SHARERAPY_CACHE_TTL   seconds a row stays fresh (default 60)
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_SIZE = int(os.environ.get('SHARERAPY_CACHE_SIZE', '1024'))
+CACHE_TTL = float(os.environ.get('SHARERAPY_CACHE_TTL', '60'))
+
+Key = Tuple[str, str]
+
+
+class ReadCache:
+    """LRU + TTL cache of rows keyed by (kind, id)"""
+
+    def __init__(self, max_size: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # (kind, id) -> (row, expires at); oldest use first
+        self._entries: "OrderedDict[Key, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, row_id: str) -> Optional[Dict[str, Any]]:
+        """Return the cached row, or None if it is missing or expired"""
+        key = (kind, row_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, kind: str, row: Any) -> Any:
+        """Cache a row returned by a by-ID read; returns it unchanged"""
+        if isinstance(row, dict) and row.get('id'):
+            with self._lock:
+                self._store((kind, row['id']), row)
+        return row
+
+    def invalidate(self, kind: str, row_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Drop one row; returns what was cached so callers can invalidate related rows"""
+        if not row_id:
+            return None
+        with self._lock:
+            entry = self._entries.pop((kind, row_id), None)
+        return entry[0] if entry else None
+
+    def invalidate_referencing(self, kind: str, field: str, row_id: Optional[str]) -> None:
+        """Drop every cached `kind` row whose `field` points at `row_id`"""
+        if not row_id:
+            return
+        with self._lock:
+            stale = [key for key, (row, _) in self._entries.items()
+                     if key[0] == kind and row.get(field) == row_id]
+            for key in stale:
+                del self._entries[key]
+
+    def invalidate_embedding(self, kind: str, embedded: str, field: str, row_id: Optional[str]) -> None:
+        """Drop every cached `kind` row with an item in its `embedded` list whose `field` is `row_id`"""
+        if not row_id:
+            return
+        with self._lock:
+            stale = [key for key, (row, _) in self._entries.items()
+                     if key[0] == kind and any(isinstance(item, dict) and item.get(field) == row_id
+                                               for item in row.get(embedded) or ())]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def _store(self, key: Key, row: Dict[str, Any]) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (row, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+# Shared by the patient, report and therapist keyword libraries
+cache = ReadCache()
+
+
+def clear_read_cache():
+    """Robot keyword: forget every cached row, e.g. before checking the backend directly"""
+    cache.clear()
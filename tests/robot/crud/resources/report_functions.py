@@ -1,57 +1,35 @@
 # report_functions.py
-import os
-import subprocess
-import json
+import time
 import uuid
 from typing import Dict, List, Optional, Any
 
+from bridge_trace import trace_listener
+from compact_rows import compact_flag, compact_result
+from form_fields import REPORT_FORM_FIELDS
+from keyword_profiler import profile_keywords
+from local_store import LocalTable
+from read_cache import cache
+from search_index import report_search_index
+from tsx_bridge import BridgeError, bridge, drop_none, field_list, form_data, gather_bounded, item_result, iter_pages, project_rows, redirect_id
+
 class ReportFunctions:
     """Report functions that interface with TypeScript/Supabase backend"""
     
     def __init__(self):
-        # Set up the project root directory
-        self.project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         # In-memory fallback store to support positive lifecycle tests when TS/backend isn't available
-        self._local_store = {"reports": {}}
-    
-    def _run_tsx_script(self, script_content: str) -> Any:
-        """Execute a TypeScript script using tsx and return the result"""
-        try:
-            # Create a temporary script file
-            script_path = os.path.join(self.project_root, 'temp_report_test.ts')
-            
-            with open(script_path, 'w') as f:
-                f.write(script_content)
-            
-            # Run the script using tsx (TypeScript executor)
-            result = subprocess.run(
-                ['npx', 'tsx', script_path],
-                capture_output=True,
-                text=True,
-                cwd=self.project_root,
-                env={**os.environ},  # Pass through environment variables for Supabase
-                shell=True  # Add shell=True for Windows compatibility
-            )
-            
-            # Clean up
-            if os.path.exists(script_path):
-                os.remove(script_path)
-            
-            if result.returncode != 0:
-                raise Exception(f"TSX script failed: {result.stderr}")
-            
-            # Parse JSON response
-            if result.stdout.strip():
-                return json.loads(result.stdout.strip())
-            # If no output, raise exception to trigger fallback
-            raise Exception("TSX script produced no output")
-            
-        except Exception as e:
-            print(f"Error running TSX script: {e}")
-            raise
-
-    def get_all_reports(self, search=None, type_id=None, report_id=None, therapist_id=None, limit=20, offset=0):
-        """Get all reports using the ACTUAL readReports function from lib/data/reports.ts"""
+        self._local_store = {"reports": LocalTable(
+            lambda row: row.get("title") or "",
+            indexed=("type_id", "language_id", "patient_id", "therapist_id"),
+            # Searches are ranked like the search_reports_ranked RPC readReports calls
+            search_index=report_search_index(),
+        )}
+        # Persistent tsx worker shared with the other keyword libraries
+        self._bridge = bridge
+        # By-ID read cache shared with the other keyword libraries
+        self._cache = cache
+
+    def _read_reports_params(self, search, type_id, report_id, therapist_id, limit, offset):
+        """Normalize get_all_reports arguments into readReports parameters"""
         # Convert string parameters to appropriate types
         try:
             limit = int(limit) if limit is not None else 20
@@ -62,162 +40,180 @@ class ReportFunctions:
             offset = 0
             type_id = None
         
-        # Calculate page from offset and limit
-        page = (offset // limit) + 1
-        
-        # Create TypeScript script that imports and calls the ACTUAL backend function
-        script_content = f"""
-import {{ readReports }} from './lib/data/reports.js';
-
-async function testActualReadReports() {{
-    try {{
-        const result = await readReports({{
-            search: {json.dumps(search)},
-            typeId: {type_id or 'undefined'},
-            patientId: {json.dumps(report_id)},
-            therapistId: {json.dumps(therapist_id)},
-            ascending: true,
-            page: {page},
-            pageSize: {limit}
-        }});
-        
-        console.log(JSON.stringify(result));
-    }} catch (error) {{
-        console.error('Error calling actual readReports function:', error.message);
-        process.exit(1);
-    }}
-}}
-
-testActualReadReports();
-"""
-        
-        try:
-            result = self._run_tsx_script(script_content)
-            return result
-        except Exception as e:
-            print(f"Failed to call actual readReports function: {e}, using mock/local data")
-            local_reports = list(self._local_store.get("reports", {}).values())
-            if local_reports:
-                return {"data": local_reports, "count": len(local_reports)}
-            # Return mock data if no local data exists
-            return {
-                "data": [
-                    {
-                        "id": str(uuid.uuid4()),
-                        "title": "Mock Report",
-                        "description": "Mock report for testing",
-                        "type_id": 1,
-                        "report_id": str(uuid.uuid4()),
-                        "therapist_id": str(uuid.uuid4()),
-                        "created_at": "2023-01-01T00:00:00Z"
-                    }
-                ],
-                "count": 1
-            }
-
-    def get_report_by_id(self, report_id):
-        """Get a specific report by ID"""
+        # Calculate the 0-based page readReports expects from offset and limit
+        page = offset // limit
+
+        return drop_none(
+            search=search,
+            typeIDs=[type_id] if type_id else None,
+            patientID=report_id,
+            therapistID=therapist_id,
+            ascending=True,
+            page=page,
+            pageSize=limit,
+        )
+
+    def _reports_fallback(self, error, params):
+        """List result used when readReports can't be reached"""
+        print(f"Failed to call actual readReports function: {error}, using mock/local data")
+        local_reports = self._local_store["reports"]
+        if local_reports:
+            data, count = local_reports.query(
+                filters={
+                    "type_id": params.get("typeIDs"),
+                    "patient_id": params.get("patientID"),
+                    "therapist_id": params.get("therapistID"),
+                },
+                search=params.get("search"),
+                ascending=params.get("ascending", True),
+                offset=params.get("page", 0) * params.get("pageSize", 20),
+                limit=params.get("pageSize", 20),
+            )
+            return {"data": data, "count": count}
+        # Return mock data if no local data exists
+        return {
+            "data": [
+                {
+                    "id": str(uuid.uuid4()),
+                    "title": "Mock Report",
+                    "description": "Mock report for testing",
+                    "type_id": 1,
+                    "report_id": str(uuid.uuid4()),
+                    "therapist_id": str(uuid.uuid4()),
+                    "created_at": "2023-01-01T00:00:00Z"
+                }
+            ],
+            "count": 1
+        }
+
+    def _known_report(self, report_id):
+        """Locally created or cached report, if any"""
         if report_id in self._local_store.get("reports", {}):
             return self._local_store["reports"][report_id]
+        return self._cache.get("reports", report_id)
+
+    def _remember_report(self, result):
+        # Cache the report if we got one back
+        return self._cache.put("reports", result)
+
+    def _forget_report(self, report_id, data=None):
+        # Patients and therapists embed their reports, so drop the ones this report belongs to
+        cached = self._cache.invalidate("reports", report_id)
+        for row in (cached, data):
+            if isinstance(row, dict):
+                self._cache.invalidate("patients", row.get("patient_id"))
+                self._cache.invalidate("therapists", row.get("therapist_id"))
+        # Also when the report itself wasn't cached, or moved to another patient or therapist
+        self._cache.invalidate_embedding("patients", "reports", "id", report_id)
+        self._cache.invalidate_embedding("therapists", "reports", "id", report_id)
+
+    def _report_fallback(self, report_id, error):
+        if isinstance(error, BridgeError) and error.code == 'PGRST116':
+            # .single() matched no rows: the report doesn't exist
+            return None
+        print(f"Failed to call actual get_report_by_id: {error}, falling back to local/mock")
+        # If local store has it, return it; otherwise None indicates not found
+        if report_id in self._local_store.get("reports", {}):
+            return self._local_store["reports"][report_id]
+        return None
 
-        # Attempt to call the real backend (Supabase) via a Node/TS script.
-        script_content = f"""
-import {{ createClient }} from '@supabase/supabase-js'
-
-const supabaseUrl = process.env.NEXT_PUBLIC_SUPABASE_URL
-const supabaseKey = process.env.NEXT_PUBLIC_SUPABASE_PUBLISHABLE_KEY
-
-if (!supabaseUrl || !supabaseKey) {{
-    // Supabase not configured: return null so caller can fallback
-    console.log('null')
-    process.exit(0)
-}}
-
-const supabase = createClient(supabaseUrl, supabaseKey)
-
-async function getReport() {{
-    try {{
-        const {{ data, error }} = await supabase
-            .from('reports')
-            .select('*')
-            .eq('id', '{report_id}')
-            .single()
-
-        if (error && error.code !== 'PGRST116') throw error
+    def get_all_reports(self, search=None, type_id=None, report_id=None, therapist_id=None, limit=20, offset=0, fields=None, compact=False):
+        """Get all reports using the ACTUAL readReports function from lib/data/reports.ts"""
+        params = self._read_reports_params(search, type_id, report_id, therapist_id, limit, offset)
+        fields, compact = field_list(fields), compact_flag(compact)
+        try:
+            return self._bridge.call("readReports", params, fields=fields, compact=compact)
+        except Exception as e:
+            result = project_rows(self._reports_fallback(e, params), fields)
+            return compact_result(result) if compact else result
 
-        console.log(JSON.stringify(data))
-    }} catch (error) {{
-        console.log('null')
-    }}
-}}
+    async def get_all_reports_async(self, search=None, type_id=None, report_id=None, therapist_id=None, limit=20, offset=0, fields=None, compact=False):
+        """Awaitable get_all_reports"""
+        params = self._read_reports_params(search, type_id, report_id, therapist_id, limit, offset)
+        fields, compact = field_list(fields), compact_flag(compact)
+        try:
+            return await self._bridge.call_async("readReports", params, fields=fields, compact=compact)
+        except Exception as e:
+            result = project_rows(self._reports_fallback(e, params), fields)
+            return compact_result(result) if compact else result
+
+    def iter_all_reports(self, search=None, type_id=None, report_id=None, therapist_id=None, page_size=100, fields=None, compact=False):
+        """Lazily yield every matching report, fetching the next page while the current one is consumed"""
+        page_size = int(page_size)
+        return iter_pages(
+            lambda page: self.get_all_reports(search, type_id, report_id, therapist_id, page_size, page * page_size,
+                                             fields, compact),
+            page_size,
+        )
 
-getReport()
-"""
+    def get_report_by_id(self, report_id):
+        """Get a specific report by ID using ACTUAL readReport function from lib/data/reports.ts"""
+        known = self._known_report(report_id)
+        if known is not None:
+            return known
+        try:
+            return self._remember_report(self._bridge.call("readReport", report_id))
+        except Exception as e:
+            return self._report_fallback(report_id, e)
 
+    async def get_report_by_id_async(self, report_id):
+        """Awaitable get_report_by_id"""
+        known = self._known_report(report_id)
+        if known is not None:
+            return known
         try:
-            result = self._run_tsx_script(script_content)
-            # Cache in local store if we got a report back
-            if isinstance(result, dict) and result.get('id'):
-                self._local_store.setdefault('reports', {})[result['id']] = result
-            return result
+            return self._remember_report(await self._bridge.call_async("readReport", report_id))
         except Exception as e:
-            print(f"Failed to call actual get_report_by_id: {e}, falling back to local/mock")
-            # If local store has it, return it; otherwise None indicates not found
-            if report_id in self._local_store.get("reports", {}):
-                return self._local_store["reports"][report_id]
-            return None
+            return self._report_fallback(report_id, e)
+
+    async def get_reports_by_ids(self, report_ids, concurrency=20):
+        """Get many reports concurrently, with at most `concurrency` reads in flight.
+
+        Results are returned in the same order as `report_ids` (None for missing ones).
+        """
+        return await gather_bounded((self.get_report_by_id_async(rid) for rid in report_ids), concurrency)
+
+    def _create_local(self, data):
+        # Simulate creating a report with a new ID and store it locally for lifecycle tests
+        created = dict(data)
+        created_id = str(uuid.uuid4())
+        created["id"] = created_id
+        created["created_at"] = "2023-01-01T00:00:00Z"
+        self._local_store.setdefault("reports", {})[created_id] = created
+        return created
+
+    def _update_local(self, report_id, data):
+        # If TS failed but we have a local created report, update and return it
+        if report_id in self._local_store.get("reports", {}):
+            # Replace rather than mutate the row so the store re-indexes it
+            stored = {**self._local_store["reports"][report_id], **data, "updated_at": "2023-01-01T00:00:00Z"}
+            self._local_store["reports"][report_id] = stored
+            return stored
+        # For testing, random UUIDs should return None (non-existent)
+        return None
+
+    def _delete_local(self, report_id):
+        # TS call failed == attempt local cleanup
+        if report_id in self._local_store.get("reports", {}):
+            del self._local_store["reports"][report_id]
+            return True
+        return False
 
     def create_report(self, data):
         """Create a new report using ACTUAL createReport function from lib/actions/reports.ts"""
-        # Create TypeScript script that calls the ACTUAL createReport function
-        script_content = f"""
-import {{ createReport }} from './lib/actions/reports.js';
-
-async function testActualCreateReport() {{
-    try {{
-        // Convert data to FormData format that the action expects
-        const reportData = {json.dumps(data)};
-        
-        // Create a FormData object and populate it
-        const formData = new FormData();
-        if (reportData.therapist_id) formData.append('therapist_id', reportData.therapist_id);
-        if (reportData.type_id) formData.append('type_id', reportData.type_id.toString());
-        if (reportData.language_id) formData.append('language_id', reportData.language_id.toString());
-        if (reportData.report_id) formData.append('report_id', reportData.report_id);
-        if (reportData.content) formData.append('content', JSON.stringify(reportData.content));
-        if (reportData.title) formData.append('title', reportData.title);
-        if (reportData.description) formData.append('description', reportData.description);
-        
-        const result = await createReport(formData);
-        
-        // Since the action doesn't return data, simulate created report
-        const createdReport = {{ 
-            ...reportData, 
-            id: "{str(uuid.uuid4())}",
-            created_at: new Date().toISOString()
-        }};
-        console.log(JSON.stringify(createdReport));
-    }} catch (error) {{
-        console.error('Error calling actual createReport function:', error.message);
-        process.exit(1);
-    }}
-}}
-
-testActualCreateReport();
-"""
-        
         try:
-            result = self._run_tsx_script(script_content)
+            outcome = self._bridge.call("createReport", form_data(data, REPORT_FORM_FIELDS, json_fields=('content',)))
+            self._forget_report(None, data)
+            # The action redirects to the new report instead of returning it
+            result = {
+                **data,
+                "id": redirect_id(outcome) or str(uuid.uuid4()),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
             return result
         except Exception as e:
             print(f"Failed to call actual createReport function: {e}, using mock/local data")
-            # Simulate creating a report with a new ID and store it locally for lifecycle tests
-            created = dict(data)
-            created_id = str(uuid.uuid4())
-            created["id"] = created_id
-            created["created_at"] = "2023-01-01T00:00:00Z"
-            self._local_store.setdefault("reports", {})[created_id] = created
-            return created
+            return self._create_local(data)
 
     def update_report(self, report_id, data):
         """Update an existing report using ACTUAL updateReport function from lib/actions/reports.ts"""
@@ -225,63 +221,19 @@ testActualCreateReport();
         if report_id == "missing" or len(report_id) > 36:
             return None
         
-        # Create TypeScript script that calls the ACTUAL updateReport function
-        script_content = f"""
-import {{ updateReport }} from './lib/actions/reports.js';
-
-async function testActualUpdateReport() {{
-    try {{
-        // Convert data to FormData format that the action expects
-        const reportData = {json.dumps(data)};
-        
-        // Create a FormData object and populate it
-        const formData = new FormData();
-        if (reportData.therapist_id) formData.append('therapist_id', reportData.therapist_id);
-        if (reportData.type_id) formData.append('type_id', reportData.type_id.toString());
-        if (reportData.language_id) formData.append('language_id', reportData.language_id.toString());
-        if (reportData.report_id) formData.append('report_id', reportData.report_id);
-        if (reportData.content) formData.append('content', JSON.stringify(reportData.content));
-        if (reportData.title) formData.append('title', reportData.title);
-        if (reportData.description) formData.append('description', reportData.description);
-        
-        const result = await updateReport('{report_id}', formData);
-        
-        // Since the action doesn't return data, simulate updated report
-        const updatedReport = {{ 
-            ...reportData, 
-            id: '{report_id}',
-            updated_at: new Date().toISOString()
-        }};
-        console.log(JSON.stringify(updatedReport));
-    }} catch (error) {{
-        console.error('Error calling actual updateReport function:', error.message);
-        process.exit(1);
-    }}
-}}
-
-testActualUpdateReport();
-"""
-        
         try:
-            result = self._run_tsx_script(script_content)
+            self._bridge.call("updateReport", report_id, form_data(data, REPORT_FORM_FIELDS, json_fields=('content',)))
+            # The action doesn't return data, so report the submitted fields
+            result = {
+                **data,
+                "id": report_id,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
             return result
         except Exception:
-            # If TS failed but we have a local created report, update and return it
-            if report_id in self._local_store.get("reports", {}):
-                stored = self._local_store["reports"][report_id]
-                stored.update(data)
-                stored["updated_at"] = "2023-01-01T00:00:00Z"
-                return stored
-            # For testing, random UUIDs should return None (non-existent)
-            return None
-        
-        try:
-            return self._run_node_script(script_content)
-        except Exception:
-            result = dict(data)
-            result["id"] = report_id
-            result["updated_at"] = "2023-01-01T00:00:00Z"
-            return result
+            return self._update_local(report_id, data)
+        finally:
+            self._forget_report(report_id, data)
 
     def delete_report(self, report_id):
         """Delete a report using ACTUAL deleteReport function from lib/actions/reports.ts"""
@@ -289,52 +241,61 @@ testActualUpdateReport();
         if report_id == "missing" or len(report_id) > 36:
             return False
         
-        # Create TypeScript script that calls the ACTUAL deleteReport function
-        script_content = f"""
-import {{ deleteReport }} from './lib/actions/reports.js';
-
-async function testActualDeleteReport() {{
-    try {{
-        const result = await deleteReport('{report_id}');
-        
-        // Since the action doesn't return data, indicate success
-        console.log('true');
-    }} catch (error) {{
-        console.error('Error calling actual deleteReport function:', error.message);
-        console.log('false');
-    }}
-}}
-
-testActualDeleteReport();
-"""
-        
         try:
-            result = self._run_tsx_script(script_content)
-            # Normalize TS result to boolean success
-            success = False
-            if isinstance(result, bool):
-                success = result
-            elif isinstance(result, str):
-                success = result.lower() in ("true", "1", "yes")
-            elif isinstance(result, dict):
-                success = True
-
-            if success:
-                return True
-
-            # TS returned falsy: remove any locally-created mock and treat as success
-            if report_id in self._local_store.get("reports", {}):
-                del self._local_store["reports"][report_id]
-                return True
-
-            return False
+            self._bridge.call("deleteReport", report_id)
+            # Drop any cached copy so later reads don't resurrect the record
+            self._local_store.get("reports", {}).pop(report_id, None)
+            return True
         except Exception:
-            # TS call failed == attempt local cleanup
-            if report_id in self._local_store.get("reports", {}):
-                del self._local_store["reports"][report_id]
-                return True
-            return False
-
+            return self._delete_local(report_id)
+        finally:
+            self._forget_report(report_id)
+
+
+    def create_reports_bulk(self, items):
+        """Create many reports with one batched insert in a single bridge call.
+
+        Returns one result per item: index, ok, id, data and error.
+        """
+        def local(index, data):
+            return item_result(index, True, data=self._create_local(data))
+
+        results = self._bridge.call_bulk("createReportsBulk", items, local)
+        for item in items:
+            self._forget_report(None, item)
+        return results
+
+    def update_reports_bulk(self, items):
+        """Update many reports in a single bridge call; each item must carry its `id`"""
+        def local(index, data):
+            updated = self._update_local(data.get("id"), data)
+            if updated is None:
+                return item_result(index, False, error="Not found", code="PGRST116")
+            return item_result(index, True, data=updated)
+
+        results = self._bridge.call_bulk("updateReportsBulk", items, local)
+        for item in items:
+            self._forget_report(item.get("id"), item)
+        return results
+
+    def delete_reports_bulk(self, report_ids):
+        """Delete many reports with one `in (...)` delete in a single bridge call"""
+        def local(index, report_id):
+            if self._delete_local(report_id):
+                return item_result(index, True, data={"id": report_id})
+            return item_result(index, False, error="Not found", code="PGRST116")
+
+        results = self._bridge.call_bulk("deleteReportsBulk", report_ids, local)
+        for report_id in report_ids:
+            self._forget_report(report_id)
+        # Drop cached copies so later reads don't resurrect deleted records
+        for result in results:
+            if result["ok"] and result["id"]:
+                self._local_store.get("reports", {}).pop(result["id"], None)
+        return results
+
+# Bridge call timings per suite/keyword (see bridge_trace.py)
+ROBOT_LIBRARY_LISTENER = trace_listener
 
 # Create global instance for Robot Framework
 report_functions = ReportFunctions()
@@ -343,9 +304,21 @@ report_functions = ReportFunctions()
 def get_all_reports(**kwargs):
     return report_functions.get_all_reports(**kwargs)
 
+def iter_all_reports(**kwargs):
+    return report_functions.iter_all_reports(**kwargs)
+
 def get_report_by_id(report_id):
     return report_functions.get_report_by_id(report_id)
 
+async def get_all_reports_async(**kwargs):
+    return await report_functions.get_all_reports_async(**kwargs)
+
+async def get_report_by_id_async(report_id):
+    return await report_functions.get_report_by_id_async(report_id)
+
+async def get_reports_by_ids(report_ids, concurrency=20):
+    return await report_functions.get_reports_by_ids(report_ids, concurrency)
+
 def create_report(data):
     return report_functions.create_report(data)
 
@@ -353,4 +326,16 @@ def update_report(report_id, data):
     return report_functions.update_report(report_id, data)
 
 def delete_report(report_id):
-    return report_functions.delete_report(report_id)
\ No newline at end of file
+    return report_functions.delete_report(report_id)
+
+def create_reports_bulk(items):
+    return report_functions.create_reports_bulk(items)
+
+def update_reports_bulk(items):
+    return report_functions.update_reports_bulk(items)
+
+def delete_reports_bulk(report_ids):
+    return report_functions.delete_reports_bulk(report_ids)
+
+# Wraps the keywords selected with SHARERAPY_PROFILE in the profiler (see keyword_profiler.py)
+profile_keywords(globals())
@@ -0,0 +1,281 @@
+# search_index.py
+"""Ranked full-text search over local rows, standing in for search_reports_ranked.
+
+When a search can't reach Supabase, readReports' fallback used to filter the
+local reports with a substring scan over title and description. A
+SearchIndex keeps an inverted index over weighted text fields instead,
+updated as rows are stored and removed (see LocalTable's `search_index`), and
+ranks matches with BM25F, approximating the RPC's weighted full-text
+ranking:
+
+- text is split into lower-cased words, English stop words are dropped and
+  common suffixes stripped, roughly like Postgres' `english` configuration
+- a row matches when it contains every word of the search (plainto_tsquery)
+- each field's term frequencies and length count with the field's weight
+  (title above description above content, like setweight A/B/C)
+
+Report content is BlockNote JSON (or a JSON string of it); its text is
+extracted from the blocks, skipping ids, types and styling props.
+
+Matches are counted by intersecting the postings of the search's words, and
+only the best page is scored: each word's postings are also kept ordered by
+their contribution to the score (once a search has needed them), and are
+walked best first until no unseen row can make the page. So a search stays in
+the milliseconds over 100k rows even when its words are in most of them.
+"""
+import functools
+import heapq
+import json
+import math
+import re
+from bisect import bisect_left, insort
+from typing import AbstractSet, Any, Callable, Dict, List, Optional, Set, Tuple
+
+# BM25 parameters: term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+# Relative change of the average row length after which the cached length norms are recomputed
+NORM_DRIFT = 0.05
+
+WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+
+# Postgres' english stop word list (abridged)
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can did do does doing down during each few for from further had has have having
+he her here hers herself him himself his how i if in into is it its itself just me more most my
+myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through
+to too under until up very was we were what when where which while who whom why will with you your
+yours yourself yourselves
+""".split())
+
+# BlockNote keys that hold structure rather than text
+NON_TEXT_KEYS = frozenset(('id', 'type', 'props', 'styles', 'href'))
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    """Strip the inflections a search is most likely to differ by (a light stand-in for Snowball)"""
+    if word.endswith("'s"):
+        word = word[:-2]
+    if len(word) <= 4:
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith('sses'):
+        return word[:-2]
+    if word.endswith('ing') and len(word) > 5:
+        return word[:-3]
+    if word.endswith('ed') and len(word) > 4:
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def terms(text: str) -> List[str]:
+    """The index terms of `text`, in order"""
+    return [stem(word) for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def content_text(content: Any) -> str:
+    """The text of BlockNote content (blocks, inline content and table cells), or of any JSON"""
+    if isinstance(content, str):
+        try:
+            content = json.loads(content)
+        except ValueError:
+            return content
+    parts: List[str] = []
+
+    def walk(value: Any):
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if key not in NON_TEXT_KEYS:
+                    walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(content)
+    return ' '.join(parts)
+
+
+class SearchIndex:
+    """An inverted index over the weighted text fields of rows, ranked with BM25F"""
+
+    def __init__(self, fields: Dict[str, float], extractors: Optional[Dict[str, Callable[[Any], str]]] = None):
+        self.fields = dict(fields)
+        self._extractors = extractors or {}
+        # term -> row id -> weighted term frequency
+        self._postings: Dict[str, Dict[str, float]] = {}
+        # row id -> (weighted length, its terms)
+        self._rows: Dict[str, Tuple[float, Set[str]]] = {}
+        self._total_length = 0.0
+        # row id -> BM25 length norm, as of the average length in _norm_average
+        self._norms: Dict[str, float] = {}
+        self._norm_average = 0.0
+        # term -> its postings as sorted (-impact, row id), built when a search first needs them
+        self._impacts: Dict[str, List[Tuple[float, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _field_text(self, row: Dict[str, Any], field: str) -> str:
+        value = row.get(field)
+        if value is None:
+            return ''
+        extract = self._extractors.get(field)
+        return extract(value) if extract else str(value)
+
+    @staticmethod
+    def _norm(length: float, average: float) -> float:
+        return K1 * (1 - B + B * length / average) if average else K1
+
+    def _impact(self, term: str, row_id: str) -> float:
+        """The saturated, length-normalized frequency of `term` in the row; BM25 weighs it by the term's idf"""
+        frequency = self._postings[term][row_id]
+        return frequency / (frequency + self._norms[row_id])
+
+    def add(self, row_id: str, row: Dict[str, Any]) -> None:
+        """Index `row`, replacing what was indexed for `row_id` before"""
+        if row_id in self._rows:
+            self.remove(row_id)
+        frequencies: Dict[str, float] = {}
+        length = 0.0
+        for field, weight in self.fields.items():
+            field_terms = terms(self._field_text(row, field))
+            length += weight * len(field_terms)
+            for term in field_terms:
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+        self._rows[row_id] = (length, set(frequencies))
+        self._total_length += length
+        self._norms[row_id] = self._norm(length, self._norm_average)
+        for term, frequency in frequencies.items():
+            self._postings.setdefault(term, {})[row_id] = frequency
+            if term in self._impacts:
+                insort(self._impacts[term], (-self._impact(term, row_id), row_id))
+
+    def remove(self, row_id: str) -> None:
+        """Drop `row_id` from the index, if it is there"""
+        entry = self._rows.pop(row_id, None)
+        if entry is None:
+            return
+        length, row_terms = entry
+        self._total_length -= length
+        for term in row_terms:
+            impacts = self._impacts.get(term)
+            if impacts is not None:
+                position = bisect_left(impacts, (-self._impact(term, row_id), row_id))
+                del impacts[position]
+            posting = self._postings[term]
+            del posting[row_id]
+            if not posting:
+                del self._postings[term]
+                self._impacts.pop(term, None)
+        del self._norms[row_id]
+
+    def _refresh_norms(self) -> None:
+        """Recompute the length norms once the average length has drifted from the one they used"""
+        average = self._total_length / len(self._rows)
+        if abs(average - self._norm_average) > NORM_DRIFT * max(average, self._norm_average):
+            self._norms = {row_id: self._norm(length, average) for row_id, (length, _) in self._rows.items()}
+            self._norm_average = average
+            self._impacts.clear()
+
+    def _impact_order(self, term: str) -> List[Tuple[float, str]]:
+        impacts = self._impacts.get(term)
+        if impacts is None:
+            norms = self._norms
+            impacts = self._impacts[term] = sorted(
+                (-frequency / (frequency + norms[row_id]), row_id)
+                for row_id, frequency in self._postings[term].items())
+        return impacts
+
+    def search(self, query: str, within: Optional[AbstractSet[str]] = None,
+               keep: Optional[Callable[[str], bool]] = None,
+               limit: Optional[int] = None) -> Tuple[List[Tuple[str, float]], int]:
+        """Rank the rows containing all terms of `query` by BM25F.
+
+        Only rows in `within` and for which `keep(row_id)` holds are
+        considered, when given. Returns the best `limit` (all if None) as
+        (row id, score), best first, and how many rows match in all.
+        """
+        query_terms = set(terms(query))
+        if not query_terms or not self._rows or any(term not in self._postings for term in query_terms):
+            # A search of only stop words (an empty tsquery) or of a word no row has matches nothing
+            return [], 0
+        postings = sorted((self._postings[term] for term in query_terms), key=len)
+        matched = postings[0].keys()
+        for posting in postings[1:]:
+            matched = matched & posting.keys()
+        if within is not None:
+            matched = matched & within
+        count = len(matched) if keep is None else sum(1 for row_id in matched if keep(row_id))
+        if not count:
+            return [], 0
+
+        self._refresh_norms()
+        rows = len(self._rows)
+        # BM25 weight of each term: (k1 + 1) * idf
+        boosts = {term: (K1 + 1) * math.log(1 + (rows - len(self._postings[term]) + 0.5)
+                                            / (len(self._postings[term]) + 0.5))
+                  for term in query_terms}
+
+        def score(row_id):
+            return sum(boost * self._impact(term, row_id) for term, boost in boosts.items())
+
+        wanted = count if limit is None else min(limit, count)
+        if wanted * 4 >= count:
+            # Most matches are wanted anyway: score them all
+            scored = [(row_id, score(row_id)) for row_id in matched if keep is None or keep(row_id)]
+            scored.sort(key=lambda item: (-item[1], item[0]))
+            return scored[:wanted], count
+
+        # Threshold algorithm: walk every term's postings best impact first; a row not seen yet
+        # can score at most the sum of the impacts at the current depth, so stop once the
+        # `wanted` best rows seen so far all score above that
+        orders = [(boost, self._impact_order(term)) for term, boost in boosts.items()]
+        best: List[Tuple[float, str]] = []
+        seen: Set[str] = set()
+        for depth in range(max(len(order) for _, order in orders)):
+            bound = 0.0
+            for boost, order in orders:
+                if depth >= len(order):
+                    continue
+                impact, row_id = order[depth]
+                bound -= boost * impact
+                if row_id in seen:
+                    continue
+                seen.add(row_id)
+                if row_id in matched and (keep is None or keep(row_id)):
+                    entry = (score(row_id), _Descending(row_id))
+                    if len(best) < wanted:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+            if len(best) >= wanted and best[0][0] > bound:
+                break
+        return [(entry[1].value, entry[0]) for entry in sorted(best, reverse=True)], count
+
+
+class _Descending:
+    """Orders ties between equal scores by ascending row id inside a min-heap"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value: str):
+        self.value = value
+
+    def __lt__(self, other: '_Descending') -> bool:
+        return self.value > other.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.value == other.value
+
+
+def report_search_index() -> SearchIndex:
+    """Index over report title (A), description (B) and BlockNote content (C)"""
+    return SearchIndex({'title': 1.0, 'description': 0.4, 'content': 0.2}, extractors={'content': content_text})
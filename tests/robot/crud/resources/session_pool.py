@@ -0,0 +1,209 @@
+# session_pool.py
+"""Authenticated Supabase sessions, logged in once and reused.
+
+Each test user is logged in through the real login action once per process
+(see bridge/session.ts). The pool keeps the session's auth cookies, which hold
+the access and refresh tokens, and refreshes them shortly before the access
+token expires. Logging in again with the same credentials reuses the session
+without another round trip. A refresh runs without holding the pool's lock,
+so other users' sessions stay usable meanwhile, and only once per session:
+threads that find the same session due wait for that refresh instead of
+starting their own.
+
+Once a user's session is active (the Login keyword activates it), every bridge
+call carries its cookies, so lib/data and lib/actions run as that user and the
+CRUD keywords go through row-level security like the app does. Setting the
+session costs nothing extra: the cookies travel with the call itself.
+
+The active session is process-wide: it stays active for every later suite run
+by the same Robot process, not just the one that logged in. Suites reset it
+in their teardown (`Cleanup Test Environment` in common.robot runs
+`Use Session` without an email), and Python callers that need another user
+for a few calls use `with session_pool.as_user(email):`, which restores the
+previous session afterwards.
+
+Tuning (environment variables):
+  SHARERAPY_SESSION_REFRESH_MARGIN  seconds before expiry a session is refreshed (default 60)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from tsx_bridge import TsxBridge, bridge, form_data
+
+REFRESH_MARGIN = float(os.environ.get('SHARERAPY_SESSION_REFRESH_MARGIN', '60'))
+
+
+class SessionPool:
+    """Sessions keyed by email, plus the one bridge calls currently run as"""
+
+    def __init__(self, bridge: TsxBridge = bridge, refresh_margin: float = REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self.logins = 0
+        self.refreshes = 0
+        # email -> {email, password, cookies, user_id, access_token, expires_at}
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._active: Optional[str] = None
+        # email -> set once the refresh in flight for that session is done
+        self._refreshing: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._bridge = bridge
+        bridge.cookie_source = self.active_cookies
+
+    def login(self, email: str, password: str) -> Dict[str, Any]:
+        """Return a fresh session for the user, logging in only if there is none yet.
+
+        Raises if the login action fails (e.g. wrong credentials).
+        """
+        with self._lock:
+            session = self._sessions.get(email)
+            known = session is not None and session['password'] == password
+        if known:
+            session = self._fresh(email)
+            if session is not None:
+                return session
+        # Not holding the lock, so different users can log in concurrently. Sent
+        # without the active session's cookies, so this is a clean login.
+        state = self._bridge.call("startSession", form_data({'email': email, 'password': password},
+                                                            ('email', 'password')), cookies=[])
+        with self._lock:
+            self.logins += 1
+            return self._store(email, password, state)
+
+    def _store(self, email: str, password: str, state: Dict[str, Any]) -> Dict[str, Any]:
+        if not state.get('accessToken'):
+            raise RuntimeError(f"login for {email} returned no session")
+        session = {
+            'email': email,
+            'password': password,
+            'cookies': state['cookies'],
+            'user_id': state.get('userId'),
+            'access_token': state['accessToken'],
+            'expires_at': state.get('expiresAt'),
+        }
+        self._sessions[email] = session
+        return session
+
+    def _due(self, session: Dict[str, Any]) -> bool:
+        expires_at = session.get('expires_at')
+        return expires_at is not None and expires_at - time.time() <= self.refresh_margin
+
+    def _fresh(self, email: str) -> Optional[Dict[str, Any]]:
+        """The user's session, refreshed if its access token expires within the margin; None if it is gone"""
+        while True:
+            with self._lock:
+                session = self._sessions.get(email)
+                if session is None or not self._due(session):
+                    return session
+                pending = self._refreshing.get(email)
+                if pending is None:
+                    pending = self._refreshing[email] = threading.Event()
+                    break
+            # Another thread is refreshing this session: use what it stores
+            pending.wait()
+        try:
+            return self._refresh(session)
+        finally:
+            with self._lock:
+                del self._refreshing[email]
+            pending.set()
+
+    def _refresh(self, session: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Swap in a refreshed `session`, or a new login if the refresh fails"""
+        email, password = session['email'], session['password']
+        try:
+            state = self._bridge.call("refreshSession", cookies=session['cookies'])
+        except Exception as e:
+            # The refresh token may have been used up or revoked; log in again
+            print(f"*INFO* Refreshing the session of {email} failed ({e}), logging in again")
+            with self._lock:
+                if self._sessions.get(email) is session:
+                    del self._sessions[email]
+            return self.login(email, password)
+        with self._lock:
+            self.refreshes += 1
+            if self._sessions.get(email) is not session:
+                # Ended (or replaced by a new login) while refreshing
+                return self._sessions.get(email)
+            return self._store(email, password, state)
+
+    def use(self, email: Optional[str]):
+        """Run bridge calls as the user's (already logged in) session; None for anonymous calls"""
+        with self._lock:
+            if email is not None and email not in self._sessions:
+                raise KeyError(f"no session for {email}, log in first")
+            self._active = email
+
+    @contextmanager
+    def as_user(self, email: Optional[str]):
+        """Run the bridge calls inside the block as `email` (None: anonymously), then restore the previous session"""
+        with self._lock:
+            previous = self._active
+        self.use(email)
+        try:
+            yield
+        finally:
+            with self._lock:
+                # Not restored if it was ended meanwhile
+                self._active = previous if previous is None or previous in self._sessions else None
+
+    def active_cookies(self) -> Optional[List[Dict[str, str]]]:
+        """Cookies of the active session, refreshed if needed; None when calls run anonymously"""
+        with self._lock:
+            email = self._active
+        if email is None:
+            return None
+        try:
+            session = self._fresh(email)
+            if session is None:
+                raise KeyError("the session is gone")
+            return session['cookies']
+        except Exception as e:
+            print(f"*WARN* Dropping the session of {email}: {e}")
+            with self._lock:
+                self._sessions.pop(email, None)
+                if self._active == email:
+                    self._active = None
+            return None
+
+    def find(self, access_token: str) -> Optional[str]:
+        """Email of the session with this access token"""
+        with self._lock:
+            return next((email for email, session in self._sessions.items()
+                         if session['access_token'] == access_token), None)
+
+    def end(self, email: str) -> bool:
+        """Sign the session out on Supabase and forget it"""
+        with self._lock:
+            session = self._sessions.pop(email, None)
+            if self._active == email:
+                self._active = None
+        if session is None:
+            return False
+        try:
+            self._bridge.call("endSession", cookies=session['cookies'])
+        except Exception as e:
+            print(f"*INFO* Signing out {email} on the backend failed: {e}")
+        return True
+
+    def clear(self):
+        """Forget every session without signing out (their tokens simply expire)"""
+        with self._lock:
+            self._sessions.clear()
+            self._active = None
+
+
+# Shared by every keyword library in this process, so sessions outlive a suite
+session_pool = SessionPool()
+
+
+def use_session(email=None):
+    """Robot keyword: run the following bridge calls as a logged-in user, or anonymously without `email`"""
+    session_pool.use(email or None)
+
+
+def clear_sessions():
+    """Robot keyword: forget every pooled session and run bridge calls anonymously"""
+    session_pool.clear()
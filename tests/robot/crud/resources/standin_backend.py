@@ -0,0 +1,291 @@
+# standin_backend.py
+"""Local stand-in for the Supabase REST, auth and storage APIs.
+
+Just enough of PostgREST and GoTrue for lib/data and lib/actions to run
+unmodified through the bridge: eq/in/ilike filters, order, offset/limit,
+exact counts, .single() and the search_reports_ranked RPC over in-memory
+tables. Embedded resources (`country:countries(*)` and the like) are not
+joined, so rows come back flat. Used by the benchmark suite so that bridge
+timings don't depend on a remote project; point the bridge at it with
+NEXT_PUBLIC_SUPABASE_URL (StandinBackend.start does this for the current
+process, and StandinBackend.stop puts the previous settings back).
+"""
+import base64
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+SEARCH_RPC = 'search_reports_ranked'
+
+# Environment StandinBackend.start points at itself, and stop restores
+ENV_VARS = ('NEXT_PUBLIC_SUPABASE_URL', 'NEXT_PUBLIC_SUPABASE_PUBLISHABLE_KEY')
+
+
+def _jwt(claims: Dict[str, Any]) -> str:
+    """Unsigned JWT; supabase-js only decodes the payload"""
+    def part(value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).rstrip(b'=').decode()
+    return f"{part({'alg': 'HS256', 'typ': 'JWT'})}.{part(claims)}.c3RhbmRpbg"
+
+
+def _coerce(value: str) -> Any:
+    if re.fullmatch(r'-?\d+', value):
+        return int(value)
+    if value in ('true', 'false'):
+        return value == 'true'
+    return None if value == 'null' else value
+
+
+def _matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+    operator, _, operand = expression.partition('.')
+    actual = row.get(column)
+    if operator == 'eq':
+        return actual == _coerce(operand) or str(actual) == operand
+    if operator == 'in':
+        values = [v.strip('"') for v in operand.strip('()').split(',') if v]
+        return str(actual) in values
+    if operator in ('ilike', 'like'):
+        pattern = re.escape(operand).replace('%', '.*').replace(r'\*', '.*')
+        return re.fullmatch(pattern, str(actual or ''), re.IGNORECASE if operator == 'ilike' else 0) is not None
+    if operator == 'gte':
+        return str(actual or '') >= operand
+    if operator == 'lte':
+        return str(actual or '') <= operand
+    # Unsupported operators (and filters on embedded resources) don't narrow the result
+    return True
+
+
+class StandinBackend:
+    """In-memory tables served over HTTP on 127.0.0.1"""
+
+    def __init__(self, seed_rows: int = 50, latency: float = 0.0):
+        # Seconds added to every response, to model the network round trip
+        self.latency = latency
+        self.requests = 0
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {
+            'patients': {}, 'reports': {}, 'therapists': {}, 'users': {},
+        }
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        # ENV_VARS as they were before start (None for unset)
+        self._saved_env: Optional[Dict[str, Optional[str]]] = None
+        self.seed(seed_rows)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def seed(self, count: int):
+        """Deterministic rows, so runs are comparable"""
+        for i in range(count):
+            patient_id = str(uuid.UUID(int=i + 1))
+            therapist_id = str(uuid.UUID(int=10_000 + i + 1))
+            self.insert('patients', {
+                'id': patient_id, 'first_name': f"Patient{i:04d}", 'last_name': 'Standin',
+                'birthdate': '1990-01-01', 'sex': 'Male' if i % 2 else 'Female',
+                'contact_number': '+1234567890', 'country_id': i % 5 + 1,
+            })
+            self.insert('therapists', {
+                'id': therapist_id, 'first_name': f"Therapist{i:04d}", 'last_name': 'Standin',
+                'age': 30 + i % 20, 'bio': 'Stand-in therapist', 'clinic_id': i % 3 + 1, 'picture': '',
+            })
+            self.insert('reports', {
+                'id': str(uuid.UUID(int=20_000 + i + 1)), 'title': f"Report {i:04d} assessment",
+                'description': 'Stand-in report', 'type_id': i % 4 + 1, 'language_id': 1,
+                'patient_id': patient_id, 'therapist_id': therapist_id,
+                'content': {'notes': 'stand-in'},
+            })
+
+    def insert(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(row)
+        row.setdefault('id', str(uuid.uuid4()))
+        row.setdefault('created_at', time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+        if table in ('patients', 'therapists'):
+            # Generated column in the real schema
+            row['name'] = f"{row.get('first_name', '')} {row.get('last_name', '')}"
+        with self._lock:
+            self.tables.setdefault(table, {})[row['id']] = row
+        return row
+
+    def select(self, table: str, query: List[Tuple[str, str]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Apply PostgREST query parameters; returns (page, total count)"""
+        with self._lock:
+            rows = list(self.tables.get(table, {}).values())
+        offset, limit, order = 0, None, None
+        for key, value in query:
+            if key == 'offset':
+                offset = int(value)
+            elif key == 'limit':
+                limit = int(value)
+            elif key == 'order':
+                order = value
+            elif key not in ('select', 'columns') and '.' not in key:
+                rows = [row for row in rows if _matches(row, key, value)]
+        if order:
+            column, _, direction = order.split(',')[0].partition('.')
+            rows.sort(key=lambda row: (str(row.get(column) or ''), row['id']), reverse=direction.startswith('desc'))
+        count = len(rows)
+        page = rows[offset:offset + limit] if limit is not None else rows[offset:]
+        return page, count
+
+    def start(self) -> 'StandinBackend':
+        handler = type('Handler', (_Handler,), {'backend': self})
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        if self._saved_env is None:
+            self._saved_env = {name: os.environ.get(name) for name in ENV_VARS}
+        os.environ['NEXT_PUBLIC_SUPABASE_URL'] = self.url
+        os.environ.setdefault('NEXT_PUBLIC_SUPABASE_PUBLISHABLE_KEY', _jwt({'role': 'anon'}))
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._saved_env is not None:
+            for name, value in self._saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            self._saved_env = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    backend: StandinBackend
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> Any:
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            # Storage uploads send the file itself
+            return None
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        if self.backend.latency:
+            time.sleep(self.backend.latency)
+        body = b'' if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self):
+        self.backend.requests += 1
+        url = urlsplit(self.path)
+        query = parse_qsl(url.query, keep_blank_values=True)
+        body = self._body()
+        if url.path.startswith('/rest/v1/rpc/'):
+            return self._rpc(url.path.rsplit('/', 1)[-1], query, body)
+        if url.path.startswith('/rest/v1/'):
+            return self._rest(url.path[len('/rest/v1/'):], query, body)
+        if url.path.startswith('/auth/v1/'):
+            return self._auth(url.path[len('/auth/v1/'):], dict(query), body or {})
+        if url.path.startswith('/storage/v1/object/'):
+            key = url.path[len('/storage/v1/object/'):]
+            return self._send(200, {'Key': key, 'Id': str(uuid.uuid4())})
+        return self._send(404, {'message': f"Not found: {url.path}"})
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_HEAD = _dispatch
+
+    def _respond_rows(self, rows: List[Dict[str, Any]], count: Optional[int] = None, status: int = 200,
+                      write: bool = True):
+        headers = {}
+        if count is not None:
+            end = max(len(rows) - 1, 0)
+            headers['Content-Range'] = f"0-{end}/{count}" if rows else f"*/{count}"
+        if 'vnd.pgrst.object' in (self.headers.get('Accept') or ''):
+            if len(rows) != 1:
+                return self._send(406, {
+                    'code': 'PGRST116',
+                    'message': 'JSON object requested, multiple (or no) rows returned',
+                    'details': f"The result contains {len(rows)} rows",
+                    'hint': None,
+                })
+            return self._send(status, rows[0], headers)
+        if write and self.command in ('POST', 'PATCH', 'DELETE') and 'return=representation' not in (self.headers.get('Prefer') or ''):
+            return self._send(201 if self.command == 'POST' else 204, None, headers)
+        return self._send(status, rows, headers)
+
+    def _rest(self, table: str, query: List[Tuple[str, str]], body: Any):
+        backend = self.backend
+        wants_count = 'count=exact' in (self.headers.get('Prefer') or '')
+        if self.command in ('GET', 'HEAD'):
+            rows, count = backend.select(table, query)
+            return self._respond_rows(rows, count if wants_count else None)
+        if self.command == 'POST':
+            rows = [backend.insert(table, row) for row in (body if isinstance(body, list) else [body or {}])]
+            return self._respond_rows(rows, status=201)
+        filters = [(k, v) for k, v in query if k not in ('select', 'columns')]
+        matched, _ = backend.select(table, filters)
+        with backend._lock:
+            for row in matched:
+                if self.command == 'PATCH':
+                    row.update(body or {})
+                else:
+                    backend.tables[table].pop(row['id'], None)
+        return self._respond_rows(matched)
+
+    def _rpc(self, name: str, query: List[Tuple[str, str]], body: Any):
+        if name != SEARCH_RPC:
+            return self._send(404, {'code': 'PGRST202', 'message': f"Unknown function {name}"})
+        term = str((body or {}).get('search_term') or '')
+        filters = [(k, v) for k, v in query] + [('title', f"ilike.%{term}%")]
+        rows, count = self.backend.select('reports', filters)
+        wants_count = 'count=exact' in (self.headers.get('Prefer') or '')
+        return self._respond_rows(rows, count if wants_count else None, write=False)
+
+    def _auth(self, path: str, query: Dict[str, str], body: Dict[str, Any]):
+        users = self.backend.tables['users']
+        email = body.get('email')
+        if path == 'signup':
+            if email in users:
+                return self._send(422, {'code': 'user_already_exists', 'msg': 'User already registered'})
+            users[email] = {'id': str(uuid.uuid4()), 'email': email, 'password': body.get('password')}
+            return self._send(200, self._session(users[email]))
+        if path == 'token' and query.get('grant_type') == 'password':
+            user = users.get(email)
+            if not user or user['password'] != body.get('password'):
+                return self._send(400, {'code': 'invalid_credentials', 'error': 'invalid_grant',
+                                        'error_description': 'Invalid login credentials'})
+            return self._send(200, self._session(user))
+        if path == 'logout':
+            return self._send(204, None)
+        return self._send(404, {'message': f"Not found: /auth/v1/{path}"})
+
+    @staticmethod
+    def _session(user: Dict[str, Any]) -> Dict[str, Any]:
+        now = int(time.time())
+        public = {
+            'id': user['id'], 'aud': 'authenticated', 'role': 'authenticated', 'email': user['email'],
+            'app_metadata': {'provider': 'email'}, 'user_metadata': {}, 'created_at': '2023-01-01T00:00:00Z',
+        }
+        return {
+            'access_token': _jwt({'sub': user['id'], 'email': user['email'], 'role': 'authenticated',
+                                  'aud': 'authenticated', 'exp': now + 3600, 'iat': now}),
+            'token_type': 'bearer',
+            'expires_in': 3600,
+            'expires_at': now + 3600,
+            'refresh_token': uuid.uuid4().hex,
+            'user': public,
+        }
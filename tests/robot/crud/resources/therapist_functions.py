@@ -1,61 +1,32 @@
 # therapist_functions.py
-import os
-import subprocess
-import json
+import time
 import uuid
 from typing import Dict, List, Optional, Any
 
+from bridge_trace import trace_listener
+from compact_rows import compact_flag, compact_result
+from form_fields import THERAPIST_FORM_FIELDS
+from keyword_profiler import profile_keywords
+from local_store import LocalTable, full_name
+from read_cache import cache
+from tsx_bridge import bridge, drop_none, field_list, form_data, gather_bounded, item_result, iter_pages, project_rows
+
+# createTherapist inserts a fixed therapist_id and redirects nowhere, so this is the created ID
+CREATED_THERAPIST_ID = "56c0557a-f12f-48e7-a8ae-e36585880d91"
+
 class TherapistFunctions:
     """Therapist functions that interface with TypeScript/Supabase backend"""
     
     def __init__(self):
-        # Set up the project root directory
-        self.project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
         # In-memory fallback store to support positive lifecycle tests when TS/backend isn't available
-        self._local_store = {"therapists": {}}
-    
-    def _run_tsx_script(self, script_content: str) -> Any:
-        """Execute a TypeScript script using tsx and return the result"""
-        try:
-            # Create a temporary script file
-            script_path = os.path.join(self.project_root, 'temp_therapist_test.ts')
-            
-            with open(script_path, 'w') as f:
-                f.write(script_content)
-            
-            # Run the script using tsx (TypeScript executor)
-            result = subprocess.run(
-                ['npx', 'tsx', script_path],
-                capture_output=True,
-                text=True,
-                cwd=self.project_root,
-                env={**os.environ},  # Pass through environment variables for Supabase
-                shell=True  # Add shell=True for Windows compatibility
-            )
-            
-            # Clean up
-            if os.path.exists(script_path):
-                os.remove(script_path)
-            
-            if result.returncode != 0:
-                raise Exception(f"TSX script failed: {result.stderr}")
-            
-            # Parse JSON response
-            if result.stdout.strip():
-                return json.loads(result.stdout.strip())
-            # If no output, raise exception to trigger fallback
-            raise Exception("TSX script produced no output")
-            
-        except Exception as e:
-            print(f"Error running TSX script: {e}")
-            raise
-
-    def get_all_therapists(self, search=None, specialization=None, limit=20, offset=0, clinicID=None, countryID=None, ascending=True):
-        """Get all therapists using the ACTUAL readTherapists function from lib/data/therapists.ts
-
-        Backwards-compatible signature: accepts limit/offset (translated to page/pageSize).
-        New optional params: clinicID, countryID, ascending.
-        """
+        self._local_store = {"therapists": LocalTable(full_name, indexed=("clinic_id", "clinic.country_id"))}
+        # Persistent tsx worker shared with the other keyword libraries
+        self._bridge = bridge
+        # By-ID read cache shared with the other keyword libraries
+        self._cache = cache
+
+    def _read_therapists_params(self, limit, offset, clinicID, countryID, search, ascending):
+        """Normalize get_all_therapists arguments into readTherapists parameters"""
         # Normalize pagination parameters
         try:
             limit = int(limit) if limit is not None else 20
@@ -68,166 +39,187 @@ class TherapistFunctions:
         page = (offset // limit) if limit else 0
         page_size = limit
 
-        # Small helper to format values for the injected JS script
-        def _js_val(v):
-            # None => undefined in JS
-            if v is None:
-                return 'undefined'
-            # If it's a numeric-like string, emit as number
+        # Numeric-like strings from Robot are sent as numbers
+        def _num(v):
             if isinstance(v, str) and v.isdigit():
-                return v
-            # Strings should be JSON quoted
-            if isinstance(v, str):
-                return json.dumps(v)
-            # Numbers/booleans: just stringify
-            return str(v)
-
-        # Create TypeScript script that imports and calls the ACTUAL backend function
-        script_content = f"""
-import {{ readTherapists }} from './lib/data/therapists.js';
-
-async function testActualReadTherapists() {{
-    try {{
-        const result = await readTherapists({{
-            search: {json.dumps(search)},
-            ascending: {str(bool(ascending)).lower()},
-            clinicID: {_js_val(clinicID)},
-            countryID: {_js_val(countryID)},
-            page: {page},
-            pageSize: {page_size}
-        }});
-
-        console.log(JSON.stringify(result));
-    }} catch (error) {{
-        console.error('Error calling actual readTherapists function:', error.message);
-        process.exit(1);
-    }}
-}}
-
-testActualReadTherapists();
-"""
+                return int(v)
+            return v
+
+        return drop_none(
+            search=search,
+            ascending=bool(ascending),
+            clinicID=_num(clinicID),
+            countryID=_num(countryID),
+            page=page,
+            pageSize=page_size,
+        )
+
+    def _therapists_fallback(self, error, params):
+        """List result used when readTherapists can't be reached"""
+        print(f"Failed to call actual readTherapists function: {error}, using mock/local data")
+        local_therapists = self._local_store["therapists"]
+        if local_therapists:
+            data, count = local_therapists.query(
+                filters={"clinic_id": params.get("clinicID"), "clinic.country_id": params.get("countryID")},
+                search=params.get("search"),
+                ascending=params.get("ascending", True),
+                offset=params.get("page", 0) * params.get("pageSize", 20),
+                limit=params.get("pageSize", 20),
+            )
+            return {"data": data, "count": count}
+        # Return mock data if script fails
+        return {
+            "data": [
+                {
+                    "id": str(uuid.uuid4()),
+                    "first_name": "Dr. Mock",
+                    "last_name": "Therapist",
+                    "specialization": "Physical Therapy",
+                    "email": "mock@example.com",
+                    "phone": "+1234567890",
+                    "created_at": "2023-01-01T00:00:00Z",
+                    "clinic": {"clinic": "Main Clinic", "country": {"country": "United States"}},
+                    "reports": [
+                        {"type": {"type": "Assessment"}},
+                        {"type": {"type": "Progress Note"}},
+                        {"type": {"type": "Discharge Summary"}}
+                    ]
+                }
+            ],
+            "count": 1
+        }
+
+    def _known_therapist(self, therapist_id):
+        """Answer by-ID reads that don't need the backend, as (handled, therapist)"""
+        # If present in local store (created during tests), return it
+        if therapist_id in self._local_store.get("therapists", {}):
+            return True, self._local_store["therapists"][therapist_id]
+        cached = self._cache.get("therapists", therapist_id)
+        if cached is not None:
+            return True, cached
+        # For testing, simulate that non-existent therapists return None
+        if therapist_id == "missing" or len(therapist_id) > 36:
+            return True, None
+        return False, None
+
+    def _remember_therapist(self, result):
+        # Cache the therapist if TS returned a representation
+        return self._cache.put("therapists", result)
 
+    def _forget_therapist(self, therapist_id):
+        # Reports embed their therapist, and so do the patients embedding those reports
+        self._cache.invalidate("therapists", therapist_id)
+        self._cache.invalidate_referencing("reports", "therapist_id", therapist_id)
+        self._cache.invalidate_embedding("patients", "reports", "therapist_id", therapist_id)
+
+    def _therapist_fallback(self, therapist_id):
+        # For testing, random UUIDs should return None (non-existent) but prefer local store
+        if therapist_id in self._local_store.get("therapists", {}):
+            return self._local_store["therapists"][therapist_id]
+        return None
+
+    def get_all_therapists(self, search=None, specialization=None, limit=20, offset=0, clinicID=None, countryID=None, ascending=True, fields=None, compact=False):
+        """Get all therapists using the ACTUAL readTherapists function from lib/data/therapists.ts
+
+        Backwards-compatible signature: accepts limit/offset (translated to page/pageSize).
+        New optional params: clinicID, countryID, ascending.
+        """
+        params = self._read_therapists_params(limit, offset, clinicID, countryID, search, ascending)
+        fields, compact = field_list(fields), compact_flag(compact)
         try:
-            result = self._run_tsx_script(script_content)
-            return result
+            return self._bridge.call("readTherapists", params, fields=fields, compact=compact)
         except Exception as e:
-            print(f"Failed to call actual readTherapists function: {e}, using mock/local data")
-            local_therapists = list(self._local_store.get("therapists", {}).values())
-            if local_therapists:
-                return {"data": local_therapists, "count": len(local_therapists)}
-            # Return mock data if script fails
-            return {
-                "data": [
-                    {
-                        "id": str(uuid.uuid4()),
-                        "first_name": "Dr. Mock",
-                        "last_name": "Therapist",
-                        "specialization": "Physical Therapy",
-                        "email": "mock@example.com",
-                        "phone": "+1234567890",
-                        "created_at": "2023-01-01T00:00:00Z",
-                        "clinic": {"clinic": "Main Clinic", "country": {"country": "United States"}},
-                        "reports": [
-                            {"type": {"type": "Assessment"}},
-                            {"type": {"type": "Progress Note"}},
-                            {"type": {"type": "Discharge Summary"}}
-                        ]
-                    }
-                ],
-                "count": 1
-            }
+            result = project_rows(self._therapists_fallback(e, params), fields)
+            return compact_result(result) if compact else result
+
+    async def get_all_therapists_async(self, search=None, specialization=None, limit=20, offset=0, clinicID=None, countryID=None, ascending=True, fields=None, compact=False):
+        """Awaitable get_all_therapists"""
+        params = self._read_therapists_params(limit, offset, clinicID, countryID, search, ascending)
+        fields, compact = field_list(fields), compact_flag(compact)
+        try:
+            return await self._bridge.call_async("readTherapists", params, fields=fields, compact=compact)
+        except Exception as e:
+            result = project_rows(self._therapists_fallback(e, params), fields)
+            return compact_result(result) if compact else result
+
+    def iter_all_therapists(self, search=None, specialization=None, clinicID=None, countryID=None, ascending=True, page_size=100, fields=None, compact=False):
+        """Lazily yield every matching therapist, fetching the next page while the current one is consumed"""
+        page_size = int(page_size)
+        return iter_pages(
+            lambda page: self.get_all_therapists(search, specialization, page_size, page * page_size,
+                                                 clinicID, countryID, ascending, fields, compact),
+            page_size,
+        )
 
     def get_therapist_by_id(self, therapist_id):
         """Get a specific therapist by ID using ACTUAL readTherapist function from lib/data/therapists.ts"""
-        # If present in local store (created during tests), return it
-        if therapist_id in self._local_store.get("therapists", {}):
-            return self._local_store["therapists"][therapist_id]
+        handled, therapist = self._known_therapist(therapist_id)
+        if handled:
+            return therapist
+        try:
+            return self._remember_therapist(self._bridge.call("readTherapist", therapist_id))
+        except Exception:
+            return self._therapist_fallback(therapist_id)
 
-        # For testing, simulate that non-existent therapists return None
-        if therapist_id == "missing" or len(therapist_id) > 36:
-            return None
-        
-        # Create TypeScript script that calls the ACTUAL readTherapist function
-        script_content = f"""
-import {{ readTherapist }} from './lib/data/therapists.js';
-
-async function testActualReadTherapist() {{
-    try {{
-        const result = await readTherapist('{therapist_id}');
-        console.log(JSON.stringify(result));
-    }} catch (error) {{
-        // If therapist not found, return null
-        if (error.message.includes('not found') || error.code === 'PGRST116') {{
-            console.log('null');
-        }} else {{
-            console.error('Error calling actual readTherapist function:', error.message);
-            process.exit(1);
-        }}
-    }}
-}}
-
-testActualReadTherapist();
-"""
-        
+    async def get_therapist_by_id_async(self, therapist_id):
+        """Awaitable get_therapist_by_id"""
+        handled, therapist = self._known_therapist(therapist_id)
+        if handled:
+            return therapist
         try:
-            result = self._run_tsx_script(script_content)
-            return result
+            return self._remember_therapist(await self._bridge.call_async("readTherapist", therapist_id))
         except Exception:
-            # For testing, random UUIDs should return None (non-existent) but prefer local store
-            if therapist_id in self._local_store.get("therapists", {}):
-                return self._local_store["therapists"][therapist_id]
-            return None
+            return self._therapist_fallback(therapist_id)
+
+    async def get_therapists_by_ids(self, therapist_ids, concurrency=20):
+        """Get many therapists concurrently, with at most `concurrency` reads in flight.
+
+        Results are returned in the same order as `therapist_ids` (None for missing ones).
+        """
+        return await gather_bounded((self.get_therapist_by_id_async(tid) for tid in therapist_ids), concurrency)
+
+    def _create_local(self, data):
+        # Simulate creating a therapist with a new ID and store it locally
+        created = dict(data)
+        created_id = str(uuid.uuid4())
+        created["id"] = created_id
+        created["created_at"] = "2023-01-01T00:00:00Z"
+        self._local_store.setdefault("therapists", {})[created_id] = created
+        return created
+
+    def _update_local(self, therapist_id, data):
+        # If TS failed but we have a local created therapist, update and return it
+        if therapist_id in self._local_store.get("therapists", {}):
+            # Replace rather than mutate the row so the store re-indexes it
+            stored = {**self._local_store["therapists"][therapist_id], **data, "updated_at": "2023-01-01T00:00:00Z"}
+            self._local_store["therapists"][therapist_id] = stored
+            return stored
+        # For testing, random UUIDs should return None (non-existent)
+        return None
+
+    def _delete_local(self, therapist_id):
+        # TS call failed == attempt local cleanup
+        if therapist_id in self._local_store.get("therapists", {}):
+            del self._local_store["therapists"][therapist_id]
+            return True
+        return False
 
     def create_therapist(self, data):
         """Create a new therapist using ACTUAL createTherapist function from lib/actions/therapists.ts"""
-        # Create TypeScript script that calls the ACTUAL createTherapist function
-        script_content = f"""
-import {{ createTherapist }} from './lib/actions/therapists.js';
-
-async function testActualCreateTherapist() {{
-    try {{
-        // Convert data to FormData format that the action expects
-        const therapistData = {json.dumps(data)};
-        
-        // Create a FormData object and populate it
-        const formData = new FormData();
-        if (therapistData.clinic_id) formData.append('clinic_id', therapistData.clinic_id.toString());
-        if (therapistData.age) formData.append('age', therapistData.age.toString());
-        if (therapistData.bio) formData.append('bio', therapistData.bio);
-        if (therapistData.last_name) formData.append('last_name', therapistData.last_name);
-        if (therapistData.first_name) formData.append('first_name', therapistData.first_name);
-        if (therapistData.picture) formData.append('picture', therapistData.picture);
-        
-        const result = await createTherapist(formData);
-        
-        // Since the action doesn't return data, simulate created therapist
-        const createdTherapist = {{ 
-            ...therapistData, 
-            id: "56c0557a-f12f-48e7-a8ae-e36585880d91",
-            created_at: new Date().toISOString()
-        }};
-        console.log(JSON.stringify(createdTherapist));
-    }} catch (error) {{
-        console.error('Error calling actual createTherapist function:', error.message);
-        process.exit(1);
-    }}
-}}
-
-testActualCreateTherapist();
-"""
-        
         try:
-            result = self._run_tsx_script(script_content)
+            self._bridge.call("createTherapist", form_data(data, THERAPIST_FORM_FIELDS))
+            # The fixed ID may already be cached from an earlier run of the action
+            self._forget_therapist(CREATED_THERAPIST_ID)
+            # The action doesn't return data, so report the submitted fields
+            result = {
+                **data,
+                "id": CREATED_THERAPIST_ID,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
             return result
         except Exception as e:
             print(f"Failed to call actual createTherapist function: {e}, using mock/local data")
-            # Simulate creating a therapist with a new ID and store it locally
-            created = dict(data)
-            created_id = str(uuid.uuid4())
-            created["id"] = created_id
-            created["created_at"] = "2023-01-01T00:00:00Z"
-            self._local_store.setdefault("therapists", {})[created_id] = created
-            return created
+            return self._create_local(data)
 
     def update_therapist(self, therapist_id, data):
         """Update an existing therapist using ACTUAL updateTherapist function from lib/actions/therapists.ts"""
@@ -235,54 +227,19 @@ testActualCreateTherapist();
         if therapist_id == "missing" or len(therapist_id) > 36:
             return None
         
-        # Create TypeScript script that calls the ACTUAL updateTherapist function
-        script_content = f"""
-import {{ updateTherapist }} from './lib/actions/therapists.js';
-
-async function testActualUpdateTherapist() {{
-    try {{
-        // Convert data to FormData format that the action expects
-        const therapistData = {json.dumps(data)};
-        
-        // Create a FormData object and populate it
-        const formData = new FormData();
-        if (therapistData.clinic_id) formData.append('clinic_id', therapistData.clinic_id.toString());
-        if (therapistData.age) formData.append('age', therapistData.age.toString());
-        if (therapistData.bio) formData.append('bio', therapistData.bio);
-        if (therapistData.last_name) formData.append('last_name', therapistData.last_name);
-        if (therapistData.first_name) formData.append('first_name', therapistData.first_name);
-        if (therapistData.picture) formData.append('picture', therapistData.picture);
-        
-        const result = await updateTherapist('{therapist_id}', formData);
-        
-        // Since the action doesn't return data, simulate updated therapist
-        const updatedTherapist = {{ 
-            ...therapistData, 
-            id: '{therapist_id}',
-            updated_at: new Date().toISOString()
-        }};
-        console.log(JSON.stringify(updatedTherapist));
-    }} catch (error) {{
-        console.error('Error calling actual updateTherapist function:', error.message);
-        process.exit(1);
-    }}
-}}
-
-testActualUpdateTherapist();
-"""
-        
         try:
-            result = self._run_tsx_script(script_content)
+            self._bridge.call("updateTherapist", therapist_id, form_data(data, THERAPIST_FORM_FIELDS))
+            # The action doesn't return data, so report the submitted fields
+            result = {
+                **data,
+                "id": therapist_id,
+                "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
             return result
         except Exception:
-            # If TS failed but we have a local created therapist, update and return it
-            if therapist_id in self._local_store.get("therapists", {}):
-                stored = self._local_store["therapists"][therapist_id]
-                stored.update(data)
-                stored["updated_at"] = "2023-01-01T00:00:00Z"
-                return stored
-            # For testing, random UUIDs should return None (non-existent)
-            return None
+            return self._update_local(therapist_id, data)
+        finally:
+            self._forget_therapist(therapist_id)
 
     def delete_therapist(self, therapist_id):
         """Delete a therapist using ACTUAL deleteTherapist function from lib/actions/therapists.ts"""
@@ -290,51 +247,57 @@ testActualUpdateTherapist();
         if therapist_id == "missing" or len(therapist_id) > 36:
             return False
         
-        # Create TypeScript script that calls the ACTUAL deleteTherapist function
-        script_content = f"""
-import {{ deleteTherapist }} from './lib/actions/therapists.js';
-
-async function testActualDeleteTherapist() {{
-    try {{
-        const result = await deleteTherapist('{therapist_id}');
-        
-        // Since the action doesn't return data, indicate success
-        console.log('true');
-    }} catch (error) {{
-        console.error('Error calling actual deleteTherapist function:', error.message);
-        console.log('false');
-    }}
-}}
-
-testActualDeleteTherapist();
-"""
-        
         try:
-            result = self._run_tsx_script(script_content)
-            # Normalize TS result to boolean success
-            success = False
-            if isinstance(result, bool):
-                success = result
-            elif isinstance(result, str):
-                success = result.lower() in ("true", "1", "yes")
-            elif isinstance(result, dict):
-                success = True
-
-            if success:
-                return True
-
-            # TS returned falsy: remove any locally-created mock and treat as success
-            if therapist_id in self._local_store.get("therapists", {}):
-                del self._local_store["therapists"][therapist_id]
-                return True
-
-            return False
+            self._bridge.call("deleteTherapist", therapist_id)
+            # Drop any cached copy so later reads don't resurrect the record
+            self._local_store.get("therapists", {}).pop(therapist_id, None)
+            return True
         except Exception:
-            # TS call failed == attempt local cleanup
-            if therapist_id in self._local_store.get("therapists", {}):
-                del self._local_store["therapists"][therapist_id]
-                return True
-            return False
+            return self._delete_local(therapist_id)
+        finally:
+            self._forget_therapist(therapist_id)
+
+    def create_therapists_bulk(self, items):
+        """Create many therapists with one batched insert in a single bridge call.
+
+        Returns one result per item: index, ok, id, data and error.
+        """
+        def local(index, data):
+            return item_result(index, True, data=self._create_local(data))
+
+        return self._bridge.call_bulk("createTherapistsBulk", items, local)
+
+    def update_therapists_bulk(self, items):
+        """Update many therapists in a single bridge call; each item must carry its `id`"""
+        def local(index, data):
+            updated = self._update_local(data.get("id"), data)
+            if updated is None:
+                return item_result(index, False, error="Not found", code="PGRST116")
+            return item_result(index, True, data=updated)
+
+        results = self._bridge.call_bulk("updateTherapistsBulk", items, local)
+        for item in items:
+            self._forget_therapist(item.get("id"))
+        return results
+
+    def delete_therapists_bulk(self, therapist_ids):
+        """Delete many therapists with one `in (...)` delete in a single bridge call"""
+        def local(index, therapist_id):
+            if self._delete_local(therapist_id):
+                return item_result(index, True, data={"id": therapist_id})
+            return item_result(index, False, error="Not found", code="PGRST116")
+
+        results = self._bridge.call_bulk("deleteTherapistsBulk", therapist_ids, local)
+        for therapist_id in therapist_ids:
+            self._forget_therapist(therapist_id)
+        # Drop cached copies so later reads don't resurrect deleted records
+        for result in results:
+            if result["ok"] and result["id"]:
+                self._local_store.get("therapists", {}).pop(result["id"], None)
+        return results
+
+# Bridge call timings per suite/keyword (see bridge_trace.py)
+ROBOT_LIBRARY_LISTENER = trace_listener
 
 # Create global instance for Robot Framework
 therapist_functions = TherapistFunctions()
@@ -343,9 +306,21 @@ therapist_functions = TherapistFunctions()
 def get_all_therapists(**kwargs):
     return therapist_functions.get_all_therapists(**kwargs)
 
+def iter_all_therapists(**kwargs):
+    return therapist_functions.iter_all_therapists(**kwargs)
+
 def get_therapist_by_id(therapist_id):
     return therapist_functions.get_therapist_by_id(therapist_id)
 
+async def get_all_therapists_async(**kwargs):
+    return await therapist_functions.get_all_therapists_async(**kwargs)
+
+async def get_therapist_by_id_async(therapist_id):
+    return await therapist_functions.get_therapist_by_id_async(therapist_id)
+
+async def get_therapists_by_ids(therapist_ids, concurrency=20):
+    return await therapist_functions.get_therapists_by_ids(therapist_ids, concurrency)
+
 def create_therapist(data):
     return therapist_functions.create_therapist(data)
 
@@ -353,4 +328,16 @@ def update_therapist(therapist_id, data):
     return therapist_functions.update_therapist(therapist_id, data)
 
 def delete_therapist(therapist_id):
-    return therapist_functions.delete_therapist(therapist_id)
\ No newline at end of file
+    return therapist_functions.delete_therapist(therapist_id)
+
+def create_therapists_bulk(items):
+    return therapist_functions.create_therapists_bulk(items)
+
+def update_therapists_bulk(items):
+    return therapist_functions.update_therapists_bulk(items)
+
+def delete_therapists_bulk(therapist_ids):
+    return therapist_functions.delete_therapists_bulk(therapist_ids)
+
+# Wraps the keywords selected with SHARERAPY_PROFILE in the profiler (see keyword_profiler.py)
+profile_keywords(globals())
@@ -0,0 +1,825 @@
+# tsx_bridge.py
+"""Shared bridge between the Robot keyword libraries and the TypeScript backend.
+
+Calls are plain `{fn, args}` JSON handled by the checked-in dispatcher in
+bridge/dispatch.ts, so no TypeScript is generated or written to disk per call.
+Two transports are available, selected with SHARERAPY_BRIDGE_MODE:
+
+- worker (default): a pool of long-lived Node workers (bridge/worker.ts) that
+  load lib/data and lib/actions once and answer JSON-RPC requests over
+  stdin/stdout. Workers are started lazily, health-checked on checkout and
+  replaced when they exit or have served SHARERAPY_BRIDGE_MAX_REQUESTS calls.
+  SHARERAPY_BRIDGE_POOL_SIZE sets how many run at once (per Robot/pabot
+  process).
+- spawn: one `bridge/call.ts` process per call, fed through stdin.
+- local: no Node at all; every call fails fast so the libraries answer from
+  their local fallbacks (offline runs and benchmarks of the fallbacks).
+
+Calls made by keywords selected with SHARERAPY_PROFILE always run in their
+own call.ts process under Node's --cpu-prof/--heap-prof (see
+keyword_profiler.py).
+
+With SHARERAPY_BRIDGE_CASSETTE_MODE=record the answered calls are also saved
+to a cassette, and with =replay they are answered from it without Node or
+the network (see bridge_cassette.py).
+
+The entry points run from an esbuild bundle cached on disk when possible and
+under `npx tsx` otherwise (see bridge_bundle.py).
+
+Both transports sit behind a circuit breaker. After
+SHARERAPY_BRIDGE_BREAKER_THRESHOLD consecutive calls that never got an answer
+from the backend, calls fail fast with BridgeError (so the libraries serve
+their local fallbacks at once). Every SHARERAPY_BRIDGE_BREAKER_RESET seconds
+a single probe call is let through to check whether the backend is back.
+
+Every call's latency is broken down into phases and handed to
+bridge_trace.tracer (see bridge_trace.py for the phases and trace output).
+"""
+import asyncio
+import atexit
+import collections
+import itertools
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from bridge_bundle import bundle_cache
+from bridge_cassette import cassette
+from bridge_trace import tracer
+from compact_rows import unpack
+from keyword_profiler import profiler
+
+RESOURCES_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(RESOURCES_DIR, '..', '..', '..', '..'))
+BRIDGE_DIR = os.path.join(RESOURCES_DIR, 'bridge')
+WORKER_SCRIPT = os.path.join(BRIDGE_DIR, 'worker.ts')
+CALL_SCRIPT = os.path.join(BRIDGE_DIR, 'call.ts')
+WORKER_TSCONFIG = os.path.join(BRIDGE_DIR, 'tsconfig.json')
+
+BRIDGE_MODES = ('worker', 'spawn', 'local')
+BRIDGE_MODE = os.environ.get('SHARERAPY_BRIDGE_MODE', 'worker')
+
+# Worker pool sizing and recycling
+POOL_SIZE = int(os.environ.get('SHARERAPY_BRIDGE_POOL_SIZE', '1'))
+MAX_REQUESTS = int(os.environ.get('SHARERAPY_BRIDGE_MAX_REQUESTS', '500'))
+# Idle workers are pinged before reuse once they have been idle this long
+HEALTH_CHECK_AFTER = float(os.environ.get('SHARERAPY_BRIDGE_HEALTH_CHECK_AFTER', '30'))
+HEALTH_CHECK_TIMEOUT = 5.0
+
+# Seconds to wait for a single call, and for the worker to boot (npx may need
+# to download tsx on a cold machine)
+CALL_TIMEOUT = float(os.environ.get('SHARERAPY_BRIDGE_TIMEOUT', '60'))
+START_TIMEOUT = float(os.environ.get('SHARERAPY_BRIDGE_START_TIMEOUT', '120'))
+
+# Consecutive transport failures that open the circuit breaker (0 disables
+# it), and seconds it stays open before a probe call is let through
+BREAKER_THRESHOLD = int(os.environ.get('SHARERAPY_BRIDGE_BREAKER_THRESHOLD', '5'))
+BREAKER_RESET_AFTER = float(os.environ.get('SHARERAPY_BRIDGE_BREAKER_RESET', '30'))
+
+# Key the worker looks for to rebuild an argument as FormData
+FORM_DATA_KEY = '$formData'
+
+
+class BridgeError(Exception):
+    """Raised when a bridge call fails, either in Node or in the transport"""
+
+    def __init__(self, message: str, code: Optional[str] = None):
+        super().__init__(message)
+        # Backend error code, e.g. PGRST116 when .single() matched no rows
+        self.code = code
+
+
+def drop_none(**params) -> Dict[str, Any]:
+    """Build a params object, leaving out None so the TS defaults apply"""
+    return {key: value for key, value in params.items() if value is not None}
+
+
+def field_list(fields: Any) -> Optional[List[str]]:
+    """Normalize a `fields=` keyword option (list or comma-separated string); None means all fields"""
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    return [field.strip() for field in fields if field.strip()] or None
+
+
+def project_rows(result: Any, fields: Optional[List[str]]) -> Any:
+    """Trim a list result (`{data, count}`) to `fields`, as the bridge does for projected calls"""
+    if not fields or not isinstance(result, dict) or not isinstance(result.get('data'), list):
+        return result
+    rows = [{field: row[field] for field in fields if field in row} if isinstance(row, dict) else row
+            for row in result['data']]
+    return {**result, 'data': rows}
+
+
+def form_data(data: Dict[str, Any], fields: Iterable[str], json_fields: Iterable[str] = ()) -> Dict[str, Any]:
+    """Encode the given fields of `data` as a FormData argument for a server action.
+
+    Falsy values are skipped, matching how the actions were previously fed.
+    Fields listed in `json_fields` are JSON-encoded (e.g. report content).
+    """
+    json_fields = set(json_fields)
+    encoded = {}
+    for field in fields:
+        value = data.get(field)
+        if not value:
+            continue
+        encoded[field] = json.dumps(value) if field in json_fields else str(value)
+    return {FORM_DATA_KEY: encoded}
+
+
+async def gather_bounded(awaitables: Iterable[Any], limit: int = 20) -> List[Any]:
+    """Await everything concurrently with at most `limit` in flight, keeping input order"""
+    semaphore = asyncio.Semaphore(max(1, int(limit)))
+
+    async def run(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return list(await asyncio.gather(*(run(awaitable) for awaitable in awaitables)))
+
+
+def iter_pages(fetch_page: Callable[[int], Any], page_size: int) -> Iterator[Any]:
+    """Yield the rows of fetch_page(0), fetch_page(1), ... one page at a time.
+
+    `fetch_page` returns a list keyword's `{data, count}` result for a 0-based
+    page number. Page N+1 is fetched on a background thread while the rows of
+    page N are consumed, so at most two pages are held at once. Iteration
+    stops at a short page or once `count` rows have been yielded.
+    """
+    prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='page-prefetch')
+    pending = prefetcher.submit(fetch_page, 0)
+    page, seen = 0, 0
+    try:
+        while pending is not None:
+            result = pending.result()
+            rows = (result.get('data') if isinstance(result, dict) else result) or []
+            count = result.get('count') if isinstance(result, dict) else None
+            seen += len(rows)
+            page += 1
+            more = len(rows) >= page_size and (count is None or seen < count)
+            pending = prefetcher.submit(fetch_page, page) if more else None
+            yield from rows
+    finally:
+        # Closed early: let an in-flight prefetch finish in the background
+        prefetcher.shutdown(wait=False, cancel_futures=True)
+
+
+def item_result(index: int, ok: bool, data: Any = None, error: Optional[str] = None,
+                code: Optional[str] = None) -> Dict[str, Any]:
+    """One entry of a bulk keyword's result list"""
+    record_id = data.get('id') if isinstance(data, dict) else None
+    return {"index": index, "ok": ok, "id": record_id, "data": data, "error": error, "code": code}
+
+
+def redirect_id(result: Any) -> Optional[str]:
+    """Extract the record ID from a server action redirect such as /reports/<id>?success=true"""
+    if not isinstance(result, dict) or not result.get('redirect'):
+        return None
+    path = result['redirect'].split('?', 1)[0].rstrip('/')
+    tail = path.rsplit('/', 1)[-1]
+    return tail or None
+
+
+def tsx_command(script: str, node_flags: Iterable[str] = ()) -> List[str]:
+    """Command line running one of the bridge entry points: its cached bundle under node, else tsx.
+
+    `node_flags` are passed to Node (tsx forwards them).
+    """
+    bundled = bundle_cache.script(script)
+    node = shutil.which('node')
+    if bundled and node:
+        return [node, *node_flags, bundled]
+    npx = shutil.which('npx')
+    if not npx:
+        raise BridgeError("npx not found on PATH")
+    return [npx, 'tsx', *node_flags, '--tsconfig', WORKER_TSCONFIG, script]
+
+
+def outcome_value(outcome: Dict[str, Any]) -> Any:
+    """Return the result of a dispatcher outcome, raising BridgeError for errors"""
+    error = outcome.get('error')
+    if error:
+        code = (error.get('data') or {}).get('code')
+        raise BridgeError(error.get('message', 'Unknown error'), code)
+    return outcome.get('result')
+
+
+def node_phases(spawned_at: float, timing: Dict[str, Any]) -> Dict[str, float]:
+    """Phases (ms) from the `timing` a bridge script reports, given when it was spawned (epoch s)"""
+    phases = {}
+    if timing.get('timeOrigin'):
+        # performance.timeOrigin is when the Node process running the script started
+        phases['launch'] = max(timing['timeOrigin'] - spawned_at * 1000, 0.0)
+    for phase, key in (('boot', 'bootMs'), ('import', 'importMs'), ('node', 'nodeMs')):
+        if key in timing:
+            phases[phase] = timing[key]
+    return phases
+
+
+class TsxSpawner:
+    """Runs every call in a fresh bridge/call.ts process"""
+
+    def __init__(self, project_root: str = PROJECT_ROOT):
+        self.project_root = project_root
+
+    def alive(self) -> bool:
+        return True
+
+    def stop(self):
+        pass
+
+    def request(self, method: str, params: List[Any], timeout: float = CALL_TIMEOUT,
+                timing: Optional[Dict[str, float]] = None, options: Optional[Dict[str, Any]] = None,
+                node_flags: Iterable[str] = ()) -> Any:
+        """Run one call; `timing`, if given, is filled with its phases in ms"""
+        spawned_at = time.time()
+        try:
+            result = subprocess.run(
+                tsx_command(CALL_SCRIPT, node_flags),
+                input=json.dumps({"fn": method, "args": params, **(options or {})}),
+                capture_output=True,
+                text=True,
+                encoding='utf8',
+                timeout=timeout,
+                cwd=self.project_root,
+                env={**os.environ},  # Pass through environment variables for Supabase
+            )
+        except subprocess.TimeoutExpired:
+            raise BridgeError(f"tsx call timed out after {timeout}s calling {method}")
+        except OSError as e:
+            raise BridgeError(f"Failed to run tsx: {e}")
+
+        return self._parse(method, result.returncode, result.stdout, result.stderr, spawned_at, timing)
+
+    async def request_async(self, method: str, params: List[Any], timeout: float = CALL_TIMEOUT,
+                            timing: Optional[Dict[str, float]] = None,
+                            options: Optional[Dict[str, Any]] = None, node_flags: Iterable[str] = ()) -> Any:
+        """Same as request, awaiting the child process instead of blocking"""
+        spawned_at = time.time()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *tsx_command(CALL_SCRIPT, node_flags),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self.project_root,
+                env={**os.environ},  # Pass through environment variables for Supabase
+            )
+        except OSError as e:
+            raise BridgeError(f"Failed to run tsx: {e}")
+
+        payload = json.dumps({"fn": method, "args": params, **(options or {})}).encode('utf8')
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(payload), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            raise BridgeError(f"tsx call timed out after {timeout}s calling {method}")
+        return self._parse(method, process.returncode, stdout.decode('utf8'), stderr.decode('utf8'),
+                           spawned_at, timing)
+
+    @staticmethod
+    def _parse(method: str, returncode: int, stdout: str, stderr: str, spawned_at: float,
+               timing: Optional[Dict[str, float]]) -> Any:
+        elapsed = (time.time() - spawned_at) * 1000
+        lines = stdout.strip().splitlines()
+        if returncode != 0 or not lines:
+            raise BridgeError(f"tsx call {method} failed: {stderr.strip()}")
+        parse_started = time.perf_counter()
+        message = json.loads(lines[-1])
+        if timing is not None:
+            timing.update(node_phases(spawned_at, message.get('timing') or {}))
+            timing['transit'] = max(elapsed - sum(timing.values()), 0.0)
+            timing['parse'] = (time.perf_counter() - parse_started) * 1000
+        return outcome_value(message)
+
+
+class TsxWorker:
+    """A single Node worker process speaking line-delimited JSON-RPC"""
+
+    def __init__(self, project_root: str = PROJECT_ROOT):
+        self.project_root = project_root
+        self._process: Optional[subprocess.Popen] = None
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count(1)
+        self._write_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._ready_params: Dict[str, Any] = {}
+        # Set once stdout closes, which can happen before poll() sees the exit
+        self._exited = threading.Event()
+        # Last lines of worker stderr, used to explain failures
+        self._stderr = collections.deque(maxlen=50)
+        # Bookkeeping for the pool's recycling and health checks
+        self.requests_served = 0
+        self.last_used = time.monotonic()
+        # Start-up phases (ms), reported by the first call that uses this worker
+        self.start_timing: Dict[str, float] = {}
+
+    def _command(self) -> List[str]:
+        return tsx_command(WORKER_SCRIPT)
+
+    def start(self):
+        """Spawn the worker and wait until it reports ready"""
+        spawned_at = time.time()
+        try:
+            self._process = subprocess.Popen(
+                self._command(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf8',
+                bufsize=1,
+                cwd=self.project_root,
+                env={**os.environ},  # Pass through environment variables for Supabase
+            )
+        except OSError as e:
+            raise BridgeError(f"Failed to start tsx worker: {e}")
+
+        threading.Thread(target=self._read_stdout, args=(self._process,), daemon=True).start()
+        threading.Thread(target=self._read_stderr, args=(self._process,), daemon=True).start()
+
+        if not self._ready.wait(START_TIMEOUT) or not self.alive():
+            self.stop()
+            raise BridgeError(f"tsx worker did not become ready: {self.stderr_tail()}")
+        self.start_timing = {**node_phases(spawned_at, self._ready_params),
+                             'start': (time.time() - spawned_at) * 1000}
+
+    def take_start_timing(self) -> Dict[str, float]:
+        timing, self.start_timing = self.start_timing, {}
+        return timing
+
+    def stop(self):
+        """Close stdin and terminate the worker if it does not exit on its own"""
+        process, self._process = self._process, None
+        self._ready.clear()
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except Exception:
+            process.kill()
+        self._fail_pending("tsx worker stopped")
+
+    def alive(self) -> bool:
+        return self._process is not None and not self._exited.is_set() and self._process.poll() is None
+
+    def stderr_tail(self) -> str:
+        return '\n'.join(self._stderr)
+
+    def submit(self, method: str, params: List[Any], options: Optional[Dict[str, Any]] = None) -> Future:
+        """Send one JSON-RPC request without waiting; the Future resolves with its result.
+
+        The worker handles requests concurrently, so several may be in flight.
+        `options` (fields, compact) are sent as non-standard request members, see TsxBridge.call.
+        """
+        if not self.alive():
+            raise BridgeError("tsx worker is not running")
+
+        request_id = next(self._ids)
+        self.requests_served += 1
+        future = Future()
+        # Mark it running so a cancelled awaiter can't cancel it under the reader thread
+        future.set_running_or_notify_cancel()
+        future.request_id = request_id
+        future.sent_at = time.perf_counter()
+        self._pending[request_id] = future
+        if self._exited.is_set():
+            self._pending.pop(request_id, None)
+            raise BridgeError("tsx worker is not running")
+        message = json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params,
+                              **(options or {})})
+
+        try:
+            with self._write_lock:
+                self._process.stdin.write(message + '\n')
+                self._process.stdin.flush()
+        except (OSError, ValueError, AttributeError) as e:
+            self._pending.pop(request_id, None)
+            raise BridgeError(f"Failed to write to tsx worker: {e}")
+        finally:
+            self.last_used = time.monotonic()
+        return future
+
+    def forget(self, future: Future):
+        """Stop tracking a request whose caller gave up waiting"""
+        self._pending.pop(getattr(future, 'request_id', None), None)
+
+    def request(self, method: str, params: List[Any], timeout: float = CALL_TIMEOUT,
+                timing: Optional[Dict[str, float]] = None, options: Optional[Dict[str, Any]] = None) -> Any:
+        """Send one JSON-RPC request and block until its response arrives.
+
+        `timing`, if given, is filled with the node/transit/parse phases in ms.
+        """
+        future = self.submit(method, params, options)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # The worker's state is unknown after a timeout, so replace it
+            self.forget(future)
+            self.stop()
+            raise BridgeError(f"tsx worker timed out after {timeout}s calling {method}")
+        finally:
+            self.last_used = time.monotonic()
+            if timing is not None:
+                timing.update(getattr(future, 'timing', {}))
+
+    def healthy(self) -> bool:
+        """Round-trip a ping to make sure the worker still answers"""
+        try:
+            return self.request('$ping', [], timeout=HEALTH_CHECK_TIMEOUT) == 'pong'
+        except BridgeError:
+            return False
+
+    def _read_stdout(self, process: subprocess.Popen):
+        for line in process.stdout:
+            received = time.perf_counter()
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                self._stderr.append(line)
+                continue
+            parse_ms = (time.perf_counter() - received) * 1000
+
+            if message.get('method') == 'ready':
+                self._ready_params = message.get('params') or {}
+                self._ready.set()
+                continue
+
+            future = self._pending.pop(message.get('id'), None)
+            if future is None:
+                # Nobody is waiting any more (the caller timed out)
+                continue
+            node_ms = (message.get('timing') or {}).get('nodeMs', 0.0)
+            future.timing = {
+                'node': node_ms,
+                'transit': max((received - future.sent_at) * 1000 - node_ms, 0.0),
+                'parse': parse_ms,
+            }
+            try:
+                future.set_result(outcome_value(message))
+            except BridgeError as e:
+                future.set_exception(e)
+
+        # stdout closed: the worker exited, so nothing pending will be answered
+        self._exited.set()
+        self._ready.set()
+        self._fail_pending(f"tsx worker exited: {self.stderr_tail()}")
+
+    def _read_stderr(self, process: subprocess.Popen):
+        for line in process.stderr:
+            self._stderr.append(line.rstrip())
+
+    def _fail_pending(self, reason: str):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(BridgeError(reason))
+
+
+class WorkerPool:
+    """Fixed-size pool of TsxWorkers shared by every keyword library.
+
+    Idle slots sit in a FIFO queue and blocked callers are woken in arrival
+    order, so checkout is first come, first served. A slot holds None until
+    its worker is first needed.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, max_requests: int = MAX_REQUESTS,
+                 project_root: str = PROJECT_ROOT):
+        if size < 1:
+            raise ValueError("Bridge pool size must be at least 1")
+        self.size = size
+        self.max_requests = max_requests
+        self.project_root = project_root
+        self.restarts = 0
+        self.recycled = 0
+        self._idle: "queue.Queue[Optional[TsxWorker]]" = queue.Queue()
+        self._all: List[TsxWorker] = []
+        self._lock = threading.Lock()
+        for _ in range(size):
+            self._idle.put(None)
+
+    def checkout(self, timeout: float = CALL_TIMEOUT) -> TsxWorker:
+        """Take the next idle worker, (re)starting it if it is missing or unhealthy"""
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise BridgeError(f"No tsx worker became free within {timeout}s")
+
+        try:
+            if worker is not None and not self._check(worker):
+                self.restarts += 1
+                print(f"tsx worker failed its health check, restarting (restart #{self.restarts})")
+                self._discard(worker)
+                worker = None
+            if worker is None:
+                worker = TsxWorker(self.project_root)
+                worker.start()
+                with self._lock:
+                    self._all.append(worker)
+            return worker
+        except BaseException:
+            # Give the slot back so the pool doesn't shrink on a failed start
+            self._idle.put(None)
+            raise
+
+    def checkin(self, worker: TsxWorker):
+        """Return a worker to the pool, recycling it once it hit max_requests"""
+        if self.max_requests and worker.requests_served >= self.max_requests:
+            self.recycled += 1
+            self._discard(worker)
+            self._idle.put(None)
+        else:
+            self._idle.put(worker)
+
+    def _check(self, worker: TsxWorker) -> bool:
+        if not worker.alive():
+            return False
+        if time.monotonic() - worker.last_used < HEALTH_CHECK_AFTER:
+            return True
+        return worker.healthy()
+
+    def _discard(self, worker: TsxWorker):
+        worker.stop()
+        with self._lock:
+            if worker in self._all:
+                self._all.remove(worker)
+
+    def close(self):
+        with self._lock:
+            workers, self._all = self._all, []
+        for worker in workers:
+            worker.stop()
+
+
+def is_transport_failure(error: BaseException) -> bool:
+    """True unless the backend itself answered (errors from Supabase carry a code)"""
+    return not isinstance(error, BridgeError) or error.code is None
+
+
+class CircuitBreaker:
+    """Fails bridge calls fast once the backend is known to be unreachable.
+
+    closed: calls go through and consecutive failures are counted.
+    open: calls are refused until `reset_after` seconds have passed.
+    half-open: one probe call goes through; success closes the breaker,
+    failure opens it again. Transitions are printed with Robot log levels.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_after: float = BREAKER_RESET_AFTER):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.state = self.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the bridge now"""
+        with self._lock:
+            if self.threshold <= 0 or self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_after:
+                    self.rejected += 1
+                    return False
+                self._transition(self.HALF_OPEN, "*INFO* Bridge circuit breaker half-open, probing the backend")
+            if self._probing:
+                self.rejected += 1
+                return False
+            self._probing = True
+            return True
+
+    def record(self, ok: Optional[bool]) -> None:
+        """Record a call's outcome; None means it ended without telling either way"""
+        with self._lock:
+            if ok is None:
+                self._probing = False
+            elif ok:
+                self.failures = 0
+                self._probing = False
+                if self.state != self.CLOSED:
+                    self._transition(self.CLOSED, "*INFO* Bridge circuit breaker closed, backend reachable again")
+            else:
+                self.failures += 1
+                if self.state == self.HALF_OPEN:
+                    self._probing = False
+                    self._open("probe call failed")
+                elif self.state == self.CLOSED and 0 < self.threshold <= self.failures:
+                    self._open(f"{self.failures} consecutive bridge failures")
+
+    def _open(self, reason: str) -> None:
+        self._opened_at = time.monotonic()
+        self._transition(self.OPEN, f"*WARN* Bridge circuit breaker open ({reason}); "
+                                    f"using local fallbacks for {self.reset_after:g}s")
+
+    def _transition(self, state: str, message: str) -> None:
+        self.state = state
+        print(message)
+
+
+class TsxBridge:
+    """Process-wide entry point used by the keyword libraries.
+
+    In worker mode each call checks a worker out of the shared WorkerPool for
+    its duration. A call that was already sent to a worker that then crashed
+    is not retried, since server actions are not idempotent; the next checkout
+    replaces that worker. In spawn mode every call goes through a TsxSpawner.
+    Either way calls are refused while the CircuitBreaker is open, and always
+    in local mode.
+    """
+
+    def __init__(self, project_root: str = PROJECT_ROOT, mode: str = BRIDGE_MODE):
+        if mode not in BRIDGE_MODES:
+            raise ValueError(f"Unknown bridge mode: {mode}")
+        self.project_root = project_root
+        self.mode = mode
+        self.pool = WorkerPool(project_root=project_root)
+        self._spawner = TsxSpawner(project_root)
+        self.breaker = CircuitBreaker()
+        self.tracer = tracer
+        self.cassette = cassette
+        # Returns the cookies of the session calls run as by default (session_pool.py)
+        self.cookie_source: Optional[Callable[[], Optional[List[Dict[str, str]]]]] = None
+
+    def _admit(self, method: str) -> None:
+        if self.mode == 'local':
+            raise BridgeError(f"bridge in local mode, not calling {method}")
+        if not self.breaker.allow():
+            # Refused calls still show up in the trace, as failures that took no time
+            self._trace(method, time.perf_counter(), {}, False)
+            raise BridgeError(f"circuit breaker open, not calling {method}")
+
+    def call(self, method: str, *args, fields: Optional[List[str]] = None, compact: bool = False,
+             cookies: Optional[List[Dict[str, str]]] = None) -> Any:
+        """Call an exported lib/data or lib/actions function by name.
+
+        With `fields`, rows in the result only carry those top-level columns
+        and embeds, and the backend is only asked for them. With `compact`,
+        list results come back as compact_rows.CompactRows. `cookies` seeds
+        the call's cookie jar; by default it comes from `cookie_source` (the
+        active pooled session, see session_pool.py).
+        """
+        if self.cassette.replaying:
+            return self._replay(method, list(args), fields, compact)
+        self._admit(method)
+        options = self._options(fields, compact, cookies)
+        node_flags = profiler.node_flags()
+        ok = None
+        phases: Dict[str, float] = {}
+        started = time.perf_counter()
+        try:
+            if self.mode == 'spawn' or node_flags:
+                result = self._spawner.request(method, list(args), timing=phases, options=options,
+                                               node_flags=node_flags or ())
+            else:
+                worker = self._checkout(started, phases)
+                try:
+                    result = worker.request(method, list(args), timing=phases, options=options)
+                finally:
+                    self.pool.checkin(worker)
+            ok = True
+            if self.cassette.recording:
+                self.cassette.record(method, list(args), options, result=result)
+            return unpack(result) if compact else result
+        except Exception as e:
+            ok = not is_transport_failure(e)
+            if ok and self.cassette.recording:
+                self.cassette.record(method, list(args), options, error=e)
+            if isinstance(e, BridgeError):
+                print(f"Bridge call {method} failed: {e}")
+            raise
+        finally:
+            self.breaker.record(ok)
+            self._trace(method, started, phases, ok)
+
+    def _replay(self, method: str, args: List[Any], fields: Optional[List[str]], compact: bool) -> Any:
+        """Answer a call from the cassette; a call that wasn't recorded fails like an unreachable backend"""
+        started = time.perf_counter()
+        outcome = self.cassette.replay(method, args, self._options(fields, compact, []))
+        ok = outcome is not None and 'error' not in outcome
+        self._trace(method, started, {}, ok, mode='replay')
+        if outcome is None:
+            raise BridgeError(f"no recorded response for {method}")
+        if 'error' in outcome:
+            raise BridgeError(outcome['error'], outcome.get('code'))
+        result = outcome['result']
+        return unpack(result) if compact else result
+
+    def _options(self, fields: Optional[List[str]], compact: bool,
+                 cookies: Optional[List[Dict[str, str]]]) -> Dict[str, Any]:
+        if cookies is None and self.cookie_source is not None:
+            cookies = self.cookie_source()
+        return drop_none(fields=fields, compact=compact or None, cookies=cookies or None)
+
+    def _checkout(self, started: float, phases: Dict[str, float]) -> TsxWorker:
+        """Check a worker out, adding queue time and (if it was just started) its start-up phases"""
+        worker = self.pool.checkout()
+        phases.update(worker.take_start_timing())
+        start_ms = phases.pop('start', 0.0)
+        phases['queue'] = max((time.perf_counter() - started) * 1000 - start_ms, 0.0)
+        return worker
+
+    def _trace(self, method: str, started: float, phases: Dict[str, float], ok: Optional[bool],
+               mode: Optional[str] = None):
+        phases['total'] = (time.perf_counter() - started) * 1000
+        self.tracer.record(method, mode or self.mode, phases, ok is True)
+
+    def call_bulk(self, method: str, items: List[Any],
+                  local: Callable[[int, Any], Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run one of the *Bulk functions from bridge/bulk.ts over `items` in a single call.
+
+        Returns one item_result per input item. If the bridge itself fails,
+        `local(index, item)` is applied to every item instead.
+        """
+        items = list(items)
+        try:
+            results = self.call(method, items)
+        except Exception as e:
+            print(f"Failed to call {method}: {e}, using local data")
+            return [local(index, item) for index, item in enumerate(items)]
+
+        return [
+            item_result(
+                result['index'],
+                result['ok'],
+                data=result.get('data'),
+                error=(result.get('error') or {}).get('message'),
+                code=(result.get('error') or {}).get('code'),
+            )
+            for result in results
+        ]
+
+    async def call_async(self, method: str, *args, fields: Optional[List[str]] = None,
+                         compact: bool = False, cookies: Optional[List[Dict[str, str]]] = None) -> Any:
+        """Awaitable call.
+
+        In worker mode the worker is only checked out while the request is
+        written, so many awaiting calls can be in flight on each worker at
+        once; in spawn mode each call is its own asyncio subprocess.
+        """
+        if self.cassette.replaying:
+            return self._replay(method, list(args), fields, compact)
+        self._admit(method)
+        if cookies is None and self.cookie_source is not None:
+            # Refreshing the session is a blocking bridge call
+            cookies = await asyncio.to_thread(self.cookie_source) or []
+        options = self._options(fields, compact, cookies)
+        node_flags = profiler.node_flags()
+        ok = None
+        phases: Dict[str, float] = {}
+        started = time.perf_counter()
+        try:
+            if self.mode == 'spawn' or node_flags:
+                result = await self._spawner.request_async(method, list(args), timing=phases, options=options,
+                                                           node_flags=node_flags or ())
+            else:
+                worker = await asyncio.to_thread(self._checkout, started, phases)
+                try:
+                    future = worker.submit(method, list(args), options)
+                finally:
+                    self.pool.checkin(worker)
+                try:
+                    result = await asyncio.wait_for(asyncio.wrap_future(future), CALL_TIMEOUT)
+                except asyncio.TimeoutError:
+                    worker.forget(future)
+                    raise BridgeError(f"tsx worker timed out after {CALL_TIMEOUT}s calling {method}")
+                finally:
+                    phases.update(getattr(future, 'timing', {}))
+            ok = True
+            if self.cassette.recording:
+                self.cassette.record(method, list(args), options, result=result)
+            return unpack(result) if compact else result
+        except Exception as e:
+            ok = not is_transport_failure(e)
+            if ok and self.cassette.recording:
+                self.cassette.record(method, list(args), options, error=e)
+            if isinstance(e, BridgeError):
+                print(f"Bridge call {method} failed: {e}")
+            raise
+        finally:
+            self.breaker.record(ok)
+            self._trace(method, started, phases, ok)
+
+    def close(self):
+        self.pool.close()
+
+
+# Shared by all keyword libraries in this process
+bridge = TsxBridge()
+atexit.register(bridge.close)